@@ -1,7 +1,8 @@
 # python built-in imports
+import copy
 import os
 from logging.config import dictConfig
-from typing import Dict, Optional
+from typing import Any, Dict, Optional
 
 # python external imports
 from flask import Flask
@@ -12,6 +13,7 @@ from flask_login import LoginManager
 from flask_sqlalchemy import SQLAlchemy
 
 # app imports
+from codeapp import log
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
@@ -26,39 +28,75 @@ limiter = Limiter(
 # configuring the logging
 # for more info, check:
 # https://docs.python.org/3.9/howto/logging.html
-# this configuration writes to a file and to the console
-dictConfig(
-    {
-        "version": 1,
-        "formatters": {
-            "default": {
-                "format": "[%(asctime)s] [%(levelname)s] [%(name)s] "
-                "[%(module)s:%(lineno)s] - %(message)s",
-            }
+# this configuration writes to a file and to the console,
+# from a separate thread (see `codeapp/log.py`)
+LOGGING: Dict[str, Any] = {
+    "version": 1,
+    "formatters": {
+        "default": {
+            "format": "[%(asctime)s] [%(levelname)s] [%(name)s] "
+            "[%(module)s:%(lineno)s] - %(message)s",
+        }
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": "default",
         },
-        "handlers": {
-            "console": {
-                "class": "logging.StreamHandler",
-                "formatter": "default",
-            },
-            "to_file": {
-                "level": "DEBUG",
-                "formatter": "default",
-                "class": "logging.handlers.RotatingFileHandler",
-                "filename": "logs/messages.log",
-                "maxBytes": 5000000,
-                "backupCount": 10,
-            },
-        },
-        "root": {
+        "to_file": {
             "level": "DEBUG",
-            "handlers": ["console", "to_file"],
+            "formatter": "default",
+            "class": "logging.handlers.RotatingFileHandler",
+            # in the `LOG_DIR` of the config, see `_configure_logging`
+            "filename": "messages.log",
+            "maxBytes": 5000000,
+            "backupCount": 10,
         },
-    }
-)
-
-
-def create_app(app_settings: Optional[str] = None) -> Flask:
+        "slow_queries": {
+            "level": "WARNING",
+            "formatter": "default",
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": "slow-queries.log",
+            "maxBytes": 5000000,
+            "backupCount": 10,
+        },
+    },
+    "loggers": {
+        # see `codeapp/profiling.py`
+        "codeapp.slow_query": {
+            "handlers": ["slow_queries"],
+        },
+    },
+    "root": {
+        "level": "DEBUG",
+        "handlers": ["console", "to_file"],
+    },
+}
+_logging_configured = False
+
+
+def _configure_logging(log_dir: str) -> None:
+    # done by the first app created instead of when the package is imported,
+    # so that importing any module (e.g., in the tests) has no side effects
+    global _logging_configured  # pylint: disable=global-statement
+    if _logging_configured:
+        return
+    os.makedirs(log_dir, exist_ok=True)
+    config = copy.deepcopy(LOGGING)
+    for handler in config["handlers"].values():
+        if "filename" in handler:
+            handler["filename"] = os.path.join(log_dir, handler["filename"])
+    dictConfig(config)
+    log.start("", "codeapp.slow_query")
+    _logging_configured = True
+
+
+def create_app(app_settings: Optional[str] = None, migrations: bool = True) -> Flask:
+    """
+    Creates the app. The web servers use `migrations=False`: the migrations
+    are only needed by the `db` commands, and Flask-Migrate imports Alembic,
+    which takes longer to import than the rest of the app (see `wsgi.py`).
+    """
     app: Flask = Flask(__name__)
 
     if app_settings is None:
@@ -71,6 +109,8 @@ def create_app(app_settings: Optional[str] = None) -> Flask:
         if os.getenv("FLASK_ENV") is None:
             os.environ["FLASK_ENV"] = "development"  # pragma: no cover
     app.config.from_object(app_settings)
+    _configure_logging(app.config["LOG_DIR"])
+    log.init_app(app)
 
     # making sure we have "postgresql"
     if (
@@ -81,7 +121,26 @@ def create_app(app_settings: Optional[str] = None) -> Flask:
             "SQLALCHEMY_DATABASE_URI"
         ].replace("postgres://", "postgresql://")
 
+    # pylint: disable-next=import-outside-toplevel
+    from codeapp import (
+        cache,
+        conditional,
+        metrics,
+        passwords,
+        profiling,
+        ratelimit,
+    )
+
+    # instruments the connection pool, therefore it comes before `db`
+    metrics.init_app(app)
     db.init_app(app)
+    if migrations:
+        # pylint: disable-next=import-outside-toplevel
+        from flask_migrate import Migrate
+
+        # `render_as_batch` allows altering tables in SQLite,
+        # which supports very few `ALTER TABLE` operations
+        Migrate(app, db, render_as_batch=True)
     # the code below activates stricter handling foreign keys
     if (
         app.config["SQLALCHEMY_DATABASE_URI"] is not None
@@ -96,14 +155,23 @@ def create_app(app_settings: Optional[str] = None) -> Flask:
         with app.app_context():
             event.listen(db.engine, "connect", _fk_pragma_on_connect)
 
+    profiling.init_app(app)
+    cache.init_app(app)
+    conditional.init_app(app)
+
     bcrypt.init_app(app)
+    passwords.init_app(app)
     login_manager.init_app(app)
-    limiter.init_app(app)
+    # the storage is chosen by `RATELIMIT_STORAGE_URI`, see `codeapp/ratelimit.py`
+    ratelimit.init_app(app)
 
     # register blueprints
+    from codeapp import api  # pylint: disable=import-outside-toplevel
     from codeapp.routes import bp  # pylint: disable=import-outside-toplevel
 
     app.register_blueprint(bp)
+    # the JSON API, with its own JSON encoder
+    api.init_app(app)
 
     # shell context for flask cli
     @app.shell_context_processor
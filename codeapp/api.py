@@ -0,0 +1,254 @@
+# pylint: disable=cyclic-import
+"""
+Read-only JSON API, under `/api`, for the mobile app and other integrations.
+
+- `GET /api/recipes` lists the recipes, newest last, with the same keyset
+  pagination as the home page (`after`/`before` cursors, up to `limit` items);
+- `GET /api/recipes/<id>` returns one recipe;
+- `GET /api/users` and `GET /api/users/<id>` do the same for the users
+  (only their public fields);
+- `GET /api/export` streams all the recipes as NDJSON, to logged users
+  (see `codeapp/export.py`).
+
+The lists accept `ids=1,2,3` to fetch several items by id with one query,
+and all endpoints accept `fields=id,title` to return (and select from the
+database) only the columns the client needs. The responses are serialized
+with `orjson`, which is several times faster than the `json` module.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import orjson
+from flask import (
+    Blueprint,
+    Flask,
+    abort,
+    current_app,
+    request,
+    stream_with_context,
+)
+from flask.json.provider import DefaultJSONProvider
+from flask_login import current_user
+from sqlalchemy import Float, case, cast, select
+from sqlalchemy.engine import Row
+from sqlalchemy.sql.expression import ColumnElement, Select
+from werkzeug.exceptions import HTTPException
+from werkzeug.wrappers import Response
+
+from codeapp import db
+from codeapp.export import export_recipes
+from codeapp.models import Recipe, User
+from codeapp.pagination import paginate
+
+bp = Blueprint("api", __name__, url_prefix="/api")
+
+# maximum number of items returned at once, by `ids` or `limit`
+MAX_ITEMS = 100
+
+# the fields that can be requested, and the columns they come from
+RECIPE_FIELDS: Dict[str, ColumnElement[Any]] = {
+    "id": Recipe.id,
+    "title": Recipe.title,
+    "date_posted": Recipe.date_posted,
+    "excerpt": Recipe.excerpt,
+    "content": Recipe.content,
+    "rating": case(
+        (
+            Recipe.rating_count > 0,
+            cast(Recipe.rating_sum, Float) / Recipe.rating_count,
+        )
+    ),
+    "rating_count": Recipe.rating_count,
+    "version": Recipe.version,
+    "user_id": Recipe.user_id,
+    "author": User.name,
+}
+# the content can be long, therefore the lists do not return it by default
+RECIPE_LIST_FIELDS = [name for name in RECIPE_FIELDS if name != "content"]
+USER_FIELDS: Dict[str, ColumnElement[Any]] = {
+    "id": User.id,
+    "name": User.name,
+}
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider of the API using `orjson`; dates are in ISO 8601, and the
+    keys keep their order. The values `orjson` does not support (e.g.,
+    `Decimal`) and the options of the `json` module (e.g., `indent`) are
+    handled by the default provider.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            return super().dumps(obj)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # the bytes are sent as they are, without decoding and encoding them
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            data = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return super().response(obj)
+        return self._app.response_class(data, mimetype="application/json")
+
+
+def init_app(app: Flask) -> None:
+    # only for the responses of the API, `jsonify` and `tojson` keep using
+    # the default provider of the app
+    app.extensions["api_json"] = ORJSONProvider(app)
+    app.register_blueprint(bp)
+
+
+def _jsonify(*args: Any, **kwargs: Any) -> Response:
+    """
+    Like `jsonify`, serialized with the provider of the API.
+    """
+    provider: ORJSONProvider = current_app.extensions["api_json"]
+    return provider.response(*args, **kwargs)
+
+
+@bp.errorhandler(HTTPException)
+def _error(error: HTTPException) -> Tuple[Response, int]:
+    # the clients of the API expect JSON, also in the errors
+    return _jsonify(error=error.description), error.code or 500
+
+
+@bp.get("/recipes")
+def recipes() -> Response:
+    fields = _get_fields(RECIPE_FIELDS, RECIPE_LIST_FIELDS)
+    return _list(_select_recipes(fields), fields, (Recipe.date_posted, Recipe.id))
+
+
+@bp.get("/recipes/<int:recipe_id>")
+def recipe(recipe_id: int) -> Response:
+    fields = _get_fields(RECIPE_FIELDS, list(RECIPE_FIELDS))
+    return _one(_select_recipes(fields).filter(Recipe.id == recipe_id), fields)
+
+
+@bp.get("/users")
+def users() -> Response:
+    fields = _get_fields(USER_FIELDS, list(USER_FIELDS))
+    return _list(_select(USER_FIELDS, fields, User), fields, (User.id,))
+
+
+@bp.get("/users/<int:user_id>")
+def user(user_id: int) -> Response:
+    fields = _get_fields(USER_FIELDS, list(USER_FIELDS))
+    return _one(_select(USER_FIELDS, fields, User).filter(User.id == user_id), fields)
+
+
+@bp.get("/export")
+def export() -> Response:
+    if not current_user.is_authenticated:
+        abort(401, "Log in to export the recipes.")
+    # the lines are sent while they are read from the database
+    return current_app.response_class(
+        stream_with_context(export_recipes()),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=recipes.ndjson"},
+    )
+
+
+def _get_fields(available: Dict[str, Any], default: List[str]) -> List[str]:
+    """
+    Returns the fields in the `fields` argument, or `default` if none;
+    the `id` is always returned.
+    """
+    if not request.args.get("fields"):
+        return default
+    fields = ["id"] + [
+        name for name in request.args["fields"].split(",") if name and name != "id"
+    ]
+    unknown = [name for name in fields if name not in available]
+    if len(unknown) > 0:
+        abort(400, f"Unknown fields: {', '.join(unknown)}.")
+    # each field only once, in the order requested
+    return list(dict.fromkeys(fields))
+
+
+def _get_ids() -> Optional[List[int]]:
+    if "ids" not in request.args:
+        return None
+    try:
+        ids = [int(value) for value in request.args["ids"].split(",") if value]
+    except ValueError:
+        abort(400, "The ids must be integers separated by commas.")
+    if not 0 < len(ids) <= MAX_ITEMS:
+        abort(400, f"Between 1 and {MAX_ITEMS} ids can be requested at once.")
+    return ids
+
+
+def _select(
+    available: Dict[str, ColumnElement[Any]], fields: Sequence[str], entity: Any
+) -> Select:
+    return select(*[available[name].label(name) for name in fields]).select_from(entity)
+
+
+def _select_recipes(fields: Sequence[str]) -> Select:
+    statement = _select(RECIPE_FIELDS, fields, Recipe)
+    if "author" in fields:
+        statement = statement.join(User, Recipe.user_id == User.id)
+    return statement
+
+
+def _as_dict(row: Row[Any], fields: Sequence[str]) -> Dict[str, Any]:
+    # the columns are labeled with the names of the fields
+    return {name: getattr(row, name) for name in fields}
+
+
+def _one(statement: Select, fields: Sequence[str]) -> Response:
+    row = db.session.execute(statement).one_or_none()
+    if row is None:
+        abort(404, "Not found.")
+    return _jsonify(_as_dict(row, fields))
+
+
+def _list(
+    statement: Select, fields: Sequence[str], keys: Sequence[ColumnElement[Any]]
+) -> Response:
+    """
+    Returns the items with the `ids` requested (in that order, skipping the
+    ones that do not exist), or a page of items ordered by `keys`.
+    """
+    ids = _get_ids()
+    if ids is not None:
+        # the last key is the id
+        rows = db.session.execute(statement.filter(keys[-1].in_(ids))).all()
+        by_id = {row.id: row for row in rows}
+        return _jsonify(
+            items=[_as_dict(by_id[_id], fields) for _id in ids if _id in by_id]
+        )
+
+    limit = request.args.get("limit", current_app.config["API_PER_PAGE"], type=int)
+    if not 0 < limit <= MAX_ITEMS:
+        abort(400, f"The limit must be between 1 and {MAX_ITEMS}.")
+    try:
+        page = paginate(
+            statement,
+            keys=keys,
+            per_page=limit,
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+        )
+    except ValueError:
+        abort(400, "Invalid cursor.")
+    if len(fields) == 1:
+        # pages of a single column have the values instead of the rows
+        items = [{fields[0]: value} for value in page.items]
+    else:
+        items = [_as_dict(row, fields) for row in page.items]
+    return _jsonify(items=items, next=page.next_cursor, prev=page.prev_cursor)
@@ -0,0 +1,161 @@
+"""
+Cache of rendered HTML fragments (recipe cards and recipe details).
+
+Fragments are keyed by the id and the `version` of the recipe they show.
+The version is incremented in the database whenever the recipe, its author,
+its comments or its grades change (see the events in `codeapp/models.py`),
+therefore a changed recipe is simply looked up under a new key and the
+outdated fragments are never served again; they are eventually evicted.
+
+Backends, chosen with `FRAGMENT_CACHE_TYPE`:
+
+- `lru`: in-process, least-recently-used dictionary (default);
+- `redis`: shared by all the processes/servers, using `FRAGMENT_CACHE_URL`
+  (requires the `redis` package);
+- `null`: disables the cache.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from flask import Flask, current_app
+
+
+class CacheBackend:
+    """
+    Interface of the cache backends. Keys and values are strings.
+    """
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """
+        Returns the entries found for the given keys (missing keys are omitted).
+        """
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        return {}
+
+    def set(self, key: str, value: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class LRUCache(CacheBackend):
+    """
+    Thread-safe in-process cache holding at most `maxsize` entries.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        return found
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):  # pragma: no cover
+    """
+    Cache shared by all the processes, stored in Redis.
+    Entries expire after `timeout` seconds, since outdated versions
+    are never requested again.
+    """
+
+    def __init__(self, url: str, timeout: int, prefix: str) -> None:
+        # optional dependency, only needed with `FRAGMENT_CACHE_TYPE=redis`
+        try:
+            import redis  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise RuntimeError(
+                "FRAGMENT_CACHE_TYPE=redis requires the `redis` package, "
+                "install it with `pip install redis`."
+            ) from e
+
+        self._client: Any = redis.Redis.from_url(url)
+        self.timeout = timeout
+        self.prefix = prefix
+
+    def get_many(self, keys: List[str]) -> Dict[str, str]:
+        if len(keys) == 0:
+            return {}
+        values = self._client.mget([self.prefix + key for key in keys])
+        return {
+            key: value.decode("utf-8")
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+
+    def set(self, key: str, value: str) -> None:
+        self._client.set(self.prefix + key, value.encode("utf-8"), ex=self.timeout)
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+
+def init_app(app: Flask) -> None:
+    """
+    Creates the backend configured for `app`.
+    """
+    cache_type: str = app.config.get("FRAGMENT_CACHE_TYPE", "lru")
+    backend: CacheBackend
+    if cache_type == "lru":
+        backend = LRUCache(app.config.get("FRAGMENT_CACHE_SIZE", 2000))
+    elif cache_type == "redis":  # pragma: no cover
+        backend = RedisCache(
+            app.config["FRAGMENT_CACHE_URL"],
+            timeout=app.config.get("FRAGMENT_CACHE_TIMEOUT", 86400),
+            prefix=app.config.get("FRAGMENT_CACHE_PREFIX", "fragments:"),
+        )
+    elif cache_type == "null":
+        backend = NullCache()
+    else:
+        raise ValueError(f"Unknown FRAGMENT_CACHE_TYPE: {cache_type}")
+    app.extensions["fragment_cache"] = backend
+
+
+def get_cache(app: Optional[Flask] = None) -> CacheBackend:
+    """
+    Returns the cache backend of `app` (by default, the current app).
+    """
+    if app is None:
+        app = current_app
+    cache: CacheBackend = app.extensions["fragment_cache"]
+    return cache
+
+
+def fragment_key(name: str, recipe_id: int, version: int) -> str:
+    return f"{name}:{recipe_id}:{version}"
@@ -0,0 +1,87 @@
+"""
+HTTP conditional requests for the read-only pages.
+
+Each page computes a weak `ETag` from the data it shows (e.g., the id and the
+version of the recipes) *before* rendering anything. If the browser, a proxy
+or a CDN already has that version (`If-None-Match`), a `304 Not Modified`
+response is returned without rendering the templates.
+
+The pages also depend on the logged user (shown in the navbar), on pending
+flash messages and on the templates themselves, therefore:
+
+- the `ETag` includes the id and the name of the logged user, and a digest
+  of the templates, computed once when the app is created;
+- pages with pending flash messages are never cached;
+- pages of anonymous users are `public` (shared caches may store them),
+  pages of logged users are `private`, and all of them carry `Vary: Cookie`.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Any, Callable, Optional
+
+from flask import Flask, current_app, make_response, request, session
+from flask_login import current_user
+from werkzeug.wrappers import Response
+
+
+def init_app(app: Flask) -> None:
+    """
+    Computes the digest of the templates of `app`,
+    so that the `ETag`s change when the templates change.
+    """
+    digest = hashlib.sha1(app.config.get("ETAG_SALT", "").encode("utf-8"))
+    assert app.template_folder is not None
+    folder = os.path.join(app.root_path, app.template_folder)
+    for root, _, files in sorted(os.walk(folder)):
+        for name in sorted(files):
+            with open(os.path.join(root, name), "rb") as file:
+                digest.update(file.read())
+    app.extensions["templates_digest"] = digest.hexdigest()
+
+
+def get_etag(*parts: Any) -> Optional[str]:
+    """
+    Returns the (unquoted) `ETag` of a page showing the data in `parts`,
+    or `None` if the page must not be cached.
+    """
+    if "_flashes" in session:
+        return None
+    user = (
+        (current_user.id, current_user.name) if current_user.is_authenticated else None
+    )
+    digest = hashlib.sha1(
+        repr((current_app.extensions["templates_digest"], user, parts)).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+def conditional_response(etag: Optional[str], render: Callable[[], Any]) -> Response:
+    """
+    Answers with `304 Not Modified` if the client already has the version
+    identified by `etag`, otherwise calls `render` to build the response.
+    The caching headers are added in both cases.
+    """
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(render())
+
+    response.vary.add("Cookie")
+    if etag is None:
+        response.cache_control.no_store = True
+        return response
+    response.set_etag(etag, weak=True)
+    if current_user.is_authenticated:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    max_age: int = current_app.config.get("HTTP_CACHE_MAX_AGE", 0)
+    if max_age > 0:
+        response.cache_control.max_age = max_age
+    else:
+        # caches may store the page, but must always check if it is current
+        response.cache_control.no_cache = True
+    return response
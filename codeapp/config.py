@@ -1,4 +1,43 @@
 import os
+import tempfile
+from typing import Any, Dict, Mapping
+
+from sqlalchemy.pool import NullPool
+
+
+def engine_options_from_env(environ: Mapping[str, str] = os.environ) -> Dict[str, Any]:
+    """
+    Builds the `SQLALCHEMY_ENGINE_OPTIONS` from environment variables.
+
+    Each gunicorn worker (`WEB_CONCURRENCY`) is a process with its own pool,
+    therefore the connections allowed by the database (`DB_MAX_CONNECTIONS`)
+    are split among the workers. A worker never needs more connections than
+    its threads (`GUNICORN_THREADS`); the rest of its share is overflow.
+    `DB_POOL_SIZE` and `DB_MAX_OVERFLOW` override the computed values.
+
+    With `DB_POOL_MODE=external`, connections are pooled outside of the app
+    (e.g., by pgbouncer), and each checkout opens a new connection to it.
+    """
+    if environ.get("DB_POOL_MODE", "internal") == "external":
+        return {"poolclass": NullPool}
+
+    workers = max(1, int(environ.get("WEB_CONCURRENCY", "1")))
+    threads = max(1, int(environ.get("GUNICORN_THREADS", "1")))
+    per_worker = max(1, int(environ.get("DB_MAX_CONNECTIONS", "20")) // workers)
+    pool_size = int(environ.get("DB_POOL_SIZE", min(threads, per_worker)))
+    return {
+        "pool_size": pool_size,
+        "max_overflow": int(
+            environ.get("DB_MAX_OVERFLOW", max(0, per_worker - pool_size))
+        ),
+        # seconds to wait for a connection before failing
+        "pool_timeout": float(environ.get("DB_POOL_TIMEOUT", "10")),
+        # connections are replaced after this many seconds, before the
+        # server or a firewall closes them
+        "pool_recycle": int(environ.get("DB_POOL_RECYCLE", "1800")),
+        # checks that the connection is alive before using it
+        "pool_pre_ping": environ.get("DB_POOL_PRE_PING", "1") == "1",
+    }
 
 
 class BaseConfig:
@@ -8,17 +47,77 @@ class BaseConfig:
     SESSION_PERMANENT = False
     SESSION_USE_SIGNER = True
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # number of recipes shown in each page of the home page
+    RECIPES_PER_PAGE = int(os.getenv("RECIPES_PER_PAGE", "10"))
+    # number of comments shown in the page of a recipe, and loaded each time
+    # the user asks for more
+    COMMENTS_PER_PAGE = int(os.getenv("COMMENTS_PER_PAGE", "10"))
+    # number of items in each page of the JSON API, see `codeapp/api.py`
+    API_PER_PAGE = int(os.getenv("API_PER_PAGE", "20"))
+    # per-request SQL profiling, see `codeapp/profiling.py`
+    SQL_PROFILING = os.getenv("SQL_PROFILING", "0") == "1"
+    # statements slower than this (in milliseconds) go to the slow-query log
+    SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+    # number of slowest statements reported in the `Server-Timing` header
+    SQL_PROFILING_TOP = 3
+    # cache of rendered fragments of the pages, see `codeapp/cache.py`
+    FRAGMENT_CACHE_TYPE = os.getenv("FRAGMENT_CACHE_TYPE", "lru")
+    FRAGMENT_CACHE_SIZE = int(os.getenv("FRAGMENT_CACHE_SIZE", "2000"))
+    FRAGMENT_CACHE_URL = os.getenv("FRAGMENT_CACHE_URL")
+    # seconds the pages may be reused by the browsers and proxies without
+    # checking if they changed (0: always check), see `codeapp/conditional.py`
+    HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "0"))
+    # changes all the `ETag`s, e.g., to force clients to reload the pages
+    ETAG_SALT = os.getenv("ETAG_SALT", "")
+    # exposes the metrics of this process in `/metrics`, see `codeapp/metrics.py`
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+    # cost of the password hashes: each round doubles the CPU time of a login,
+    # see `codeapp/passwords.py` and `python manage.py bench-bcrypt`
+    BCRYPT_LOG_ROUNDS = int(os.getenv("BCRYPT_LOG_ROUNDS", "12"))
+    # threads hashing the passwords, and hashes allowed to wait for them
+    # before answering 503 (retry after the given seconds)
+    PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", str(os.cpu_count() or 1)))
+    PASSWORD_POOL_QUEUE = int(os.getenv("PASSWORD_POOL_QUEUE", "16"))
+    PASSWORD_POOL_RETRY_AFTER = int(os.getenv("PASSWORD_POOL_RETRY_AFTER", "2"))
+    # seconds that each worker reuses the logged-in users without reading
+    # them again (0: read in every request); changes made through another
+    # worker are seen after this time
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "0"))
+    # logging, see `codeapp/log.py`
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    # where the log files are written
+    LOG_DIR = os.getenv("LOG_DIR", "logs")
+    # one JSON object per line, for log aggregators
+    LOG_JSON = os.getenv("LOG_JSON", "0") == "1"
+    # keeps one in this many debug messages from each line of code
+    LOG_DEBUG_SAMPLE = int(os.getenv("LOG_DEBUG_SAMPLE", "1"))
+    # e.g., disabled by `manage.py bench-memory`, which sends many requests
+    RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "1") == "1"
+    # where the rate-limit counters are kept; the workers only share them with
+    # redis://, memcached:// or sqlite:///<file>, see `codeapp/ratelimit.py`
+    RATELIMIT_STORAGE_URI = os.getenv("RATELIMIT_STORAGE_URI", "memory://")
+    # smooths the limits over time, without the bursts at the window boundaries
+    RATELIMIT_STRATEGY = os.getenv("RATELIMIT_STRATEGY", "sliding-window-counter")
 
 
 class DevelopmentConfig(BaseConfig):
     SQLALCHEMY_DATABASE_URI = "sqlite:///site-dev.db"
     SQLALCHEMY_ECHO = True
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG")
 
 
 class TestingConfig(BaseConfig):
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = "sqlite:///site-testing.db"
+    # e.g., a separate database for the benchmarks
+    SQLALCHEMY_DATABASE_URI = os.getenv(
+        "TEST_DATABASE_URL", "sqlite:///site-testing.db"
+    )
     SQLALCHEMY_ECHO = False
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")
+    # keeps the log files of the project for the app that is actually run
+    LOG_DIR = os.getenv("LOG_DIR", os.path.join(tempfile.gettempdir(), "codeapp-logs"))
+    # the lowest cost allowed, which makes the tests much faster
+    BCRYPT_LOG_ROUNDS = 4
     # disables checking of CSRF for testing
     # more info: https://flask-wtf.readthedocs.io/en/1.0.x/config/
     WTF_CSRF_ENABLED = False
@@ -26,5 +125,11 @@ class TestingConfig(BaseConfig):
 
 class ProductionConfig(BaseConfig):
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options_from_env()
     SECRET_KEY = os.getenv("FLASK_SECRET_KEY") or ""
+    # shared by the workers of the dyno when there is no redis
+    RATELIMIT_STORAGE_URI = os.getenv(
+        "RATELIMIT_STORAGE_URI",
+        os.getenv("REDIS_URL", f"sqlite:///{tempfile.gettempdir()}/ratelimit.db"),
+    )
     SQLALCHEMY_ECHO = False
@@ -0,0 +1,96 @@
+# pylint: disable=cyclic-import
+"""
+Export of the recipes, with their authors, rating aggregates and comments,
+as newline-delimited JSON (NDJSON), one recipe per line:
+
+    {"id": 1, "title": "...", "date_posted": "2022-05-17T10:30:15",
+     "content": "<p>...</p>", "author": {"id": 1, "name": "..."},
+     "rating": 4.5, "rating_count": 2,
+     "comments": [{"id": 1, "date_posted": "...", "content": "...",
+                   "author": {"id": 2, "name": "..."}}, ...]}
+
+The recipes and the comments are read with two streaming queries
+(`yield_per`, i.e., server-side cursors in PostgreSQL), both ordered by
+recipe, and merged while they are read. Only one batch of rows and the
+comments of one recipe are in memory at any time, independently of the
+number of recipes exported.
+
+Use `python manage.py export` or `GET /api/export`.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List
+
+import orjson
+from sqlalchemy import select
+
+from codeapp import db
+from codeapp.models import Comment, Recipe, User
+
+
+def export_recipes(batch_size: int = 1000) -> Iterator[bytes]:
+    """
+    Yields the recipes, one NDJSON line each, ordered by id.
+    """
+    recipes = db.session.execute(
+        select(
+            Recipe.id,
+            Recipe.title,
+            Recipe.date_posted,
+            Recipe.content,
+            Recipe.rating_sum,
+            Recipe.rating_count,
+            User.id.label("user_id"),
+            User.name.label("user_name"),
+        )
+        .join(User, Recipe.user_id == User.id)
+        .order_by(Recipe.id)
+        .execution_options(yield_per=batch_size)
+    )
+    comments = db.session.execute(
+        select(
+            Comment.recipe_id,
+            Comment.id,
+            Comment.date_posted,
+            Comment.content,
+            User.id.label("user_id"),
+            User.name.label("user_name"),
+        )
+        .join(User, Comment.user_id == User.id)
+        .order_by(Comment.recipe_id, Comment.date_posted, Comment.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    comment = next(comments, None)
+    for recipe in recipes:
+        recipe_comments: List[Dict[str, Any]] = []
+        # comments of recipes deleted after the first query are skipped
+        while comment is not None and comment.recipe_id <= recipe.id:
+            if comment.recipe_id == recipe.id:
+                recipe_comments.append(
+                    {
+                        "id": comment.id,
+                        "date_posted": comment.date_posted,
+                        "content": comment.content,
+                        "author": {"id": comment.user_id, "name": comment.user_name},
+                    }
+                )
+            comment = next(comments, None)
+        yield orjson.dumps(
+            {
+                "id": recipe.id,
+                "title": recipe.title,
+                "date_posted": recipe.date_posted,
+                "content": recipe.content,
+                "author": {"id": recipe.user_id, "name": recipe.user_name},
+                "rating": (
+                    recipe.rating_sum / recipe.rating_count
+                    if recipe.rating_count
+                    else None
+                ),
+                "rating_count": recipe.rating_count,
+                "comments": recipe_comments,
+            },
+            option=orjson.OPT_APPEND_NEWLINE,
+        )
@@ -12,7 +12,7 @@ from wtforms.fields import (
 )
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
 
-from codeapp import bcrypt, db
+from codeapp import db, passwords
 from codeapp.models import User
 
 # useful links:
@@ -124,9 +124,7 @@ class UpdatePasswordForm(FlaskForm):
     submit_password = SubmitField("Change Password")
 
     def validate_current_password(self, current_password: PasswordField) -> None:
-        _stmt = select(User).filter(User.id == current_user.id).limit(1)
-        _user = db.session.execute(_stmt).scalars().first()
-        if not bcrypt.check_password_hash(_user.password, current_password.data):
+        if not passwords.check_password(current_user.password, current_password.data):
             raise ValidationError(
                 "Your current password did not match! "
                 "Please input the right password."
@@ -0,0 +1,202 @@
+"""
+Bulk import of recipes from JSON lines or CSV files, e.g., the catalog of a
+partner. Each record has the fields `title`, `content` (HTML), `email` (of an
+existing user, the author) and optionally `date_posted` (ISO 8601, converted
+to the local time of the server if it has a time zone):
+
+    {"title": "...", "content": "<p>...</p>", "email": "...", "date_posted": "..."}
+
+The file is read as a stream and processed in batches:
+
+- the records of the batch are validated, and the invalid ones are reported
+  and skipped;
+- the authors of the whole batch are found with one query, and kept in a
+  cache for the next batches;
+- the recipes are inserted with one Core `executemany`, without ORM objects,
+  and indexed for the search at once (see `codeapp.search.insert_recipes`),
+  and committed.
+
+After each batch, the number of records processed is written to a
+checkpoint file; an interrupted import continues after the last committed
+batch when run again (if it stops between the commit and the checkpoint,
+that batch is imported twice). In a dry run, the records are validated and
+the authors are found, but nothing is written.
+
+Use `python manage.py import`.
+"""
+
+from __future__ import annotations
+
+import csv
+import itertools
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+import orjson
+from sqlalchemy import select
+
+from codeapp import db
+from codeapp.models import User, make_excerpt
+from codeapp.search import insert_recipes
+
+# the maximum length of the titles, as in `Recipe.title`
+TITLE_LENGTH = 100
+# only the first invalid records are reported, all of them are counted
+MAX_ERRORS = 1000
+
+
+@dataclass
+class ImportStats:
+    # records read from the file in this run, valid or not
+    read: int = 0
+    imported: int = 0
+    invalid: int = 0
+    # records skipped because a previous run already imported them
+    skipped: int = 0
+    # seconds
+    elapsed: float = 0.0
+    # (number of the record, reason) of the first invalid records
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+    def report(self, number: int, reason: str) -> None:
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((number, reason))
+
+
+def read_records(file: TextIO, file_format: str) -> Iterator[Any]:
+    """
+    Yields the records of `file`, in the format `jsonl` or `csv`
+    (with a header line). Empty lines of JSON lines files are skipped,
+    and the lines that are not valid JSON are yielded as `None`.
+    """
+    if file_format == "csv":
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            try:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError:
+                yield None
+
+
+def validate(record: Any, now: datetime) -> Dict[str, Any]:
+    """
+    Returns the columns of the recipe in `record`, with the email of the
+    author instead of the id. Raises `ValueError` if the record is invalid.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("The record is not a JSON object.")
+    values: Dict[str, Any] = {}
+    for name in ("title", "content", "email"):
+        value = record.get(name)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"The `{name}` is missing.")
+        values[name] = value.strip()
+    if len(values["title"]) > TITLE_LENGTH:
+        raise ValueError(f"The `title` is longer than {TITLE_LENGTH} characters.")
+    values["excerpt"] = make_excerpt(values["content"])
+    date_posted = record.get("date_posted")
+    if date_posted:
+        try:
+            posted = datetime.fromisoformat(date_posted)
+        except (TypeError, ValueError) as e:
+            raise ValueError("The `date_posted` is not a valid date.") from e
+        if posted.tzinfo is not None:
+            # the app stores naive dates in the local time of the server
+            # (`datetime.now()`, UTC in production), so that they compare
+            posted = posted.astimezone().replace(tzinfo=None)
+        values["date_posted"] = posted
+    else:
+        values["date_posted"] = now
+    return values
+
+
+def _find_authors(emails: List[str], cache: Dict[str, Optional[int]]) -> None:
+    """
+    Adds the ids of the users with the `emails` not in the `cache` yet,
+    or `None` for the emails without user, with one query.
+    """
+    missing = {email for email in emails if email not in cache}
+    if len(missing) == 0:
+        return
+    cache.update(dict.fromkeys(missing))
+    cache.update(
+        db.session.execute(select(User.email, User.id).filter(User.email.in_(missing)))
+        .tuples()
+        .all()
+    )
+
+
+def _read_checkpoint(path: Optional[str]) -> int:
+    if path is None or not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as file:
+        processed: int = json.load(file)["processed"]
+    return processed
+
+
+def _write_checkpoint(path: str, processed: int) -> None:
+    # the checkpoint is replaced at once, so that it is never half written
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump({"processed": processed}, file)
+    os.replace(f"{path}.tmp", path)
+
+
+def import_recipes(
+    records: Iterator[Any],
+    batch_size: int = 10000,
+    checkpoint: Optional[str] = None,
+    dry_run: bool = False,
+) -> ImportStats:
+    """
+    Imports the `records` (see `read_records`) in batches of `batch_size`.
+    If `checkpoint` is given, the records processed by a previous run
+    are skipped, and the checkpoint is removed once all are imported.
+    """
+    stats = ImportStats()
+    start = time.perf_counter()
+    processed = _read_checkpoint(checkpoint)
+    stats.skipped = sum(1 for _ in itertools.islice(records, processed))
+    authors: Dict[str, Optional[int]] = {}
+    now = datetime.now()
+
+    while True:
+        batch = list(itertools.islice(records, batch_size))
+        if len(batch) == 0:
+            break
+        valid: List[Tuple[int, Dict[str, Any]]] = []
+        for number, record in enumerate(batch, start=processed + 1):
+            try:
+                valid.append((number, validate(record, now)))
+            except ValueError as e:
+                stats.report(number, str(e))
+        _find_authors([values["email"] for _, values in valid], authors)
+
+        rows: List[Dict[str, Any]] = []
+        for number, values in valid:
+            user_id = authors[values.pop("email")]
+            if user_id is None:
+                stats.report(number, "The author does not exist.")
+            else:
+                rows.append({**values, "user_id": user_id})
+
+        if not dry_run:
+            if len(rows) > 0:
+                insert_recipes(rows)
+            db.session.commit()
+            if checkpoint is not None:
+                _write_checkpoint(checkpoint, processed + len(batch))
+        processed += len(batch)
+        stats.read += len(batch)
+        stats.imported += len(rows)
+
+    if checkpoint is not None and not dry_run and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    stats.elapsed = time.perf_counter() - start
+    return stats
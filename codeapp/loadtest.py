@@ -0,0 +1,286 @@
+"""
+Load testing: sends many requests concurrently and measures their latency.
+
+The requests come from a log, in JSON lines with the fields `method`, `path`
+and optionally `data` (the form) and `name` (used to group the results):
+
+    {"method": "GET", "path": "/?title=cake", "name": "search"}
+    {"method": "POST", "path": "/login", "data": {"email": "...", ...}}
+
+or from a synthetic mix of the main pages (see `synthetic_mix`).
+They are sent to a running server (e.g., gunicorn) or to the Flask test
+client, which measures the app without the network and the server.
+
+Use `python manage.py loadtest`.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.cookiejar import CookieJar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from flask import Flask
+
+CSRF_TOKEN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    data: Optional[Dict[str, str]] = None
+    # requests with the same name are reported together
+    name: str = ""
+
+    def __post_init__(self) -> None:
+        self.method = self.method.upper()
+        self.name = self.name or f"{self.method} {self.path.split('?')[0]}"
+
+
+@dataclass
+class Result:
+    name: str
+    status: int
+    # seconds
+    latency: float
+
+
+@dataclass
+class Stats:
+    requests: int
+    errors: int
+    error_rate: float
+    throughput: float
+    # milliseconds
+    p50: float
+    p95: float
+    p99: float
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+
+def read_log(lines: Iterable[str]) -> List[Request]:
+    requests: List[Request] = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        if "path" not in entry:
+            raise ValueError(f"Line {number} of the log has no `path`.")
+        requests.append(
+            Request(
+                method=entry.get("method", "GET"),
+                path=entry["path"],
+                data=entry.get("data"),
+                name=entry.get("name", ""),
+            )
+        )
+    return requests
+
+
+def synthetic_mix(
+    count: int,
+    recipe_ids: List[int],
+    words: List[str],
+    login: Tuple[str, str] = ("default@chalmers.se", "testing"),
+    seed: int = 42,
+) -> List[Request]:
+    """
+    Mostly reads, like the real traffic: home pages, searches and recipe
+    details, with a few logins and registrations.
+    """
+    rng = random.Random(seed)
+    kinds = ["home", "search", "detail", "login", "register"]
+    weights = [40, 15, 35, 7, 3]
+    requests: List[Request] = []
+    for kind in rng.choices(kinds, weights, k=count):
+        if kind == "home":
+            requests.append(Request("GET", "/", name=kind))
+        elif kind == "search":
+            query = urlencode({"title": rng.choice(words or ["recipe"])})
+            requests.append(Request("GET", f"/?{query}", name=kind))
+        elif kind == "detail":
+            recipe_id = rng.choice(recipe_ids or [1])
+            requests.append(Request("GET", f"/recipe/{recipe_id}", name=kind))
+        elif kind == "login":
+            data = {"email": login[0], "password": login[1]}
+            requests.append(Request("POST", "/login", data, name=kind))
+        else:
+            email = f"loadtest-{uuid.UUID(int=rng.getrandbits(128)).hex}@example.com"
+            data = {
+                "name": "Load Test",
+                "email": email,
+                "password": "loadtest",
+                "confirm_password": "loadtest",
+            }
+            requests.append(Request("POST", "/register", data, name=kind))
+    return requests
+
+
+# sends a request and returns its status code
+Sender = Callable[[Request], int]
+
+
+def client_sender(app: Flask) -> Callable[[], Sender]:
+    """
+    Returns a function that creates, in each thread, a test client and
+    the function that sends the requests with it.
+    """
+
+    def _create() -> Sender:
+        client = app.test_client()
+
+        def _send(request: Request) -> int:
+            data = request.data
+            if data is not None and app.config.get("WTF_CSRF_ENABLED", True):
+                page = client.get(request.path).get_data(as_text=True)
+                data = {**data, "csrf_token": _csrf_token(page)}
+            return client.open(
+                request.path, method=request.method, data=data
+            ).status_code
+
+        return _send
+
+    return _create
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # the redirects are reported, not followed, like in the test client
+    def redirect_request(self, *_: Any, **__: Any) -> None:
+        return None
+
+
+def http_sender(base_url: str, timeout: float = 30) -> Callable[[], Sender]:
+    """
+    Like `client_sender`, for a server running at `base_url`.
+    """
+    base_url = base_url.rstrip("/")
+
+    def _create() -> Sender:
+        # each thread is a user, with its own cookies
+        opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect()
+        )
+
+        def _open(path: str, data: Optional[Dict[str, str]] = None) -> Tuple[int, str]:
+            body = None if data is None else urlencode(data).encode()
+            try:
+                with opener.open(base_url + path, body, timeout) as response:
+                    return response.status, response.read().decode()
+            except urllib.error.HTTPError as error:
+                return error.code, ""
+
+        def _send(request: Request) -> int:
+            data = request.data
+            if data is not None:
+                _, page = _open(request.path)
+                data = {**data, "csrf_token": _csrf_token(page)}
+            return _open(request.path, data)[0]
+
+        return _send
+
+    return _create
+
+
+def _csrf_token(page: str) -> str:
+    match = CSRF_TOKEN.search(page)
+    return match.group(1) if match else ""
+
+
+def run(
+    requests: List[Request], create_sender: Callable[[], Sender], concurrency: int
+) -> Tuple[List[Result], float]:
+    """
+    Sends the `requests` from `concurrency` threads, each taking the next
+    request as soon as it gets the previous response.
+    Returns the results and the total time, in seconds.
+    """
+    pending: Iterator[Request] = iter(requests)
+    lock = threading.Lock()
+    results: List[Result] = []
+
+    def _worker() -> None:
+        send = create_sender()
+        while True:
+            with lock:
+                request = next(pending, None)
+            if request is None:
+                return
+            start_time = time.perf_counter()
+            try:
+                status = send(request)
+            except Exception:  # pylint: disable=broad-except
+                # e.g., the connection was refused
+                status = 0
+            result = Result(request.name, status, time.perf_counter() - start_time)
+            with lock:
+                results.append(result)
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        for future in [executor.submit(_worker) for _ in range(concurrency)]:
+            future.result()
+    return results, time.perf_counter() - start_time
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile, `q` between 0 and 100.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(results: List[Result], elapsed: float) -> Dict[str, Stats]:
+    """
+    Statistics per name of request, and of all of them (`total`).
+    Errors are the responses with status 5xx, and the requests without
+    response (status 0), e.g., refused connections or exceptions raised
+    by the app in the test client.
+    """
+    stats: Dict[str, Stats] = {}
+    by_name = sorted(results, key=lambda result: result.name)
+    groups = [
+        (name, list(group))
+        for name, group in itertools.groupby(by_name, key=lambda r: r.name)
+    ]
+    for name, group in groups + [("total", results)]:
+        latencies = [result.latency * 1000 for result in group]
+        errors = sum(
+            1 for result in group if result.status == 0 or result.status >= 500
+        )
+        statuses: Dict[str, int] = {}
+        for result in group:
+            statuses[str(result.status)] = statuses.get(str(result.status), 0) + 1
+        stats[name] = Stats(
+            requests=len(group),
+            errors=errors,
+            error_rate=errors / len(group) if group else 0.0,
+            throughput=len(group) / elapsed if elapsed > 0 else 0.0,
+            p50=percentile(latencies, 50),
+            p95=percentile(latencies, 95),
+            p99=percentile(latencies, 99),
+            statuses=dict(sorted(statuses.items())),
+        )
+    return stats
+
+
+def to_json(stats: Dict[str, Stats], **metadata: Any) -> str:
+    return json.dumps(
+        {**metadata, "routes": {name: asdict(s) for name, s in stats.items()}},
+        indent=2,
+    )
@@ -0,0 +1,126 @@
+"""
+Logging that does not block the requests.
+
+The handlers configured with `dictConfig` (console and files) are moved
+behind a queue: the loggers only put the records in the queue, and a
+`QueueListener` thread writes them, including the rotation of the files.
+
+The level of the root logger comes from `LOG_LEVEL`, per environment,
+`LOG_JSON` writes one JSON object per line, and `LOG_DEBUG_SAMPLE=N`
+keeps only one in N debug messages from each line of code.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import queue
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask
+
+# the loggers whose handlers were moved behind a queue, by name
+_queue_handlers: Dict[str, QueueHandler] = {}
+_listeners: Dict[str, QueueListener] = {}
+# formatters configured with `dictConfig`, used when `LOG_JSON` is not set
+_formatters: Dict[logging.Handler, Optional[logging.Formatter]] = {}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            # includes the traceback, added when the record was queued
+            "message": record.getMessage(),
+        }
+        return json.dumps(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps the first and then one in every `rate` debug records from each
+    line of code. The records of the other levels are always kept.
+    """
+
+    def __init__(self, rate: int = 1) -> None:
+        super().__init__()
+        self.rate = max(1, rate)
+        self._seen: Counter[Tuple[str, int]] = Counter()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate == 1 or record.levelno > logging.DEBUG:
+            return True
+        with self._lock:
+            seen = self._seen[(record.pathname, record.lineno)]
+            self._seen[(record.pathname, record.lineno)] += 1
+        return seen % self.rate == 0
+
+
+def start(*names: str) -> None:
+    """
+    Moves the handlers of the loggers (`""` is the root logger) behind
+    a queue, and starts the threads that write the records.
+    """
+    for name in names:
+        logger = logging.getLogger(name)
+        handlers: List[logging.Handler] = list(logger.handlers)
+        for handler in handlers:
+            logger.removeHandler(handler)
+            _formatters[handler] = handler.formatter
+        queue_handler = QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(SamplingFilter())
+        logger.addHandler(queue_handler)
+        _queue_handlers[name] = queue_handler
+        _listeners[name] = QueueListener(
+            queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        _listeners[name].start()
+
+
+def stop() -> None:
+    """
+    Writes the records still in the queues and stops the threads.
+    """
+    for listener in _listeners.values():
+        if listener._thread is not None:  # pylint: disable=protected-access
+            listener.stop()
+
+
+def restart() -> None:
+    """
+    Starts new threads with new queues, e.g., in the processes forked by
+    gunicorn, which do not inherit the threads of the parent process.
+    """
+    for name, listener in _listeners.items():
+        queue_handler = _queue_handlers[name]
+        queue_handler.queue = queue.SimpleQueue()
+        _listeners[name] = QueueListener(
+            queue_handler.queue, *listener.handlers, respect_handler_level=True
+        )
+        _listeners[name].start()
+
+
+def init_app(app: Flask) -> None:
+    root = logging.getLogger()
+    root.setLevel(app.config["LOG_LEVEL"])
+    for name, listener in _listeners.items():
+        for _filter in _queue_handlers[name].filters:
+            if isinstance(_filter, SamplingFilter):
+                _filter.rate = max(1, app.config["LOG_DEBUG_SAMPLE"])
+        for handler in listener.handlers:
+            handler.setFormatter(
+                JSONFormatter() if app.config["LOG_JSON"] else _formatters[handler]
+            )
+
+
+atexit.register(stop)
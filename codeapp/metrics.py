@@ -0,0 +1,214 @@
+# pylint: disable=cyclic-import
+"""
+Metrics of the running process, such as the use of the database pool.
+
+The metrics are kept in memory, per process (i.e., per gunicorn worker),
+and are exposed in the Prometheus text format at `/metrics` when
+`METRICS_ENABLED` is set.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import Flask, Response
+from sqlalchemy import event, exc
+from sqlalchemy.pool import Pool, QueuePool
+
+from codeapp import db, limiter
+
+Sample = Tuple[str, float]
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str) -> None:
+        super().__init__(name, documentation)
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, self.value)]
+
+
+class Gauge(Metric):
+    """
+    Gauge whose value is read from `function` when the metrics are collected.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, function: Callable[[], float]
+    ) -> None:
+        super().__init__(name, documentation)
+        self.function = function
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, self.function())]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float]) -> None:
+        super().__init__(name, documentation)
+        self.buckets = sorted(buckets)
+        # the last position counts the observations above all the buckets
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples: List[Sample] = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            samples.append((f'{self.name}_bucket{{le="{bound}"}}', cumulative))
+        samples.append((f'{self.name}_bucket{{le="+Inf"}}', sum(counts)))
+        samples.append((f"{self.name}_sum", total))
+        samples.append((f"{self.name}_count", sum(counts)))
+        return samples
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Any:
+        """
+        Adds `metric`, replacing any metric with the same name, and returns it.
+        """
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, value in metric.samples():
+                lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+pool_wait: Histogram = registry.register(
+    Histogram(
+        "db_pool_wait_seconds",
+        "Time waiting for a connection from the pool.",
+        LATENCY_BUCKETS,
+    )
+)
+pool_checkouts: Counter = registry.register(
+    Counter("db_pool_checkouts_total", "Connections taken from the pool.")
+)
+pool_timeouts: Counter = registry.register(
+    Counter(
+        "db_pool_timeouts_total",
+        "Requests for a connection that timed out because the pool was exhausted.",
+    )
+)
+
+password_wait: Histogram = registry.register(
+    Histogram(
+        "password_pool_wait_seconds",
+        "Time a password hash waited for a thread of the hashing pool.",
+        LATENCY_BUCKETS,
+    )
+)
+password_rejections: Counter = registry.register(
+    Counter(
+        "password_pool_rejections_total",
+        "Password hashes refused (503) because the hashing pool was full.",
+    )
+)
+
+
+class TimedQueuePool(QueuePool):
+    """
+    `QueuePool` that measures how long each checkout waits for a connection,
+    which grows when the pool is too small for the load.
+    """
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts.inc()
+            raise
+        finally:
+            pool_wait.observe(time.perf_counter() - start)
+
+
+@event.listens_for(Pool, "checkout")
+def _count_checkout(*_: Any) -> None:
+    pool_checkouts.inc()
+
+
+def _pool_gauges(pool: Pool) -> None:
+    for name, documentation, attribute in [
+        ("db_pool_size", "Connections kept open by the pool.", "size"),
+        ("db_pool_checked_out", "Connections currently in use.", "checkedout"),
+        ("db_pool_overflow", "Connections open above the pool size.", "overflow"),
+    ]:
+        function: Optional[Callable[[], float]] = getattr(pool, attribute, None)
+        if function is not None:
+            registry.register(Gauge(name, documentation, function))
+
+
+def init_app(app: Flask) -> None:
+    """
+    Must be called before `db.init_app`, so that the pool is instrumented.
+    """
+    options: Dict[str, Any] = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+    uri: str = app.config.get("SQLALCHEMY_DATABASE_URI") or ""
+    # in-memory SQLite databases need their own pool classes
+    if "poolclass" not in options and uri not in ("sqlite://", "sqlite:///:memory:"):
+        options["poolclass"] = TimedQueuePool
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
+
+    if app.config.get("METRICS_ENABLED", False):
+
+        # scraped often, therefore not subject to the rate limits
+        @limiter.exempt
+        def metrics() -> Response:
+            _pool_gauges(db.engine.pool)
+            return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+        app.add_url_rule("/metrics", "metrics", metrics)
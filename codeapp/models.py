@@ -1,16 +1,45 @@
 from __future__ import annotations
 
 # python built-in imports
+import threading
+import time
 from dataclasses import dataclass, field
 from datetime import datetime
 
 # from mimetypes import init
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 # python external modules
+from flask import current_app
 from flask_login import UserMixin
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, select
-from sqlalchemy.orm import registry, relationship
+from markupsafe import Markup
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    bindparam,
+    event,
+    func,
+    inspect,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import (
+    Mapper,
+    Session,
+    column_property,
+    make_transient_to_detached,
+    object_session,
+    registry,
+    relationship,
+)
+from sqlalchemy.orm.util import identity_key
 
 # app imports
 from codeapp import db, login_manager
@@ -26,10 +55,63 @@ from codeapp import db, login_manager
 mapper_registry: registry = registry(metadata=db.metadata)
 
 
+# users loaded by `load_user`, by id, with the time until when they can be
+# reused; kept by each process and removed when the user changes
+_user_cache: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+_user_cache_lock = threading.Lock()
+# expired users are removed when the cache grows above this size
+USER_CACHE_SIZE = 10000
+
+# length of the plain-text excerpts shown in the cards of the recipes
+# and in the comments
+EXCERPT_LENGTH = 400
+
+
+def make_excerpt(content: str, length: int = EXCERPT_LENGTH) -> str:
+    """
+    Returns the text of the HTML `content`, truncated at a word boundary,
+    exactly like the `striptags` and `truncate` filters of Jinja did when
+    the excerpts were computed in the templates.
+    """
+    text = Markup(content).striptags()
+    # Jinja's default leeway: texts up to 5 characters longer are kept
+    if len(text) <= length + 5:
+        return text
+    return text[: length - 3].rsplit(" ", 1)[0] + "..."
+
+
 @login_manager.user_loader
 def load_user(user_id: int) -> UserMixin:
-    stmt = select(User).where(User.id == user_id).limit(1)
-    return db.session.execute(stmt).scalars().first()
+    user_id = int(user_id)
+    ttl: float = current_app.config.get("USER_CACHE_TTL", 0)
+    if ttl > 0:
+        with _user_cache_lock:
+            expires, values = _user_cache.get(user_id, (0.0, {}))
+        if expires > time.monotonic():
+            user = User(**values)
+            user.id = user_id
+            # adds the user to the session as if it had been loaded
+            make_transient_to_detached(user)
+            return db.session.merge(user, load=False)
+    # the identity map of the session avoids the query
+    # if the user was already loaded in this request
+    user = db.session.get(User, user_id)
+    if user is not None and ttl > 0:
+        with _user_cache_lock:
+            if len(_user_cache) >= USER_CACHE_SIZE:
+                now = time.monotonic()
+                for key in [k for k, v in _user_cache.items() if v[0] <= now]:
+                    del _user_cache[key]
+            _user_cache[user_id] = (
+                time.monotonic() + ttl,
+                {"name": user.name, "email": user.email, "password": user.password},
+            )
+    return user
+
+
+def forget_user(user_id: int) -> None:
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
 
 
 @mapper_registry.mapped
@@ -93,6 +175,13 @@ class User(UserMixin):
 class Recipe:
     __tablename__ = "recipe"
     __sa_dataclass_metadata_key__ = "sa"
+    __table_args__ = (
+        # backs the keyset pagination of the home page,
+        # which is ordered by (date_posted, id)
+        Index("ix_recipe_date_posted_id", "date_posted", "id"),
+        # backs `User.recipes`, which is ordered by date_posted
+        Index("ix_recipe_user_id_date_posted", "user_id", "date_posted"),
+    )
     id: int = field(
         init=False,
         metadata={"sa": Column(Integer(), primary_key=True, autoincrement=True)},
@@ -107,6 +196,41 @@ class Recipe:
     content: str = field(
         metadata={"sa": Column(Text(), nullable=False)},
     )
+    # plain-text beginning of the content, shown in the cards; kept up to
+    # date by the events at the end of this file, NULL until it is computed
+    # for the rows written without it (see `backfill_excerpts`)
+    excerpt: Optional[str] = field(
+        init=False,
+        default=None,
+        repr=False,
+        metadata={"sa": Column(Text(), nullable=True)},
+    )
+    # denormalized aggregates of the grades of this recipe,
+    # kept up to date by the events at the end of this file
+    rating_sum: int = field(
+        init=False,
+        default=0,
+        metadata={
+            "sa": Column(Integer(), nullable=False, default=0, server_default="0")
+        },
+    )
+    rating_count: int = field(
+        init=False,
+        default=0,
+        metadata={
+            "sa": Column(Integer(), nullable=False, default=0, server_default="0")
+        },
+    )
+    # incremented whenever anything shown in the pages of the recipe changes
+    # (the recipe itself, its author, comments and grades);
+    # used to invalidate the cached fragments, see `codeapp/cache.py`
+    version: int = field(
+        init=False,
+        default=1,
+        metadata={
+            "sa": Column(Integer(), nullable=False, default=1, server_default="1")
+        },
+    )
 
     # one-to-many relationship: one recipe can have zero, one or many comments
     comments: List[Comment] = field(
@@ -144,12 +268,27 @@ class Recipe:
         metadata={"sa": Column(Integer(), ForeignKey("user.id"), nullable=False)},
     )
 
+    @property
+    def rating(self) -> Optional[float]:
+        """
+        Average score of the recipe, or `None` if it has not been graded yet.
+        """
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
 
 @mapper_registry.mapped
 @dataclass
 class Comment:
     __tablename__ = "comment"
     __sa_dataclass_metadata_key__ = "sa"
+    __table_args__ = (
+        # back `Recipe.comments` and `User.comments`,
+        # which are ordered by date_posted
+        Index("ix_comment_recipe_id_date_posted", "recipe_id", "date_posted"),
+        Index("ix_comment_user_id_date_posted", "user_id", "date_posted"),
+    )
     id: int = field(
         init=False,
         metadata={"sa": Column(Integer(), primary_key=True, autoincrement=True)},
@@ -161,6 +300,14 @@ class Comment:
     date_posted: datetime = field(
         metadata={"sa": Column(DateTime(), nullable=False)},
     )
+    # plain-text beginning of the content, shown in the page of the recipe;
+    # NULL until it is computed, like the excerpt of the recipes
+    excerpt: Optional[str] = field(
+        init=False,
+        default=None,
+        repr=False,
+        metadata={"sa": Column(Text(), nullable=True)},
+    )
     # one-to-many relationship: one comment only belongs to one user
     user: User = field(
         repr=False,
@@ -187,12 +334,22 @@ class Comment:
 class Grade:
     __tablename__ = "grade"
     __sa_dataclass_metadata_key__ = "sa"
+    __table_args__ = (
+        # each user grades each recipe at most once;
+        # the constraint also backs `User.grades`
+        UniqueConstraint("user_id", "recipe_id", name="uq_grade_user_id_recipe_id"),
+        Index("ix_grade_recipe_id", "recipe_id"),
+    )
     id: int = field(
         init=False,
         metadata={"sa": Column(Integer(), primary_key=True, autoincrement=True)},
     )
+    # `active_history` loads the previous value before it is replaced,
+    # which is needed to update the rating aggregates of the recipe
     score: int = field(
-        metadata={"sa": Column(Integer())},
+        metadata={
+            "sa": column_property(Column("score", Integer()), active_history=True)
+        },
     )
     # one-to-many relationship: one grade only belongs to one user
     user: User = field(
@@ -211,5 +368,252 @@ class Grade:
     )
     recipe_id: Optional[int] = field(
         default=None,
-        metadata={"sa": Column(Integer(), ForeignKey("recipe.id"), nullable=False)},
+        metadata={
+            "sa": column_property(
+                Column("recipe_id", Integer(), ForeignKey("recipe.id"), nullable=False),
+                active_history=True,
+            )
+        },
     )
+
+
+"""
+The events below keep `Recipe.rating_sum` and `Recipe.rating_count` in sync
+with the grades, and increment `Recipe.version` whenever anything shown in
+the pages of the recipe changes. The recipe row is updated with an atomic
+`UPDATE ... SET rating_sum = rating_sum + :delta` issued in the same
+transaction that writes the grade, so concurrent grades do not overwrite
+each other.
+They also keep the excerpts of the recipes and comments in sync with their
+content, so that the pages do not strip and truncate the HTML each time.
+Note that bulk (Core) inserts bypass these events; after those, the
+aggregates must be rebuilt with `recompute_ratings()`, and the excerpts
+must be given in the inserted rows or filled with `backfill_excerpts()`.
+"""
+
+
+def _mark_stale(target: Any, recipe_ids: Set[Optional[int]]) -> None:
+    # the recipes might be loaded in the session; their updated columns are
+    # expired once the flush finishes, so that they are reloaded when accessed
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("stale_recipes", set()).update(recipe_ids)
+
+
+def _update_rating(
+    connection: Connection,
+    target: Grade,
+    recipe_id: Optional[int],
+    score_delta: int,
+    count_delta: int,
+) -> None:
+    connection.execute(
+        update(Recipe)
+        .where(Recipe.id == recipe_id)
+        .values(
+            rating_sum=Recipe.rating_sum + score_delta,
+            rating_count=Recipe.rating_count + count_delta,
+            version=Recipe.version + 1,
+        )
+    )
+    _mark_stale(target, {recipe_id})
+
+
+def _bump_versions(connection: Connection, target: Any, *recipe_ids: Any) -> None:
+    ids = set(recipe_ids)
+    connection.execute(
+        update(Recipe).where(Recipe.id.in_(ids)).values(version=Recipe.version + 1)
+    )
+    _mark_stale(target, ids)
+
+
+@event.listens_for(Grade, "after_insert")
+def _grade_inserted(_: Mapper, connection: Connection, target: Grade) -> None:
+    _update_rating(connection, target, target.recipe_id, target.score or 0, 1)
+
+
+@event.listens_for(Grade, "after_delete")
+def _grade_deleted(_: Mapper, connection: Connection, target: Grade) -> None:
+    _update_rating(connection, target, target.recipe_id, -(target.score or 0), -1)
+
+
+@event.listens_for(Grade, "after_update")
+def _grade_updated(_: Mapper, connection: Connection, target: Grade) -> None:
+    state = inspect(target)
+    score_history = state.attrs.score.history
+    recipe_history = state.attrs.recipe_id.history
+    if not score_history.has_changes() and not recipe_history.has_changes():
+        return
+    old_score = score_history.deleted[0] if score_history.deleted else target.score
+    old_recipe_id = (
+        recipe_history.deleted[0] if recipe_history.deleted else target.recipe_id
+    )
+    _update_rating(connection, target, old_recipe_id, -(old_score or 0), -1)
+    _update_rating(connection, target, target.recipe_id, target.score or 0, 1)
+
+
+@event.listens_for(Comment, "after_insert")
+@event.listens_for(Comment, "after_delete")
+def _comment_changed(_: Mapper, connection: Connection, target: Comment) -> None:
+    _bump_versions(connection, target, target.recipe_id)
+
+
+@event.listens_for(Comment, "after_update")
+def _comment_updated(_: Mapper, connection: Connection, target: Comment) -> None:
+    # a comment moved to another recipe changes both
+    _bump_versions(
+        connection,
+        target,
+        target.recipe_id,
+        *inspect(target).attrs.recipe_id.history.deleted,
+    )
+
+
+@event.listens_for(Recipe, "before_insert")
+@event.listens_for(Comment, "before_insert")
+def _content_inserted(_: Mapper, __: Connection, target: Any) -> None:
+    target.excerpt = make_excerpt(target.content)
+
+
+@event.listens_for(Recipe, "before_update")
+@event.listens_for(Comment, "before_update")
+def _content_updated(_: Mapper, __: Connection, target: Any) -> None:
+    if inspect(target).attrs.content.history.has_changes():
+        target.excerpt = make_excerpt(target.content)
+
+
+@event.listens_for(Recipe, "before_update")
+def _recipe_updated(_: Mapper, __: Connection, target: Recipe) -> None:
+    state = inspect(target)
+    if any(
+        state.attrs[name].history.has_changes()
+        for name in ("title", "content", "date_posted", "user_id")
+    ):
+        # evaluated by the database, like the increments above
+        target.version = Recipe.version + 1  # type: ignore
+
+
+@event.listens_for(User, "after_update")
+def _user_updated(_: Mapper, connection: Connection, target: User) -> None:
+    # the name of the users is shown in their recipes and comments
+    if not inspect(target).attrs.name.history.has_changes():
+        return
+    recipe_ids = (
+        select(Recipe.id)
+        .where(Recipe.user_id == target.id)
+        .union(select(Comment.recipe_id).where(Comment.user_id == target.id))
+    )
+    connection.execute(
+        update(Recipe)
+        .where(Recipe.id.in_(recipe_ids))
+        .values(version=Recipe.version + 1)
+    )
+    session = object_session(target)
+    if session is not None:
+        session.info["stale_recipes_all"] = True
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(_: Mapper, __: Connection, target: User) -> None:
+    # e.g., the profile or the password changed
+    forget_user(target.id)
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def _expire_stale_recipes(session: Session, _: Any) -> None:
+    stale: Set[int] = session.info.pop("stale_recipes", set())
+    if session.info.pop("stale_recipes_all", False):
+        stale.update(
+            key[1][0] for key in session.identity_map.keys() if key[0] is Recipe
+        )
+    for recipe_id in stale:
+        recipe = session.identity_map.get(identity_key(Recipe, recipe_id))
+        if recipe is not None:
+            session.expire(recipe, ["rating_sum", "rating_count", "version"])
+
+
+def recompute_ratings() -> None:
+    """
+    Rebuilds the rating aggregates of all the recipes from the grades table.
+    The grades are aggregated once and joined to the recipes (`UPDATE ... FROM`),
+    which does not depend on an index on `grade.recipe_id` as correlated
+    subqueries would. The caller must commit the session.
+    """
+    aggregates = (
+        select(
+            Grade.recipe_id.label("recipe_id"),
+            func.sum(Grade.score).label("rating_sum"),
+            func.count(Grade.id).label("rating_count"),
+        )
+        .group_by(Grade.recipe_id)
+        .subquery()
+    )
+    db.session.execute(
+        update(Recipe).values(rating_sum=0, rating_count=0),
+        execution_options={"synchronize_session": False},
+    )
+    db.session.execute(
+        update(Recipe)
+        .where(Recipe.id == aggregates.c.recipe_id)
+        .values(
+            rating_sum=aggregates.c.rating_sum,
+            rating_count=aggregates.c.rating_count,
+        ),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def backfill_excerpts(batch_size: int = 1000) -> int:
+    """
+    Computes the excerpts of the recipes and comments that do not have one
+    (NULL, e.g., created before the excerpts were stored), in batches of
+    `batch_size` rows, committing after each batch.
+    The pages showed an empty excerpt for those rows, therefore the version
+    of the recipes is incremented only when their excerpt (or the excerpt of
+    one of their comments) is not empty, so that their cached cards and pages
+    are not reused.
+    Returns the number of rows updated.
+    """
+    recipes = Recipe.__table__  # type: ignore
+    comments = Comment.__table__  # type: ignore
+    updated = 0
+    for table in (recipes, comments):
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(table)
+                .where(table.c.id > last_id, table.c.excerpt.is_(None))
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if len(rows) == 0:
+                break
+            excerpts = {row.id: make_excerpt(row.content) for row in rows}
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("_id"))
+                .values(excerpt=bindparam("_excerpt"))
+            )
+            db.session.execute(
+                statement,
+                [
+                    {"_id": id_, "_excerpt": excerpt}
+                    for id_, excerpt in excerpts.items()
+                ],
+            )
+            changed = [row for row in rows if excerpts[row.id] != ""]
+            if table is recipes:
+                changed_ids = {row.id for row in changed}
+            else:
+                changed_ids = {row.recipe_id for row in changed}
+            if len(changed_ids) > 0:
+                db.session.execute(
+                    update(recipes)
+                    .where(recipes.c.id.in_(changed_ids))
+                    .values(version=recipes.c.version + 1)
+                )
+            db.session.commit()
+            last_id = rows[-1].id
+            updated += len(rows)
+    return updated
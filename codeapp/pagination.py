@@ -0,0 +1,126 @@
+"""
+Keyset (cursor-based) pagination helpers.
+
+Instead of using `OFFSET`, which forces the database to walk over all the
+skipped rows, each page is fetched with a `WHERE (key1, key2) > (:v1, :v2)`
+condition that can be answered directly by an index on the key columns.
+The cost of fetching any page is therefore independent of its position.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+from sqlalchemy import DateTime, tuple_
+from sqlalchemy.sql.expression import ColumnElement, Select
+
+from codeapp import db
+
+T = TypeVar("T")
+
+
+@dataclass
+class Page(Generic[T]):
+    items: List[T]
+    # cursor pointing to the page after this one, if there is one
+    next_cursor: Optional[str] = None
+    # cursor pointing to the page before this one, if there is one
+    prev_cursor: Optional[str] = None
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encodes the key values of a row into an opaque, URL-safe string.
+    """
+    _values = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    _raw = json.dumps(_values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(_raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[ColumnElement[Any]]) -> Tuple[Any, ...]:
+    """
+    Decodes a cursor generated by `encode_cursor`.
+    The `keys` are used to convert the values back to their original types.
+    Raises `ValueError` if the cursor is malformed.
+    """
+    try:
+        _raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        _values = json.loads(_raw)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(_values, list) or len(_values) != len(keys):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    values: List[Any] = []
+    for key, value in zip(keys, _values):
+        if isinstance(key.type, DateTime):
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Invalid cursor: {cursor}") from e
+        values.append(value)
+    return tuple(values)
+
+
+def paginate(
+    statement: Select,
+    keys: Sequence[ColumnElement[Any]],
+    per_page: int,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+) -> Page[Any]:
+    """
+    Executes `statement` returning one page of results ordered by `keys`.
+
+    The `keys` must identify a row uniquely (e.g., `(date_posted, id)`)
+    and should be backed by a composite index.
+    `after` returns the page following the cursor,
+    `before` returns the page preceding the cursor,
+    and if none is given the first page is returned.
+
+    If the statement selects a single entity, the items of the page are
+    the entities themselves, otherwise they are the result rows.
+    """
+    backwards = before is not None and after is None
+    cursor = before if backwards else after
+
+    num_columns = len(statement.column_descriptions)
+    labels = [f"_key_{i}" for i in range(len(keys))]
+    statement = statement.add_columns(
+        *[key.label(label) for key, label in zip(keys, labels)]
+    )
+
+    if cursor is not None:
+        values = decode_cursor(cursor, keys)
+        if backwards:
+            statement = statement.filter(tuple_(*keys) < tuple_(*values))
+        else:
+            statement = statement.filter(tuple_(*keys) > tuple_(*values))
+
+    if backwards:
+        statement = statement.order_by(*[key.desc() for key in keys])
+    else:
+        statement = statement.order_by(*keys)
+
+    # fetching one extra row tells us if there is another page
+    rows = db.session.execute(statement.limit(per_page + 1)).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    page: Page[Any] = Page(items=[row[0] if num_columns == 1 else row for row in rows])
+    if len(rows) > 0:
+        first = encode_cursor([getattr(rows[0], label) for label in labels])
+        last = encode_cursor([getattr(rows[-1], label) for label in labels])
+        if backwards:
+            page.next_cursor = last
+            page.prev_cursor = first if has_more else None
+        else:
+            page.next_cursor = last if has_more else None
+            page.prev_cursor = first if cursor is not None else None
+    return page
@@ -0,0 +1,115 @@
+# pylint: disable=cyclic-import
+"""
+Hashing and checking of the passwords.
+
+The cost of bcrypt (`BCRYPT_LOG_ROUNDS`) is set per environment: each
+additional round doubles the CPU time of hashing, which is spent on every
+login. Passwords hashed with another cost are hashed again with the current
+cost when the user logs in, so that changing the cost applies to all users
+over time. Use `python manage.py bench-bcrypt` to choose the cost.
+
+The hashes are computed by a pool of `PASSWORD_POOL_SIZE` threads (bcrypt
+releases the GIL while hashing), with at most `PASSWORD_POOL_QUEUE` hashes
+waiting for a thread. When the queue is full, the request fails right away
+with 503 instead of making every request wait behind it.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from flask import Flask, current_app
+from werkzeug.exceptions import ServiceUnavailable
+
+from codeapp import bcrypt, metrics
+from codeapp.models import User
+
+T = TypeVar("T")
+
+
+class PasswordPoolFull(ServiceUnavailable):
+    description = "The server is busy. Please try again in a few seconds."
+
+
+class PasswordPool:
+    def __init__(self, size: int, queue_size: int, retry_after: int) -> None:
+        self.size = size
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        # hashes running or waiting for a thread
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(size, thread_name_prefix="passwords")
+
+    def run(self, function: Callable[..., T], *args: Any) -> T:
+        with self._lock:
+            if self.pending >= self.size + self.queue_size:
+                metrics.password_rejections.inc()
+                raise PasswordPoolFull(retry_after=self.retry_after)
+            self.pending += 1
+        submitted = time.perf_counter()
+
+        def _task() -> T:
+            metrics.password_wait.observe(time.perf_counter() - submitted)
+            return function(*args)
+
+        try:
+            return self._executor.submit(_task).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+
+def init_app(app: Flask) -> None:
+    pool = PasswordPool(
+        size=app.config["PASSWORD_POOL_SIZE"],
+        queue_size=app.config["PASSWORD_POOL_QUEUE"],
+        retry_after=app.config["PASSWORD_POOL_RETRY_AFTER"],
+    )
+    app.extensions["password_pool"] = pool
+    metrics.registry.register(
+        metrics.Gauge(
+            "password_pool_size", "Threads of the hashing pool.", lambda: pool.size
+        )
+    )
+    metrics.registry.register(
+        metrics.Gauge(
+            "password_pool_pending",
+            "Password hashes running or waiting for a thread.",
+            lambda: pool.pending,
+        )
+    )
+
+
+def get_pool() -> PasswordPool:
+    pool: PasswordPool = current_app.extensions["password_pool"]
+    return pool
+
+
+def hash_password(password: str) -> str:
+    hashed: bytes = get_pool().run(bcrypt.generate_password_hash, password)
+    return hashed.decode("utf-8")
+
+
+def check_password(hashed: str, password: str) -> bool:
+    return get_pool().run(bcrypt.check_password_hash, hashed, password)
+
+
+def get_cost(hashed: str) -> int:
+    # the hashes look like $2b$12$<salt><hash>
+    return int(hashed.split("$")[2])
+
+
+def check_and_rehash(user: User, password: str) -> bool:
+    """
+    Checks the password of `user`. If it is correct, but was hashed with
+    another cost, replaces the hash of `user`; the caller must commit.
+    """
+    if not check_password(user.password, password):
+        return False
+    if get_cost(user.password) != current_app.config["BCRYPT_LOG_ROUNDS"]:
+        user.password = hash_password(password)
+    return True
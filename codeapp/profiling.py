@@ -0,0 +1,126 @@
+# pylint: disable=cyclic-import
+"""
+Opt-in profiling of the SQL statements executed by each request.
+
+When `SQL_PROFILING` is enabled, every statement is timed through the
+`before_cursor_execute`/`after_cursor_execute` events of SQLAlchemy, and:
+
+- the number of statements, the total time spent in the database and the
+  durations of the slowest statements of each request are sent in the
+  `Server-Timing` header, which is shown by the developer tools of the
+  browsers; the text of the statements is added only in debug mode;
+- statements slower than `SQL_SLOW_QUERY_MS` milliseconds are written to the
+  `codeapp.slow_query` logger, which has its own log file. Only the types of
+  the parameters are logged, never their values (e.g., password hashes or
+  e-mail addresses).
+
+When disabled (the default), no event listener is installed at all.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Tuple
+
+from flask import Flask, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from werkzeug.wrappers import Response
+
+from codeapp import db
+
+slow_query_logger = logging.getLogger("codeapp.slow_query")
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    # total time spent executing statements, in seconds
+    duration: float = 0.0
+    # (duration, statement) of every statement executed
+    statements: List[Tuple[float, str]] = field(default_factory=list)
+
+    def slowest(self, number: int) -> List[Tuple[float, str]]:
+        return sorted(self.statements, key=lambda x: x[0], reverse=True)[:number]
+
+
+def get_query_stats() -> QueryStats:
+    """
+    Returns the statistics of the current request,
+    creating them if this is the first statement.
+    """
+    if "query_stats" not in g:
+        g.query_stats = QueryStats()
+    stats: QueryStats = g.query_stats
+    return stats
+
+
+def _header_value(text: str, size: int = 60) -> str:
+    # descriptions are quoted strings, therefore quotes and backslashes
+    # must not appear, and neither may line breaks
+    text = " ".join(text.split()).replace("\\", "").replace('"', "'")
+    return text if len(text) <= size else text[: size - 3] + "..."
+
+
+def _parameter_types(parameters: Any, executemany: bool) -> str:
+    if executemany:
+        return f"{len(parameters)} rows"
+    values = parameters.values() if isinstance(parameters, dict) else parameters
+    return "(" + ", ".join(type(value).__name__ for value in values or ()) + ")"
+
+
+def init_app(app: Flask) -> None:
+    """
+    Installs the profiling hooks if `SQL_PROFILING` is enabled in the config.
+    """
+    if not app.config.get("SQL_PROFILING", False):
+        return
+
+    threshold: float = app.config.get("SQL_SLOW_QUERY_MS", 100) / 1000
+    top: int = app.config.get("SQL_PROFILING_TOP", 3)
+
+    def _before_cursor_execute(conn: Connection, *_: Any) -> None:
+        # a stack supports statements issued while another one is running
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def _after_cursor_execute(
+        conn: Connection,
+        _cursor: Any,
+        statement: str,
+        parameters: Any,
+        _context: Any,
+        executemany: bool,
+    ) -> None:
+        duration = time.perf_counter() - conn.info["query_start"].pop()
+        if has_request_context():
+            stats = get_query_stats()
+            stats.count += 1
+            stats.duration += duration
+            stats.statements.append((duration, statement))
+        if duration >= threshold:
+            slow_query_logger.warning(
+                "%.2f ms in %s: %s | parameters: %s",
+                duration * 1000,
+                request.path if has_request_context() else "<no request>",
+                " ".join(statement.split()),
+                _parameter_types(parameters, executemany),
+            )
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", _after_cursor_execute)
+
+    @app.after_request
+    def _add_server_timing(response: Response) -> Response:
+        stats = get_query_stats()
+        metrics = [f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"']
+        for i, (duration, statement) in enumerate(stats.slowest(top), start=1):
+            metric = f"sql-{i};dur={duration * 1000:.2f}"
+            # the header is sent to the clients, who should not see the SQL
+            if app.debug:
+                metric += f';desc="{_header_value(statement)}"'
+            metrics.append(metric)
+        response.headers.add("Server-Timing", ", ".join(metrics))
+        return response
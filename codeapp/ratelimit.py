@@ -0,0 +1,184 @@
+# pylint: disable=cyclic-import
+"""
+SQLite storage for the rate limits (flask-limiter/`limits`).
+
+The default in-memory storage keeps separate counters in each gunicorn
+worker, which multiplies the real limits by the number of workers.
+Redis or memcached (`RATELIMIT_STORAGE_URI=redis://...`) share the counters
+among all the servers; when they are not available, this storage shares them
+among the workers of one server through a SQLite file, e.g.,
+`RATELIMIT_STORAGE_URI=sqlite:////tmp/ratelimit.db`.
+
+Importing this module registers the `sqlite` scheme in `limits`,
+therefore the app initializes the limiter through `init_app`.
+It supports the fixed window and the sliding window counter strategies,
+and every update is atomic, also across processes.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from math import floor
+from typing import Any, Optional, Tuple
+
+from flask import Flask
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+from codeapp import limiter
+
+# expired counters are deleted once every this many writes
+CLEANUP_INTERVAL = 1000
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(
+        self,
+        uri: Optional[str] = None,
+        wrap_exceptions: bool = False,
+        **options: Any,
+    ) -> None:
+        # sqlite:////absolute/path.db or sqlite:///relative/path.db
+        self.path = (uri or "sqlite:///ratelimit.db").removeprefix("sqlite:///")
+        self.timeout: float = options.get("timeout", 5.0)
+        self._local = threading.local()
+        self._writes = 0
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ratelimit "
+                "(key TEXT PRIMARY KEY, value INTEGER NOT NULL, expiry REAL NOT NULL)"
+            )
+
+    @property
+    def base_exceptions(self) -> Any:
+        return sqlite3.Error
+
+    def _connection(self) -> sqlite3.Connection:
+        # connections cannot be shared among threads, nor among the processes
+        # forked by gunicorn after the app is loaded
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            # readers do not block the writer and vice versa
+            conn.execute("PRAGMA journal_mode=WAL")
+            # the counters do not need to survive a power failure
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _incr(
+        self, conn: sqlite3.Connection, key: str, expiry: float, amount: int
+    ) -> int:
+        now = time.time()
+        # a single statement, therefore atomic;
+        # an expired counter starts over
+        (value,) = conn.execute(
+            "INSERT INTO ratelimit (key, value, expiry) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET "
+            "value = CASE WHEN expiry <= ? THEN excluded.value "
+            "ELSE value + excluded.value END, "
+            "expiry = CASE WHEN expiry <= ? THEN excluded.expiry ELSE expiry END "
+            "RETURNING value",
+            (key, amount, now + expiry, now, now),
+        ).fetchone()
+        self._writes += 1
+        if self._writes % CLEANUP_INTERVAL == 0:
+            conn.execute("DELETE FROM ratelimit WHERE expiry <= ?", (now,))
+        return int(value)
+
+    def _get(self, conn: sqlite3.Connection, key: str) -> Tuple[int, float]:
+        row = conn.execute(
+            "SELECT value, expiry FROM ratelimit WHERE key = ? AND expiry > ?",
+            (key, time.time()),
+        ).fetchone()
+        return (0, time.time()) if row is None else (int(row[0]), float(row[1]))
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        return self._incr(self._connection(), key, expiry, amount)
+
+    def get(self, key: str) -> int:
+        return self._get(self._connection(), key)[0]
+
+    def get_expiry(self, key: str) -> float:
+        return self._get(self._connection(), key)[1]
+
+    def check(self) -> bool:
+        try:
+            self._connection().execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        conn = self._connection()
+        (count,) = conn.execute("SELECT COUNT(*) FROM ratelimit").fetchone()
+        conn.execute("DELETE FROM ratelimit")
+        return int(count)
+
+    def clear(self, key: str) -> None:
+        self._connection().execute("DELETE FROM ratelimit WHERE key = ?", (key,))
+
+    def _sliding_window(
+        self, conn: sqlite3.Connection, key: str, expiry: int, now: float
+    ) -> Tuple[int, float, int, float]:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        previous_count = self._get(conn, previous_key)[0]
+        current_count = self._get(conn, current_key)[0]
+        # time left in the previous and current windows, as in `limits`
+        previous_ttl = (
+            0.0
+            if previous_count == 0
+            else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        )
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
+
+    def acquire_sliding_window_entry(
+        self, key: str, limit: int, expiry: int, amount: int = 1
+    ) -> bool:
+        if amount > limit:
+            return False
+        conn = self._connection()
+        now = time.time()
+        # the check and the increment happen in one write transaction,
+        # so concurrent requests (even from other workers) cannot both pass
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            previous_count, previous_ttl, current_count, _ = self._sliding_window(
+                conn, key, expiry, now
+            )
+            weighted_count = previous_count * previous_ttl / expiry + current_count
+            if floor(weighted_count) + amount > limit:
+                return False
+            current_key = self.sliding_window_keys(key, expiry, now)[1]
+            # the counter is kept during the next window as well
+            self._incr(conn, current_key, 2 * expiry, amount)
+            return True
+        finally:
+            conn.execute("COMMIT")
+
+    def get_sliding_window(
+        self, key: str, expiry: int
+    ) -> Tuple[int, float, int, float]:
+        return self._sliding_window(self._connection(), key, expiry, time.time())
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        for _key in self.sliding_window_keys(key, expiry, time.time()):
+            self.clear(_key)
+
+
+def init_app(app: Flask) -> None:
+    """
+    Initializes the rate limiter of `app`, with the storage of
+    `RATELIMIT_STORAGE_URI`, which can also be `sqlite:///<file>`.
+    """
+    limiter.init_app(app)
@@ -4,7 +4,7 @@ File that contains all the routes of the application.
 This is equivalent to the "controller" part in a model-view-controller architecture.
 """
 
-from typing import List, Union  # , Optional
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from flask import (
     Blueprint,
@@ -18,24 +18,43 @@ from flask import (
 )
 from flask.wrappers import Response as FlaskResponse
 from flask_login import current_user, login_required, login_user, logout_user
+from markupsafe import Markup
 from sqlalchemy import select
-from sqlalchemy.sql.expression import Select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import joinedload, load_only, raiseload
+from sqlalchemy.sql.expression import ColumnElement, Select
 from werkzeug.wrappers.response import Response as WerkzeugResponse
 
 # app imports
-from codeapp import bcrypt, db
+from codeapp import db, passwords
+from codeapp.cache import fragment_key, get_cache
+from codeapp.conditional import conditional_response, get_etag
 from codeapp.forms import (
     LoginForm,
     RegistrationForm,
     UpdatePasswordForm,
     UpdateProfileForm,
 )
-from codeapp.models import Recipe, User
+from codeapp.models import Comment, Recipe, User
+from codeapp.pagination import Page, paginate
+from codeapp.search import search
 
 Response = Union[str, FlaskResponse, WerkzeugResponse]
 
 bp = Blueprint("bp", __name__, url_prefix="/")
 
+# the columns shown in the cards of the recipes and in the comments;
+# the content, which can be long, is not loaded for them
+CARD_COLUMNS = (
+    Recipe.id,
+    Recipe.title,
+    Recipe.date_posted,
+    Recipe.excerpt,
+    Recipe.version,
+    Recipe.user_id,
+)
+COMMENT_COLUMNS = (Comment.id, Comment.date_posted, Comment.excerpt, Comment.user_id)
+
 """
 ############################### General routes ################################
 
@@ -45,21 +64,92 @@ The routes below include general views open for all users.
 
 @bp.get("/")
 def home() -> Response:
-    statement: Select = select(Recipe).order_by(Recipe.date_posted)
+    # only the id and the version of the recipes are needed to find their
+    # cards in the cache; the recipes themselves are loaded only for the
+    # cards that are not cached yet
+    statement: Select = select(Recipe.id, Recipe.version)
 
+    title: Optional[str] = None
+    keys: Tuple[ColumnElement[Any], ...] = (Recipe.date_posted, Recipe.id)
     if "title" in request.args and len(request.args["title"]) > 0:
-        # the user searched
-        title: str = request.args["title"]
-        flash(f"search the recipe by'{title}'.", "warning")
-        statement = statement.filter(Recipe.title.like(f"%{title}%"))  # type: ignore
+        # the user searched: the title and the content of the recipes are
+        # matched using the full-text index, and results are ranked by relevance
+        title = request.args["title"]
+        statement, keys = search(statement, title)
+
+    # the recipes are shown page by page, using the keys (e.g., date_posted
+    # and id) of the first/last recipe shown as the cursor for the
+    # previous/next page
+    try:
+        page: Page[Row[Any]] = paginate(
+            statement,
+            keys=keys,
+            per_page=current_app.config["RECIPES_PER_PAGE"],
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+        )
+    except ValueError:
+        abort(400)
+
+    # the page is identified by the recipes it shows: if the client already
+    # has this version of the page, no other query is issued and nothing is
+    # rendered
+    etag = get_etag(
+        "home",
+        title,
+        [(row.id, row.version) for row in page.items],
+        page.prev_cursor,
+        page.next_cursor,
+    )
 
-    recipes: List[Recipe] = db.session.execute(statement).scalars().all()
-    return render_template("home.html", recipes=recipes)
+    def _render() -> str:
+        if title is not None:
+            flash(f"search the recipe by'{title}'.", "warning")
+        return render_template(
+            "home.html", cards=_get_cards(page.items), page=page, title=title
+        )
+
+    return conditional_response(etag, _render)
+
+
+def _get_cards(rows: List[Row[Any]]) -> List[Markup]:
+    """
+    Returns the cards of the recipes in `rows` (which have `id` and `version`),
+    rendering and caching the ones that are not cached yet.
+    """
+    cache = get_cache()
+    card_keys = {row.id: fragment_key("card", row.id, row.version) for row in rows}
+    found = cache.get_many(list(card_keys.values()))
+    cards: Dict[int, str] = {
+        recipe_id: found[key] for recipe_id, key in card_keys.items() if key in found
+    }
+    missing = [recipe_id for recipe_id in card_keys if recipe_id not in cards]
+    if len(missing) > 0:
+        # the cards show the excerpt of the content and the name of the
+        # author, which is loaded in the same query; the content and any
+        # other relationship are not needed, and accessing them raises an error
+        recipes = db.session.execute(
+            select(Recipe)
+            .filter(Recipe.id.in_(missing))
+            .options(
+                load_only(*CARD_COLUMNS, raiseload=True),
+                joinedload(Recipe.user),
+                raiseload("*"),
+            )
+        ).scalars()
+        for recipe in recipes:
+            cards[recipe.id] = render_template("_recipe_card.html", recipe=recipe)
+            # the version loaded now might be newer than the one listed
+            cache.set(fragment_key("card", recipe.id, recipe.version), cards[recipe.id])
+    # recipes deleted in the meantime are skipped
+    return [Markup(cards[row.id]) for row in rows if row.id in cards]
 
 
 @bp.get("/about")
 def about() -> Response:
-    return render_template("about.html")
+    return conditional_response(
+        get_etag("about"), lambda: render_template("about.html")
+    )
 
 
 """
@@ -71,11 +161,79 @@ Add here the routes specific to your project.
 
 @bp.get("/recipe/<int:recipe_id>")
 def detail_recipe(recipe_id: int) -> Response:
-    statement: Select = select(Recipe).filter_by(id=recipe_id)
+    # the header of the page (title, author, date) is loaded with one query;
+    # the content, rating and first comments come from the cache, and only
+    # when they are not cached the first page of comments is loaded, with
+    # one more query independently of the number of comments
+    statement: Select = (
+        select(Recipe)
+        .filter_by(id=recipe_id)
+        .options(joinedload(Recipe.user), raiseload("*"))
+    )
     recipe: Recipe = db.session.execute(statement).scalars().one_or_none()
     if recipe is None:
         abort(404)
-    return render_template("recipe.html", recipe=recipe)
+
+    def _render() -> str:
+        cache = get_cache()
+        key = fragment_key("detail", recipe.id, recipe.version)
+        detail = cache.get_many([key]).get(key)
+        if detail is None:
+            detail = render_template(
+                "_recipe_detail.html",
+                recipe=recipe,
+                recipe_id=recipe.id,
+                comments=_get_comments(recipe.id),
+            )
+            cache.set(key, detail)
+        return render_template("recipe.html", recipe=recipe, detail=Markup(detail))
+
+    # everything shown in the page is covered by the version of the recipe
+    return conditional_response(get_etag("detail", recipe.id, recipe.version), _render)
+
+
+@bp.get("/recipe/<int:recipe_id>/comments")
+def recipe_comments(recipe_id: int) -> Response:
+    # the next comments of a recipe, after the ones already shown; the page
+    # of the recipe loads them on demand and adds them to the ones shown
+    version: Optional[int] = db.session.execute(
+        select(Recipe.version).filter_by(id=recipe_id)
+    ).scalar_one_or_none()
+    if version is None:
+        abort(404)
+    after = request.args.get("after")
+
+    def _render() -> str:
+        try:
+            comments = _get_comments(recipe_id, after)
+        except ValueError:
+            abort(400)
+        return render_template("_comments.html", recipe_id=recipe_id, comments=comments)
+
+    # new comments change the version of the recipe
+    return conditional_response(
+        get_etag("comments", recipe_id, version, after), _render
+    )
+
+
+def _get_comments(recipe_id: int, after: Optional[str] = None) -> Page[Comment]:
+    """
+    Returns one page of the comments of the recipe, oldest first, with their
+    authors loaded in the same query.
+    Raises `ValueError` if the cursor `after` is not valid.
+    """
+    return paginate(
+        select(Comment)
+        .filter_by(recipe_id=recipe_id)
+        .options(
+            load_only(*COMMENT_COLUMNS, raiseload=True),
+            joinedload(Comment.user),
+            raiseload("*"),
+        ),
+        keys=(Comment.date_posted, Comment.id),
+        per_page=current_app.config["COMMENTS_PER_PAGE"],
+        after=after,
+    )
 
 
 """
@@ -122,7 +280,9 @@ def register() -> Response:
         return redirect(url_for("bp.home"))
     form = RegistrationForm()
     if form.validate_on_submit():
-        _password = bcrypt.generate_password_hash(form.password.data).decode("utf-8")
+        # the connection goes back to the pool while the password is hashed
+        db.session.close()
+        _password = passwords.hash_password(form.password.data)
         _user = User(name=form.name.data, email=form.email.data, password=_password)
         db.session.add(_user)
         try:
@@ -147,8 +307,19 @@ def login() -> Response:
     if form.validate_on_submit():
         _stmt = select(User).filter(User.email == form.email.data).limit(1)
         _user = db.session.execute(_stmt).scalars().first()
-        current_app.logger.debug(f"User ({type(_user)}): {_user}")
-        if _user and bcrypt.check_password_hash(_user.password, form.password.data):
+        # the user object would put the password hash in the logs
+        current_app.logger.debug("Login of user %s", _user.id if _user else None)
+        # the connection goes back to the pool while the password is checked
+        db.session.close()
+        if _user and passwords.check_and_rehash(_user, form.password.data):
+            db.session.add(_user)
+            if db.session.is_modified(_user):
+                # the password was hashed with another cost
+                try:
+                    db.session.commit()
+                except Exception as e:
+                    current_app.logger.exception(e)
+                    db.session.rollback()
             login_user(_user, remember=form.remember.data)
             next_page = request.args.get("next")
             flash("Welcome!", "success")
@@ -180,9 +351,7 @@ def update_profile() -> Response:
 
     if profile_form.validate_on_submit():
         current_app.logger.info("profile form submitted")
-        _stmt = select(User).filter(User.id == current_user.id).limit(1)
-        _user = db.session.execute(_stmt).scalars().first()
-        _user.name = profile_form.name.data
+        current_user.name = profile_form.name.data
         try:
             db.session.commit()
             flash("Profile updated successfully!", "success")
@@ -202,12 +371,8 @@ def update_profile() -> Response:
         # if it gets here, it's because the current password is validated
         # new password and confirmation are also equal
         # see forms.py for more info
-        _new_password = bcrypt.generate_password_hash(
-            password_form.new_password.data
-        ).decode("utf-8")
-        _stmt = select(User).filter(User.id == current_user.id).limit(1)
-        _user = db.session.execute(_stmt).scalars().first()
-        _user.password = _new_password
+        _new_password = passwords.hash_password(password_form.new_password.data)
+        current_user.password = _new_password
         try:
             db.session.commit()
             current_app.logger.info("Password changed successfully.")
@@ -0,0 +1,197 @@
+"""
+Full-text search over the title and the content of the recipes.
+
+- In SQLite, the recipes are indexed by an FTS5 virtual table (`recipe_fts`).
+  It is an "external content" table, i.e., it does not store a copy of the
+  text, and it is kept in sync by triggers on the `recipe` table.
+- In PostgreSQL, a GIN index over the `tsvector` of the title and the content
+  is used. Being an expression index, it is always in sync.
+- Any other database falls back to a `LIKE` scan.
+
+In all cases, results are ordered by relevance.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import (
+    DDL,
+    Column,
+    Float,
+    Integer,
+    MetaData,
+    Table,
+    Text,
+    event,
+    false,
+    func,
+    insert,
+    inspect,
+    literal_column,
+    or_,
+    select,
+    text,
+)
+from sqlalchemy.sql.expression import ColumnElement, Select
+
+from codeapp import db
+from codeapp.models import Recipe
+
+# the virtual table is created by the DDL below, therefore it is declared
+# in a separate metadata to be ignored by `db.create_all()`
+recipe_fts = Table(
+    "recipe_fts",
+    MetaData(),
+    Column("rowid", Integer()),
+    Column("title", Text()),
+    Column("content", Text()),
+    # bm25 score of the match, the lower the better
+    Column("rank", Float()),
+)
+
+SQLITE_DDL: List[str] = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_fts USING fts5("
+    "title, content, content='recipe', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS recipe_fts_insert AFTER INSERT ON recipe BEGIN "
+    "INSERT INTO recipe_fts(rowid, title, content) "
+    "VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS recipe_fts_delete AFTER DELETE ON recipe BEGIN "
+    "INSERT INTO recipe_fts(recipe_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); END",
+    # only changes to the indexed columns touch the index
+    "CREATE TRIGGER IF NOT EXISTS recipe_fts_update "
+    "AFTER UPDATE OF title, content ON recipe BEGIN "
+    "INSERT INTO recipe_fts(recipe_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO recipe_fts(rowid, title, content) "
+    "VALUES (new.id, new.title, new.content); END",
+]
+
+# the expression below must match exactly the one used in the queries
+POSTGRESQL_VECTOR = "to_tsvector('english', recipe.title || ' ' || recipe.content)"
+
+# the insert trigger, `SQLITE_DDL[1]`, is replaced by `insert_recipes`
+SQLITE_INSERT_TRIGGER = "recipe_fts_insert"
+
+POSTGRESQL_DDL: List[str] = [
+    "CREATE INDEX IF NOT EXISTS ix_recipe_search ON recipe "
+    f"USING GIN ({POSTGRESQL_VECTOR})",
+]
+
+for _statement in SQLITE_DDL:
+    event.listen(
+        Recipe.__table__,
+        "after_create",
+        DDL(_statement).execute_if(dialect="sqlite"),
+    )
+event.listen(
+    Recipe.__table__,
+    "after_drop",
+    DDL("DROP TABLE IF EXISTS recipe_fts").execute_if(dialect="sqlite"),
+)
+for _statement in POSTGRESQL_DDL:
+    event.listen(
+        Recipe.__table__,
+        "after_create",
+        DDL(_statement).execute_if(dialect="postgresql"),
+    )
+
+
+def insert_recipes(rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserts the `rows` into the `recipe` table with one `executemany`,
+    for bulk imports.
+
+    In SQLite, the insert trigger is dropped meanwhile, and the new recipes
+    are indexed with one `INSERT ... SELECT`, several times faster than
+    running the trigger once per row. It is all in the same transaction,
+    therefore no other recipe can be inserted meanwhile. The trigger may be
+    missing already (e.g., after an interrupted import), and if the index
+    itself is missing, it is built with all the recipes.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != "sqlite":  # pragma: no cover
+        connection.execute(insert(Recipe.__table__), rows)  # type: ignore
+        return
+
+    if not inspect(connection).has_table(recipe_fts.name):
+        connection.execute(insert(Recipe.__table__), rows)  # type: ignore
+        rebuild_index()
+        return
+
+    last_id = connection.execute(select(func.coalesce(func.max(Recipe.id), 0))).scalar()
+    connection.execute(text(f"DROP TRIGGER IF EXISTS {SQLITE_INSERT_TRIGGER}"))
+    connection.execute(insert(Recipe.__table__), rows)  # type: ignore
+    connection.execute(
+        text(
+            "INSERT INTO recipe_fts(rowid, title, content) "
+            "SELECT id, title, content FROM recipe WHERE id > :last_id"
+        ),
+        {"last_id": last_id},
+    )
+    connection.execute(text(SQLITE_DDL[1]))
+
+
+def get_terms(query: str) -> List[str]:
+    """
+    Splits the query typed by the user into words,
+    discarding any character that has a special meaning for the search engines.
+    """
+    return re.findall(r"\w+", query)
+
+
+def search(
+    statement: Select, query: str, dialect: str = ""
+) -> Tuple[Select, Tuple[ColumnElement[Any], ...]]:
+    """
+    Filters `statement`, which must select from `Recipe`, keeping the recipes
+    whose title or content contain all the words in `query`
+    (the last characters of each word may be missing).
+
+    Returns the filtered statement and the keys that order the results
+    by relevance, to be used with `codeapp.pagination.paginate`.
+    """
+    if dialect == "":
+        dialect = db.session.get_bind().dialect.name
+    terms = get_terms(query)
+    if len(terms) == 0:
+        return statement.filter(false()), (Recipe.date_posted, Recipe.id)
+
+    if dialect == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        statement = statement.join(recipe_fts, recipe_fts.c.rowid == Recipe.id).filter(
+            literal_column("recipe_fts").op("MATCH")(match)
+        )
+        return statement, (recipe_fts.c.rank, Recipe.id)
+
+    if dialect == "postgresql":  # pragma: no cover
+        vector = literal_column(POSTGRESQL_VECTOR)
+        tsquery = func.to_tsquery("english", " & ".join(f"{term}:*" for term in terms))
+        statement = statement.filter(vector.op("@@")(tsquery))
+        # ts_rank is the higher the better, therefore it is negated
+        return statement, (-func.ts_rank(vector, tsquery), Recipe.id)
+
+    # any other database: full scan, ordered by date
+    for term in terms:  # pragma: no cover
+        statement = statement.filter(
+            or_(Recipe.title.contains(term), Recipe.content.contains(term))
+        )
+    return statement, (Recipe.date_posted, Recipe.id)  # pragma: no cover
+
+
+def rebuild_index() -> None:
+    """
+    Creates the search index if it does not exist, and re-indexes all recipes.
+    Needed for databases created before the search index was introduced.
+    The caller must commit the session.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_DDL:
+            db.session.execute(text(statement))
+        db.session.execute(text("INSERT INTO recipe_fts(recipe_fts) VALUES('rebuild')"))
+    elif dialect == "postgresql":  # pragma: no cover
+        for statement in POSTGRESQL_DDL:
+            db.session.execute(text(statement))
@@ -0,0 +1,94 @@
+"""
+Database of the tests.
+
+The database filled by `manage.py initdb` is built once per test session
+(and shared by the `pytest-xdist` workers) as a template. Each worker has
+its own copy of it, restored before each test class with the backup API of
+SQLite. Within a class, each test runs in a transaction that is rolled back
+at its end (see `TestCase` in `utils.py`).
+
+The CI workflow and the `validate` scripts still run `manage.py initdb`
+before `pytest`: they are files of the course skeleton, which must not be
+changed. The database it fills (`site-testing.db`) is no longer used by
+these tests, only by the functional tests.
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from codeapp.config import TestingConfig
+
+
+def _build_template(path: Path) -> None:
+    """
+    Runs `initdb` once, even when several workers need the template at the
+    same time: the first one creates the lock file and builds it, the
+    others wait for it.
+    """
+    lock = path.with_suffix(".lock")
+    while not path.exists():
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            time.sleep(0.1)
+            continue
+        try:
+            building = path.with_suffix(".building")
+            env = os.environ.copy()
+            env["APP_SETTINGS"] = "codeapp.config.TestingConfig"
+            env["FLASK_ENV"] = "testing"
+            env["TEST_DATABASE_URL"] = f"sqlite:///{building}"
+            process = subprocess.run(
+                [sys.executable, "manage.py", "initdb"],
+                env=env,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+            if process.returncode != 0:
+                raise ValueError(
+                    "The database was not correctly initialized!"
+                    f"\n\nOutput message: {process.stdout}"
+                    f"\n\nError message: {process.stderr}"
+                )
+            # the others only see the complete database
+            os.replace(building, path)
+        finally:
+            os.remove(lock)
+
+
+@pytest.fixture(name="template_database", scope="session", autouse=True)
+def _template_database(tmp_path_factory: pytest.TempPathFactory) -> Iterator[Path]:
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    base = tmp_path_factory.getbasetemp()
+    # the workers have their own temporary folders in a common one
+    template = (base.parent if worker else base) / "template.db"
+    _build_template(template)
+
+    database = base / f"site-testing-{worker or 'main'}.db"
+    uri = TestingConfig.SQLALCHEMY_DATABASE_URI
+    TestingConfig.SQLALCHEMY_DATABASE_URI = f"sqlite:///{database}"
+    yield template
+    TestingConfig.SQLALCHEMY_DATABASE_URI = uri
+
+
+@pytest.fixture(name="database", scope="class", autouse=True)
+def _database(template_database: Path) -> None:
+    """
+    Restores the database of this worker from the template.
+    """
+    path = TestingConfig.SQLALCHEMY_DATABASE_URI.removeprefix("sqlite:///")
+    source = sqlite3.connect(template_database)
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
@@ -0,0 +1,169 @@
+import logging
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List
+
+from flask import url_for
+from flask.json.provider import DefaultJSONProvider
+from markupsafe import Markup
+from sqlalchemy import select
+
+from codeapp import db
+from codeapp.api import RECIPE_LIST_FIELDS, ORJSONProvider
+from codeapp.models import Recipe
+
+from .utils import TestCase
+
+
+class TestAPI(TestCase):
+    """
+    This class tests the JSON API.
+    """
+
+    def test_recipes(self) -> None:
+        expected: List[int] = (
+            db.session.execute(
+                select(Recipe.id).order_by(Recipe.date_posted, Recipe.id)
+            )
+            .scalars()
+            .all()
+        )
+        response = self.client.get(url_for("api.recipes", limit=4))
+        self.assert200(response)
+        self.assertEqual(response.mimetype, "application/json")
+        data = response.json
+        assert data is not None
+        self.assertEqual(list(data["items"][0]), RECIPE_LIST_FIELDS)
+        self.assertIsNone(data["prev"])
+
+        # walking forward through all the pages
+        ids = [item["id"] for item in data["items"]]
+        while data["next"] is not None:
+            response = self.client.get(
+                url_for("api.recipes", limit=4, after=data["next"])
+            )
+            data = response.json
+            assert data is not None
+            self.assertLessEqual(len(data["items"]), 4)
+            ids.extend(item["id"] for item in data["items"])
+        self.assertEqual(ids, expected)
+
+        # and back, from the last page
+        last_page = len(data["items"])
+        response = self.client.get(url_for("api.recipes", before=data["prev"]))
+        assert response.json is not None
+        self.assertEqual(response.json["items"][-1]["id"], expected[-last_page - 1])
+
+    def test_fields(self) -> None:
+        with self.assert_max_queries(1) as statements:
+            response = self.client.get(
+                url_for("api.recipes", fields="title,rating,title", limit=2)
+            )
+        self.assert200(response)
+        assert response.json is not None
+        self.assertEqual(list(response.json["items"][0]), ["id", "title", "rating"])
+        # only the columns requested are selected
+        self.assertNotIn("recipe.content", statements[0])
+        self.assertNotIn("user", statements[0])
+
+        response = self.client.get(url_for("api.recipes", fields="id", limit=2))
+        assert response.json is not None
+        self.assertEqual(list(response.json["items"][0]), ["id"])
+
+        response = self.client.get(url_for("api.recipes", fields="title,password"))
+        self.assert400(response)
+        self.assertEqual(response.json, {"error": "Unknown fields: password."})
+
+    def test_ids(self) -> None:
+        recipes: List[Recipe] = (
+            db.session.execute(select(Recipe).order_by(Recipe.id).limit(3))
+            .scalars()
+            .all()
+        )
+        ids = [recipes[2].id, recipes[0].id, 0, recipes[1].id]
+        with self.assert_max_queries(1):
+            response = self.client.get(
+                url_for(
+                    "api.recipes",
+                    ids=",".join(str(_id) for _id in ids),
+                    fields="title,author",
+                )
+            )
+        self.assert200(response)
+        # in the order requested, without the ones that do not exist
+        self.assertEqual(
+            response.json,
+            {
+                "items": [
+                    {
+                        "id": recipe.id,
+                        "title": recipe.title,
+                        "author": recipe.user.name,
+                    }
+                    for recipe in [recipes[2], recipes[0], recipes[1]]
+                ]
+            },
+        )
+
+        for ids_arg in ["1,x", ",", ",".join(["1"] * 101)]:
+            self.assert400(self.client.get(url_for("api.recipes", ids=ids_arg)))
+
+    def test_recipe(self) -> None:
+        recipe: Recipe = db.session.execute(select(Recipe).limit(1)).scalars().one()
+        response = self.client.get(url_for("api.recipe", recipe_id=recipe.id))
+        self.assert200(response)
+        data: Any = response.json
+        self.assertEqual(data["content"], recipe.content)
+        self.assertEqual(data["author"], recipe.user.name)
+        self.assertEqual(data["rating"], recipe.rating)
+        self.assertEqual(
+            datetime.fromisoformat(data["date_posted"]), recipe.date_posted
+        )
+
+        response = self.client.get(url_for("api.recipe", recipe_id=0))
+        self.assert404(response)
+        self.assertEqual(response.json, {"error": "Not found."})
+
+    def test_users(self) -> None:
+        response = self.client.get(url_for("api.users", limit=1))
+        self.assert200(response)
+        assert response.json is not None
+        # the emails and passwords are not public
+        self.assertEqual(list(response.json["items"][0]), ["id", "name"])
+        user_id = response.json["items"][0]["id"]
+
+        response = self.client.get(url_for("api.user", user_id=user_id))
+        assert response.json is not None
+        self.assertEqual(response.json["id"], user_id)
+        self.assert400(self.client.get(url_for("api.users", fields="email")))
+        self.assert404(self.client.get(url_for("api.user", user_id=0)))
+
+    def test_invalid_page(self) -> None:
+        self.assert400(self.client.get(url_for("api.recipes", after="not-a-cursor")))
+        self.assert400(self.client.get(url_for("api.recipes", limit=0)))
+        self.assert400(self.client.get(url_for("api.recipes", limit=101)))
+
+    def test_json_provider(self) -> None:
+        provider = ORJSONProvider(self.app)
+        self.assertEqual(provider.loads(provider.dumps({1: [2]})), {"1": [2]})
+        # what orjson does not support is left to the default provider
+        self.assertEqual(provider.dumps(Decimal("1.5")), '"1.5"')
+        self.assertEqual(provider.dumps([1], indent=1), "[\n 1\n]")
+        self.assertEqual(provider.loads("1.5", parse_float=Decimal), Decimal("1.5"))
+        self.assertEqual(provider.response(Markup("<b>")).json, "<b>")
+
+        # the rest of the app keeps the default provider
+        self.assertIsInstance(self.app.json, DefaultJSONProvider)
+        self.assertNotIsInstance(self.app.json, ORJSONProvider)
+        # the session cookie is serialized with the default provider
+        response = self.client.post(
+            url_for("bp.login"),
+            data={"email": "default@chalmers.se", "password": "testing"},
+            follow_redirects=True,
+        )
+        self.assert200(response)
+        self.assertIn("Default User", response.data.decode())
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
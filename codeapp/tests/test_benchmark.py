@@ -0,0 +1,213 @@
+"""
+Micro-benchmarks of the main routes and queries, with pytest-benchmark,
+over seeded databases of increasing size (`BENCHMARK_SIZES` recipes).
+
+They are slow, therefore they only run with `RUN_BENCHMARKS=1`.
+Unlike the other tests, these are pytest functions, because the `benchmark`
+fixture is not available in `unittest` classes. The fragment cache is
+disabled, so that the pages are rendered in every round.
+The endpoints of the JSON API are measured as well, to compare them with
+the HTML pages showing the same recipes.
+
+To store a baseline and to compare against it, failing over a threshold:
+    RUN_BENCHMARKS=1 pytest codeapp/tests/test_benchmark.py --benchmark-autosave
+    RUN_BENCHMARKS=1 pytest codeapp/tests/test_benchmark.py \
+        --benchmark-compare --benchmark-compare-fail=median:20%
+"""
+
+import logging
+import os
+import subprocess
+import sys
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Tuple
+
+import pytest
+from flask import Flask, render_template, template_rendered
+from flask.json.provider import DefaultJSONProvider
+from flask.testing import FlaskClient
+from sqlalchemy import func, insert, select
+from wtforms.validators import ValidationError
+
+from codeapp import create_app, db
+from codeapp.api import MAX_ITEMS, RECIPE_FIELDS, ORJSONProvider
+from codeapp.config import TestingConfig
+from codeapp.forms import RegistrationForm
+from codeapp.models import Comment, Grade, Recipe, User, load_user, recompute_ratings
+
+pytest.importorskip("pytest_benchmark")
+if os.getenv("RUN_BENCHMARKS", "0") != "1":
+    pytest.skip("Set RUN_BENCHMARKS=1 to run", allow_module_level=True)
+
+SIZES = [int(x) for x in os.getenv("BENCHMARK_SIZES", "1000,10000").split(",")]
+# comments and grades of the recipe used by the detail benchmarks
+MANY = 500
+
+
+class BenchmarkConfig(TestingConfig):
+    # a new database for each size, set by the fixture
+    SQLALCHEMY_DATABASE_URI = ""
+    FRAGMENT_CACHE_TYPE = "null"
+    RATELIMIT_ENABLED = False
+
+
+@pytest.fixture(
+    name="app", scope="module", params=SIZES, ids=lambda size: f"{size}-recipes"
+)
+def _app(
+    request: pytest.FixtureRequest, tmp_path_factory: pytest.TempPathFactory
+) -> Iterator[Flask]:
+    size: int = request.param
+    uri = f"sqlite:///{tmp_path_factory.mktemp('benchmark') / 'benchmark.db'}"
+    env = os.environ.copy()
+    env["APP_SETTINGS"] = "codeapp.config.TestingConfig"
+    env["FLASK_ENV"] = "testing"
+    env["TEST_DATABASE_URL"] = uri
+    subprocess.run(
+        [
+            sys.executable,
+            "manage.py",
+            "seed",
+            f"--users={max(2, size // 10)}",
+            f"--recipes={size}",
+            f"--comments={size * 5}",
+            f"--grades={size * 5}",
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+
+    BenchmarkConfig.SQLALCHEMY_DATABASE_URI = uri
+    app = create_app(f"{__name__}.BenchmarkConfig")
+    with app.app_context():
+        # the recipe with many comments and grades, by different users
+        now = datetime.now()
+        user_ids = list(range(1, min(MANY, max(2, size // 10)) + 1))
+        db.session.execute(
+            insert(Comment),
+            [
+                {
+                    "content": "<p>A comment.</p>",
+                    "date_posted": now,
+                    "user_id": user_ids[i % len(user_ids)],
+                    "recipe_id": 1,
+                }
+                for i in range(MANY)
+            ],
+        )
+        graded = select(Grade.user_id).filter(Grade.recipe_id == 1)
+        db.session.execute(
+            insert(Grade).from_select(
+                ["score", "recipe_id", "user_id"],
+                select(func.abs(User.id % 5) + 1, 1, User.id)
+                .filter(User.id.not_in(graded))
+                .limit(MANY),
+            )
+        )
+        recompute_ratings()
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture(name="client")
+def _client(app: Flask) -> Iterator[FlaskClient]:
+    with app.app_context():
+        yield app.test_client()
+
+
+def _rendered(client: FlaskClient, url: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Returns the template and the context rendered by `url`.
+    """
+    rendered: List[Tuple[str, Dict[str, Any]]] = []
+
+    def _record(_: Flask, template: Any, context: Dict[str, Any], **__: Any) -> None:
+        rendered.append((template.name, context))
+
+    with template_rendered.connected_to(_record):
+        assert client.get(url).status_code == 200
+    return rendered[-1]
+
+
+def test_home(benchmark: Any, client: FlaskClient) -> None:
+    response = benchmark(client.get, "/")
+    assert response.status_code == 200
+
+
+def test_home_search(benchmark: Any, client: FlaskClient) -> None:
+    title: str = db.session.execute(select(Recipe.title).limit(1)).scalar_one()
+    response = benchmark(client.get, "/", query_string={"title": title.split()[0]})
+    assert response.status_code == 200
+
+
+def test_detail_many_comments(benchmark: Any, client: FlaskClient) -> None:
+    response = benchmark(client.get, "/recipe/1")
+    assert response.status_code == 200
+
+
+def test_load_user(benchmark: Any, app: Flask) -> None:
+    def _load() -> User:
+        # as in a new request
+        db.session.expunge_all()
+        return load_user(1)
+
+    with app.app_context():
+        assert benchmark(_load).id == 1
+
+
+def test_registration_email_check(benchmark: Any, app: Flask) -> None:
+    with app.test_request_context(method="POST", data={"email": "default@chalmers.se"}):
+        form = RegistrationForm()
+
+        def _check() -> bool:
+            try:
+                form.validate_email(form.email)
+                return True
+            except ValidationError:
+                return False
+
+        assert not benchmark(_check)
+
+
+def test_api_recipes(benchmark: Any, client: FlaskClient) -> None:
+    # the same recipes as the home page, as JSON
+    response = benchmark(client.get, "/api/recipes", query_string={"limit": 10})
+    assert response.status_code == 200
+
+
+def test_api_recipe(benchmark: Any, client: FlaskClient) -> None:
+    response = benchmark(client.get, "/api/recipes/1")
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "provider", [ORJSONProvider, DefaultJSONProvider], ids=["orjson", "json"]
+)
+def test_api_serialization(
+    benchmark: Any, app: Flask, client: FlaskClient, provider: Any
+) -> None:
+    response = client.get(
+        "/api/recipes",
+        query_string={"limit": MAX_ITEMS, "fields": ",".join(RECIPE_FIELDS)},
+    )
+    items = response.json["items"]  # type: ignore
+    for item in items:
+        item["date_posted"] = datetime.fromisoformat(item["date_posted"])
+    assert benchmark(provider(app).dumps, {"items": items})
+
+
+@pytest.mark.parametrize("url", ["/", "/recipe/1"], ids=["home", "recipe"])
+def test_render_template(
+    benchmark: Any, app: Flask, client: FlaskClient, url: str
+) -> None:
+    template, context = _rendered(client, url)
+    with app.test_request_context(url):
+        html = benchmark(render_template, template, **context)
+    assert "</html>" in html
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
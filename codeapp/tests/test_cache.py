@@ -0,0 +1,203 @@
+import logging
+from datetime import datetime
+
+from flask import Flask, url_for
+from sqlalchemy import select
+from sqlalchemy.sql.expression import Select
+
+from codeapp import cache, create_app, db
+from codeapp.models import Comment, Grade, Recipe, User
+
+from .utils import TestCase
+
+
+class TestFragmentCache(TestCase):
+    """
+    This class tests the cache of rendered fragments and its invalidation.
+    """
+
+    def get_recipe(self) -> Recipe:
+        # the first recipe of the home page
+        statement: Select = (
+            select(Recipe).order_by(Recipe.date_posted, Recipe.id).limit(1)
+        )
+        recipe: Recipe = db.session.execute(statement).scalars().one()
+        return recipe
+
+    def test_lru(self) -> None:
+        lru = cache.LRUCache(2)
+        lru.set("a", "1")
+        lru.set("b", "2")
+        self.assertEqual(lru.get_many(["a", "c"]), {"a": "1"})
+        # "b" is now the least recently used
+        lru.set("c", "3")
+        self.assertEqual(lru.get_many(["a", "b", "c"]), {"a": "1", "c": "3"})
+        self.assertEqual(len(lru), 2)
+        lru.clear()
+        self.assertEqual(len(lru), 0)
+
+    def test_null(self) -> None:
+        null = cache.NullCache()
+        null.set("a", "1")
+        self.assertEqual(null.get_many(["a"]), {})
+        null.clear()
+
+    def test_config(self) -> None:
+        self.assertIsInstance(cache.get_cache(), cache.LRUCache)
+        app = create_app("codeapp.config.TestingConfig")
+        app.config["FRAGMENT_CACHE_TYPE"] = "null"
+        cache.init_app(app)
+        self.assertIsInstance(cache.get_cache(app), cache.NullCache)
+        app.config["FRAGMENT_CACHE_TYPE"] = "memcached"
+        with self.assertRaises(ValueError):
+            cache.init_app(app)
+
+    def test_backend_interface(self) -> None:
+        backend = cache.CacheBackend()
+        with self.assertRaises(NotImplementedError):
+            backend.get_many([])
+        with self.assertRaises(NotImplementedError):
+            backend.set("a", "1")
+        with self.assertRaises(NotImplementedError):
+            backend.clear()
+
+    def test_cached_fragments(self) -> None:
+        recipe = self.get_recipe()
+        self.client.get(url_for("bp.home"))
+        self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        found = cache.get_cache().get_many(
+            [
+                cache.fragment_key("card", recipe.id, recipe.version),
+                cache.fragment_key("detail", recipe.id, recipe.version),
+            ]
+        )
+        self.assertEqual(len(found), 2)
+
+        # the cached fragments are served without rendering them again
+        cache.get_cache().set(
+            cache.fragment_key("detail", recipe.id, recipe.version), "<p>Cached</p>"
+        )
+        response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        self.assertIn("<p>Cached</p>", response.data.decode())
+
+    def test_recipe_changes(self) -> None:
+        recipe = self.get_recipe()
+        title = recipe.title
+        self.client.get(url_for("bp.home"))
+        version = recipe.version
+
+        recipe.title = "Cache invalidation title"
+        db.session.commit()
+        self.assertEqual(recipe.version, version + 1)
+        try:
+            response = self.client.get(url_for("bp.home"))
+            self.assertIn("Cache invalidation title", response.data.decode())
+        finally:
+            recipe.title = title
+            db.session.commit()
+
+        # changes to other columns do not invalidate the fragments
+        version = recipe.version
+        recipe.rating_sum = recipe.rating_sum
+        db.session.commit()
+        self.assertEqual(recipe.version, version)
+
+    def test_comment_changes(self) -> None:
+        recipe = self.get_recipe()
+        self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        version = recipe.version
+
+        user: User = db.session.execute(select(User).limit(1)).scalars().one()
+        comment = Comment(
+            content="<p>Cache invalidation comment</p>",
+            date_posted=datetime.now(),
+            user=user,
+            recipe=recipe,
+        )
+        db.session.add(comment)
+        db.session.commit()
+        self.assertEqual(recipe.version, version + 1)
+        response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        self.assertIn("Cache invalidation comment", response.data.decode())
+
+        comment.content = "<p>Edited comment</p>"
+        db.session.commit()
+        response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        self.assertIn("Edited comment", response.data.decode())
+
+        db.session.delete(comment)
+        db.session.commit()
+        response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        self.assertNotIn("Edited comment", response.data.decode())
+
+    def test_grade_changes(self) -> None:
+        recipe = self.get_recipe()
+        self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        version = recipe.version
+
+        user = User(name="Cache grader", email="cache@chalmers.se", password="x")
+        db.session.add(user)
+        grade = Grade(score=5, recipe=recipe, user=user)
+        db.session.add(grade)
+        db.session.commit()
+        self.assertEqual(recipe.version, version + 1)
+        response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        self.assertIn(f"({recipe.rating_count} grades)", response.data.decode())
+
+        db.session.delete(grade)
+        db.session.delete(user)
+        db.session.commit()
+
+    def test_author_changes(self) -> None:
+        recipe = self.get_recipe()
+        author: User = recipe.user
+        name = author.name
+        self.client.get(url_for("bp.home"))
+        version = recipe.version
+
+        author.name = "Renamed author"
+        db.session.commit()
+        self.assertEqual(recipe.version, version + 1)
+        try:
+            response = self.client.get(url_for("bp.home"))
+            self.assertIn("Renamed author", response.data.decode())
+        finally:
+            author.name = name
+            db.session.commit()
+
+        # changes to other columns do not invalidate the fragments
+        version = recipe.version
+        author.password = author.password + ""
+        db.session.commit()
+        self.assertEqual(recipe.version, version)
+
+
+class TestNullCache(TestCase):
+    """
+    The pages work the same way with the cache disabled.
+    """
+
+    def create_app(self) -> Flask:
+        app = super().create_app()
+        app.config["FRAGMENT_CACHE_TYPE"] = "null"
+        cache.init_app(app)
+        return app
+
+    def test_pages(self) -> None:
+        response = self.client.get(url_for("bp.home"))
+        self.assert200(response)
+        statement: Select = (
+            select(Recipe).order_by(Recipe.date_posted, Recipe.id).limit(1)
+        )
+        recipe: Recipe = db.session.execute(statement).scalars().one()
+        self.assertIn(recipe.title, response.data.decode())
+        for _ in range(2):
+            with self.assert_max_queries(2):
+                response = self.client.get(
+                    url_for("bp.detail_recipe", recipe_id=recipe.id)
+                )
+            self.assert200(response)
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
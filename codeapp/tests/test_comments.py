@@ -0,0 +1,108 @@
+import logging
+import re
+from datetime import datetime
+from typing import List
+
+from flask import url_for
+from sqlalchemy import delete, func, select
+
+from codeapp import db
+from codeapp.models import Comment, Recipe, User
+
+from .utils import TestCase
+
+
+class TestComments(TestCase):
+    """
+    This class tests the pagination of the comments in the page of a recipe.
+    """
+
+    @staticmethod
+    def get_comments(html: str) -> List[str]:
+        return re.findall(r'<p class="card-text">(Comment \d+)', html)
+
+    @staticmethod
+    def get_more_link(html: str) -> str:
+        link = re.search(r'<a class="btn btn-outline-primary" href="([^"]+)"', html)
+        return "" if link is None else link.group(1).replace("&amp;", "&")
+
+    def add_comments(self, recipe_id: int, count: int) -> None:
+        user: User = db.session.execute(select(User).limit(1)).scalars().one()
+        recipe: Recipe = db.session.get_one(Recipe, recipe_id)
+        now = datetime.now()
+        db.session.add_all(
+            [Comment(f"Comment {i}", now, user, recipe) for i in range(count)]
+        )
+        db.session.commit()
+
+    def test_pages(self) -> None:
+        self.app.config["COMMENTS_PER_PAGE"] = 4
+        recipe: Recipe = db.session.execute(select(Recipe).limit(1)).scalars().one()
+        # the comments created by `initdb` are older than these
+        db.session.execute(delete(Comment).filter_by(recipe_id=recipe.id))
+        self.add_comments(recipe.id, 10)
+
+        response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        self.assert200(response)
+        html = response.data.decode()
+        pages = [self.get_comments(html)]
+        self.assertEqual(pages[0], [f"Comment {i}" for i in range(4)])
+
+        # loading the next comments until the last one
+        link = self.get_more_link(html)
+        while link:
+            response = self.client.get(link)
+            self.assert200(response)
+            self.assertTemplateUsed("_comments.html")
+            pages.append(self.get_comments(response.data.decode()))
+            link = self.get_more_link(response.data.decode())
+        self.assertEqual(
+            [comment for page in pages for comment in page],
+            [f"Comment {i}" for i in range(10)],
+        )
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+
+    def test_detail_queries(self) -> None:
+        self.app.config["COMMENTS_PER_PAGE"] = 2
+        recipe_id: int = db.session.execute(
+            select(Recipe.id).order_by(Recipe.id).limit(1)
+        ).scalar_one()
+        self.add_comments(recipe_id, 50)
+        url = url_for("bp.detail_recipe", recipe_id=recipe_id)
+        # the recipe and one page of comments, whatever their number
+        with self.assert_max_queries(2):
+            response = self.client.get(url)
+        self.assert200(response)
+        self.assertEqual(response.data.decode().count('class="card-title"'), 3)
+
+    def test_not_found(self) -> None:
+        recipe_id: int = db.session.execute(select(func.max(Recipe.id))).scalar_one()
+        response = self.client.get(
+            url_for("bp.recipe_comments", recipe_id=recipe_id + 1)
+        )
+        self.assert404(response)
+
+    def test_invalid_cursor(self) -> None:
+        recipe_id: int = db.session.execute(select(Recipe.id).limit(1)).scalar_one()
+        response = self.client.get(
+            url_for("bp.recipe_comments", recipe_id=recipe_id, after="not-a-cursor")
+        )
+        self.assert400(response)
+
+    def test_not_modified(self) -> None:
+        recipe_id: int = db.session.execute(select(Recipe.id).limit(1)).scalar_one()
+        url = url_for("bp.recipe_comments", recipe_id=recipe_id)
+        response = self.client.get(url)
+        self.assert200(response)
+        etag = response.headers["ETag"]
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertStatus(response, 304)
+
+        # a new comment changes the page
+        self.add_comments(recipe_id, 1)
+        response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assert200(response)
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,97 @@
+import logging
+
+from flask import url_for
+from sqlalchemy import select
+from sqlalchemy.sql.expression import Select
+
+from codeapp import db
+from codeapp.models import Recipe
+
+from .utils import TestCase
+
+
+class TestConditional(TestCase):
+    """
+    This class tests the conditional requests (`ETag`/`304 Not Modified`)
+    of the read-only pages.
+    """
+
+    username = "default@chalmers.se"
+    password = "testing"
+
+    def get_recipe(self) -> Recipe:
+        # the first recipe of the home page
+        statement: Select = (
+            select(Recipe).order_by(Recipe.date_posted, Recipe.id).limit(1)
+        )
+        recipe: Recipe = db.session.execute(statement).scalars().one()
+        return recipe
+
+    def test_not_modified(self) -> None:
+        recipe = self.get_recipe()
+        for url, queries in [
+            (url_for("bp.about"), 0),
+            (url_for("bp.home"), 1),
+            (url_for("bp.home", title=recipe.title), 1),
+            (url_for("bp.detail_recipe", recipe_id=recipe.id), 1),
+        ]:
+            response = self.client.get(url)
+            self.assert200(response)
+            etag = response.headers["ETag"]
+            self.assertTrue(etag.startswith('W/"'))
+            self.assertIn("Cookie", response.headers["Vary"])
+            self.assertEqual(response.headers["Cache-Control"], "public, no-cache")
+
+            # nothing is rendered when the client has the current version
+            with self.assert_max_queries(queries):
+                response = self.client.get(url, headers={"If-None-Match": etag})
+            self.assertStatus(response, 304)
+            self.assertEqual(response.data, b"")
+            self.assertEqual(response.headers["ETag"], etag)
+
+    def test_modified(self) -> None:
+        recipe = self.get_recipe()
+        urls = [url_for("bp.home"), url_for("bp.detail_recipe", recipe_id=recipe.id)]
+        etags = [self.client.get(url).headers["ETag"] for url in urls]
+
+        title = recipe.title
+        recipe.title = "Conditional title"
+        db.session.commit()
+        try:
+            for url, etag in zip(urls, etags):
+                response = self.client.get(url, headers={"If-None-Match": etag})
+                self.assert200(response)
+                self.assertNotEqual(response.headers["ETag"], etag)
+                self.assertIn("Conditional title", response.data.decode())
+        finally:
+            recipe.title = title
+            db.session.commit()
+
+    def test_logged_user(self) -> None:
+        anonymous = self.client.get(url_for("bp.about")).headers["ETag"]
+        # the login redirects with a pending flash message, which makes
+        # the next page uncacheable
+        self.client.post(
+            url_for("bp.login"),
+            data={"email": self.username, "password": self.password},
+        )
+        response = self.client.get(url_for("bp.about"))
+        self.assertNotIn("ETag", response.headers)
+        self.assertEqual(response.headers["Cache-Control"], "no-store")
+
+        response = self.client.get(url_for("bp.about"))
+        self.assertNotEqual(response.headers["ETag"], anonymous)
+        self.assertEqual(response.headers["Cache-Control"], "private, no-cache")
+        response = self.client.get(
+            url_for("bp.about"), headers={"If-None-Match": anonymous}
+        )
+        self.assert200(response)
+
+    def test_max_age(self) -> None:
+        self.app.config["HTTP_CACHE_MAX_AGE"] = 60
+        response = self.client.get(url_for("bp.about"))
+        self.assertEqual(response.headers["Cache-Control"], "public, max-age=60")
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
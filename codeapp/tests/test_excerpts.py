@@ -0,0 +1,128 @@
+import logging
+from datetime import datetime
+
+from flask import render_template_string, url_for
+from sqlalchemy import func, select, update
+
+from codeapp import db
+from codeapp.models import Comment, Recipe, User, backfill_excerpts, make_excerpt
+
+from .utils import TestCase
+
+
+class TestExcerpts(TestCase):
+    """
+    This class tests the plain-text excerpts stored with the recipes and
+    the comments.
+    """
+
+    def test_same_as_filters(self) -> None:
+        words = " ".join(f"word{i}" for i in range(100))
+        for content in [
+            "",
+            "<p>Short &amp; <b>sweet</b></p>",
+            f"<p>{words}</p>",
+            "<p>" + "x" * 403 + "</p>",
+            "<p>" + "x" * 406 + "</p>",
+            "<p>" + "y" * 1000 + "</p>",
+            "<p>first</p><p>second</p>\n<p>third</p>",
+        ]:
+            expected = render_template_string(
+                "{{ content | safe | striptags | truncate(400) }}", content=content
+            )
+            # the templates escape the excerpt
+            self.assertEqual(
+                render_template_string("{{ excerpt }}", excerpt=make_excerpt(content)),
+                expected,
+            )
+
+    def test_written(self) -> None:
+        user: User = db.session.execute(select(User).limit(1)).scalars().one()
+        recipe = Recipe(
+            title="Excerpt", content="<p>A <i>new</i> recipe</p>", user=user
+        )
+        comment = Comment("<p>A <b>comment</b></p>", datetime.now(), user, recipe)
+        db.session.add_all([recipe, comment])
+        db.session.commit()
+        self.assertEqual(recipe.excerpt, "A new recipe")
+        self.assertEqual(comment.excerpt, "A comment")
+
+        recipe.content = "<p>Changed</p>"
+        comment.content = "<p>Changed too</p>"
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(recipe.excerpt, "Changed")
+        self.assertEqual(comment.excerpt, "Changed too")
+
+        # other changes do not compute the excerpt again
+        db.session.execute(
+            update(Recipe).filter_by(id=recipe.id).values(excerpt="Stored")
+        )
+        recipe.title = "Excerpt changed"
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(recipe.excerpt, "Stored")
+
+    def test_backfill(self) -> None:
+        db.session.execute(update(Recipe).values(excerpt=None))
+        db.session.execute(update(Comment).values(excerpt=None))
+        db.session.commit()
+        total = sum(
+            db.session.execute(select(func.count()).select_from(model)).scalar_one()
+            for model in (Recipe, Comment)
+        )
+        versions = dict(db.session.execute(select(Recipe.id, Recipe.version)).all())
+        self.assertEqual(backfill_excerpts(batch_size=7), total)
+        recipe: Recipe = db.session.execute(select(Recipe).limit(1)).scalars().one()
+        self.assertEqual(recipe.excerpt, make_excerpt(recipe.content))
+        # the cached cards and pages of all the recipes are outdated
+        for recipe_id, version in db.session.execute(select(Recipe.id, Recipe.version)):
+            self.assertGreater(version, versions[recipe_id])
+        # nothing else to compute
+        self.assertEqual(backfill_excerpts(), 0)
+
+    def test_backfill_empty(self) -> None:
+        # a content without text has an empty excerpt, which is stored once
+        # and does not change what the pages show
+        recipe: Recipe = db.session.execute(select(Recipe).limit(1)).scalars().one()
+        db.session.execute(
+            update(Recipe)
+            .filter_by(id=recipe.id)
+            .values(content="<p><img src='x.png'></p>", excerpt=None)
+        )
+        db.session.commit()
+        versions = dict(db.session.execute(select(Recipe.id, Recipe.version)).all())
+        self.assertEqual(backfill_excerpts(), 1)
+        self.assertEqual(backfill_excerpts(), 0)
+        db.session.expire_all()
+        self.assertEqual(recipe.excerpt, "")
+        self.assertEqual(
+            dict(db.session.execute(select(Recipe.id, Recipe.version)).all()),
+            versions,
+        )
+
+    def test_backfill_comment(self) -> None:
+        comment: Comment = db.session.execute(select(Comment).limit(1)).scalars().one()
+        db.session.execute(
+            update(Comment).filter_by(id=comment.id).values(excerpt=None)
+        )
+        db.session.commit()
+        versions = dict(db.session.execute(select(Recipe.id, Recipe.version)).all())
+        self.assertEqual(backfill_excerpts(), 1)
+        # only the page of the recipe of the comment changed
+        versions[comment.recipe_id] += 1
+        self.assertEqual(
+            dict(db.session.execute(select(Recipe.id, Recipe.version)).all()),
+            versions,
+        )
+
+    def test_cards_without_content(self) -> None:
+        with self.assert_max_queries(10) as statements:
+            response = self.client.get(url_for("bp.home"))
+        self.assert200(response)
+        self.assertTrue(any("recipe.excerpt" in s for s in statements))
+        self.assertFalse(any("recipe.content" in s for s in statements))
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,103 @@
+import json
+import logging
+import tracemalloc
+from datetime import datetime
+from typing import Any, Dict, List
+
+from flask import url_for
+from sqlalchemy import func, insert, select
+
+from codeapp import db
+from codeapp.export import export_recipes
+from codeapp.models import Comment, Recipe, User
+
+from .utils import TestCase
+
+
+def _peak_memory(batch_size: int) -> int:
+    # the lines are consumed and discarded, like when they are written
+    tracemalloc.start()
+    try:
+        for _ in export_recipes(batch_size):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class TestExport(TestCase):
+    """
+    This class tests the NDJSON export of the recipes.
+    """
+
+    def test_export(self) -> None:
+        lines = list(export_recipes(batch_size=3))
+        self.assertTrue(all(line.endswith(b"\n") for line in lines))
+        recipes: List[Dict[str, Any]] = [json.loads(line) for line in lines]
+
+        ids = db.session.execute(select(Recipe.id).order_by(Recipe.id)).scalars()
+        self.assertEqual([recipe["id"] for recipe in recipes], list(ids))
+        num_comments = db.session.execute(select(func.count(Comment.id))).scalar()
+        self.assertEqual(sum(len(r["comments"]) for r in recipes), num_comments)
+
+        recipe: Recipe = db.session.get_one(Recipe, recipes[0]["id"])
+        self.assertEqual(recipes[0]["title"], recipe.title)
+        self.assertEqual(recipes[0]["content"], recipe.content)
+        self.assertEqual(
+            recipes[0]["author"], {"id": recipe.user.id, "name": recipe.user.name}
+        )
+        self.assertEqual(recipes[0]["rating"], recipe.rating)
+        self.assertEqual(recipes[0]["rating_count"], recipe.rating_count)
+        self.assertEqual(
+            [comment["id"] for comment in recipes[0]["comments"]],
+            [comment.id for comment in recipe.comments],
+        )
+        self.assertEqual(
+            recipes[0]["comments"][0]["author"]["name"],
+            recipe.comments[0].user.name,
+        )
+
+    def test_constant_memory(self) -> None:
+        # the first export also fills the caches of the statements
+        _peak_memory(100)
+        small = _peak_memory(100)
+
+        user_id = db.session.execute(select(User.id).limit(1)).scalar_one()
+        now = datetime.now()
+        content = "<p>" + "x" * 1000 + "</p>"
+        db.session.execute(
+            insert(Recipe.__table__),  # type: ignore
+            [
+                {
+                    "title": "Export",
+                    "content": content,
+                    "date_posted": now,
+                    "user_id": user_id,
+                }
+                for _ in range(5000)
+            ],
+        )
+        large = _peak_memory(100)
+        # the 5 MB exported are never in memory at once
+        self.assertLess(large, small + 1_000_000)
+
+    def test_endpoint(self) -> None:
+        response = self.client.get(url_for("api.export"))
+        self.assert401(response)
+
+        self.client.post(
+            url_for("bp.login"),
+            data={"email": "default@chalmers.se", "password": "testing"},
+        )
+        response = self.client.get(url_for("api.export"))
+        self.assert200(response)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.data.splitlines()
+        self.assertEqual(
+            len(lines), db.session.execute(select(func.count(Recipe.id))).scalar()
+        )
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,101 @@
+import gc
+import logging
+import os
+import runpy
+import sys
+from types import SimpleNamespace
+from typing import Any, Dict
+from unittest.mock import patch
+
+from codeapp import db, log
+
+from .utils import TestCase
+
+CONFIG = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "gunicorn.conf.py"
+)
+
+
+def _load_config(**environ: str) -> Dict[str, Any]:
+    with patch.dict(os.environ, environ):
+        settings = runpy.run_path(CONFIG)
+    # loading the configuration disables the garbage collection until
+    # the app is loaded, which the tests do not do
+    settings["when_ready"](None)
+    return settings
+
+
+class TestGunicorn(TestCase):
+    """
+    This class tests the configuration of gunicorn.
+    """
+
+    def test_settings(self) -> None:
+        settings = _load_config(WEB_CONCURRENCY="3", GUNICORN_THREADS="8")
+        self.assertTrue(settings["preload_app"])
+        self.assertEqual((settings["workers"], settings["threads"]), (3, 8))
+        self.assertEqual(settings["worker_class"], "gthread")
+        self.assertTrue(gc.isenabled())
+
+        settings = _load_config(GUNICORN_THREADS="1", GUNICORN_PRELOAD="0")
+        self.assertFalse(settings["preload_app"])
+        self.assertEqual(settings["worker_class"], "sync")
+
+        settings = _load_config(GUNICORN_WORKER_CLASS="gevent")
+        self.assertEqual(settings["worker_class"], "gevent")
+
+    def test_garbage_collection(self) -> None:
+        try:
+            with patch.dict(sys.modules):
+                sys.modules.pop("wsgi", None)
+                settings = runpy.run_path(CONFIG)
+                self.assertFalse(gc.isenabled())
+                settings["when_ready"](None)
+                self.assertTrue(gc.isenabled())
+
+                # a reload reads the configuration again, the app is loaded
+                sys.modules["wsgi"] = SimpleNamespace(app=self.app)
+                settings = runpy.run_path(CONFIG)
+                self.assertTrue(gc.isenabled())
+
+            # whatever disabled it, it is enabled again after a reload and
+            # in the workers
+            gc.disable()
+            settings["on_reload"](None)
+            self.assertTrue(gc.isenabled())
+            gc.disable()
+            with patch.dict(sys.modules):
+                sys.modules.pop("wsgi", None)
+                settings["post_fork"](None, None)
+            self.assertTrue(gc.isenabled())
+        finally:
+            gc.enable()
+
+    def test_fork(self) -> None:
+        settings = _load_config()
+        settings["pre_fork"](None, None)
+        try:
+            self.assertGreater(gc.get_freeze_count(), 0)
+        finally:
+            gc.unfreeze()
+
+        # without preloading, there is nothing to replace
+        listener = log._listeners[""]  # pylint: disable=protected-access
+        with patch.dict(sys.modules):
+            sys.modules.pop("wsgi", None)
+            settings["post_fork"](None, None)
+        self.assertIs(log._listeners[""], listener)  # pylint: disable=protected-access
+
+        pool = db.engine.pool
+        # the threads of the master do not exist in the workers
+        log.stop()
+        with patch.dict(sys.modules, {"wsgi": SimpleNamespace(app=self.app)}):
+            settings["post_fork"](None, None)
+        self.assertIsNot(db.engine.pool, pool)
+        self.assertIsNot(
+            log._listeners[""], listener  # pylint: disable=protected-access
+        )
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,174 @@
+import io
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import func, select, text
+
+from codeapp import db
+from codeapp.importer import TITLE_LENGTH, import_recipes, read_records
+from codeapp.models import Recipe, User
+from codeapp.search import SQLITE_INSERT_TRIGGER, search
+
+from .utils import TestCase
+
+
+def _jsonl(records: List[Any]) -> io.StringIO:
+    return io.StringIO(
+        "".join(
+            (record if isinstance(record, str) else json.dumps(record)) + "\n"
+            for record in records
+        )
+    )
+
+
+def _record(title: str, email: str = "default@chalmers.se") -> Dict[str, str]:
+    return {
+        "title": title,
+        "content": f"<p>The <b>{title}</b> recipe.</p>",
+        "email": email,
+    }
+
+
+def _count() -> int:
+    return db.session.execute(select(func.count(Recipe.id))).scalar_one()
+
+
+class TestImporter(TestCase):
+    """
+    This class tests the bulk import of recipes.
+    """
+
+    def test_import(self) -> None:
+        before = _count()
+        records = [
+            _record("Imported lasagna"),
+            {**_record("Imported cake"), "date_posted": "2021-03-04T05:06:07"},
+            "not json",
+            {"title": "No content", "email": "default@chalmers.se"},
+            _record("x" * (TITLE_LENGTH + 1)),
+            {**_record("Bad date"), "date_posted": "yesterday"},
+            _record("Unknown author", email="nobody@chalmers.se"),
+            _record("Imported soup", email="normal@chalmers.se"),
+            ["not", "an", "object"],
+        ]
+        stats = import_recipes(read_records(_jsonl(records), "jsonl"), batch_size=4)
+        self.assertEqual(stats.read, 9)
+        self.assertEqual(stats.imported, 3)
+        self.assertEqual(stats.invalid, 6)
+        self.assertEqual([number for number, _ in stats.errors], [3, 4, 5, 6, 7, 9])
+        self.assertEqual(stats.errors[1][1], "The `content` is missing.")
+        self.assertEqual(stats.errors[4][1], "The author does not exist.")
+        self.assertEqual(_count(), before + 3)
+
+        recipe: Recipe = db.session.execute(
+            select(Recipe).filter(Recipe.title == "Imported cake")
+        ).scalar_one()
+        self.assertEqual(recipe.date_posted, datetime(2021, 3, 4, 5, 6, 7))
+        self.assertEqual(recipe.excerpt, "The Imported cake recipe.")
+        self.assertEqual(recipe.user.email, "default@chalmers.se")
+        self.assertEqual(recipe.rating_count, 0)
+
+    def test_csv(self) -> None:
+        file = io.StringIO(
+            "title,content,email,date_posted\n"
+            'Imported pie,"<p>Flour, butter</p>",default@chalmers.se,\n'
+            "Imported stew,<p>Beans</p>,normal@chalmers.se,2020-01-01\n"
+            ",<p>Untitled</p>,normal@chalmers.se,\n"
+        )
+        stats = import_recipes(read_records(file, "csv"))
+        self.assertEqual((stats.imported, stats.invalid), (2, 1))
+        recipe: Recipe = db.session.execute(
+            select(Recipe).filter(Recipe.title == "Imported pie")
+        ).scalar_one()
+        self.assertEqual(recipe.content, "<p>Flour, butter</p>")
+
+    def test_search_index(self) -> None:
+        records = [_record(f"Quinoaburger {i}") for i in range(5)]
+        import_recipes(read_records(_jsonl(records), "jsonl"), batch_size=2)
+        statement, _ = search(select(Recipe.id), "quinoaburger")
+        self.assertEqual(len(db.session.execute(statement).all()), 5)
+
+        # the index is still kept in sync for the recipes added afterwards
+        user: User = db.session.execute(select(User).limit(1)).scalars().one()
+        db.session.add(
+            Recipe(title="Quinoaburger deluxe", content="<p>Deluxe</p>", user=user)
+        )
+        db.session.commit()
+        self.assertEqual(len(db.session.execute(statement).all()), 6)
+
+    def test_search_index_missing(self) -> None:
+        # e.g., an earlier import was interrupted without its trigger
+        db.session.execute(text(f"DROP TRIGGER {SQLITE_INSERT_TRIGGER}"))
+        import_recipes(read_records(_jsonl([_record("Quinoaburger")]), "jsonl"))
+        statement, _ = search(select(Recipe.id), "quinoaburger")
+        self.assertEqual(len(db.session.execute(statement).all()), 1)
+
+        # the index was never built: it is built with all the recipes
+        for name in ("recipe_fts_insert", "recipe_fts_delete", "recipe_fts_update"):
+            db.session.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        db.session.execute(text("DROP TABLE recipe_fts"))
+        import_recipes(read_records(_jsonl([_record("Quinoaburger 2")]), "jsonl"))
+        self.assertEqual(len(db.session.execute(statement).all()), 2)
+
+    def test_time_zone(self) -> None:
+        records = [{**_record("Aware"), "date_posted": "2021-03-04T05:06:07+02:00"}]
+        import_recipes(read_records(_jsonl(records), "jsonl"))
+        recipe: Recipe = db.session.execute(
+            select(Recipe).filter(Recipe.title == "Aware")
+        ).scalar_one()
+        # stored like the dates written by the app, in the local time
+        posted = datetime(2021, 3, 4, 3, 6, 7, tzinfo=timezone.utc)
+        self.assertEqual(recipe.date_posted, posted.astimezone().replace(tzinfo=None))
+
+    def test_one_author_query_per_batch(self) -> None:
+        records = [_record(f"Recipe {i}") for i in range(10)] + [
+            _record(f"Other {i}", email="normal@chalmers.se") for i in range(10)
+        ]
+        with self.assert_max_queries(100) as statements:
+            stats = import_recipes(read_records(_jsonl(records), "jsonl"), 5)
+        self.assertEqual(stats.imported, 20)
+        author_queries = [s for s in statements if s.startswith("SELECT user.")]
+        # the authors of the last two batches are already in the cache
+        self.assertEqual(len(author_queries), 2)
+        # one insert for each batch
+        inserts = [s for s in statements if s.startswith("INSERT INTO recipe ")]
+        self.assertEqual(len(inserts), 4)
+
+    def test_dry_run(self) -> None:
+        before = _count()
+        records = [_record("Dry"), _record("Run", email="nobody@chalmers.se")]
+        stats = import_recipes(read_records(_jsonl(records), "jsonl"), dry_run=True)
+        self.assertEqual((stats.read, stats.imported, stats.invalid), (2, 1, 1))
+        self.assertEqual(_count(), before)
+
+    def test_checkpoint(self) -> None:
+        records = [_record(f"Resumed {i}") for i in range(7)]
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "import.checkpoint")
+
+            def _interrupted() -> Iterator[Any]:
+                yield from records[:5]
+                raise KeyboardInterrupt
+
+            with self.assertRaises(KeyboardInterrupt):
+                import_recipes(_interrupted(), batch_size=2, checkpoint=checkpoint)
+            # the first two batches were committed
+            with open(checkpoint, encoding="utf-8") as file:
+                self.assertEqual(json.load(file), {"processed": 4})
+
+            stats = import_recipes(iter(records), batch_size=2, checkpoint=checkpoint)
+            self.assertEqual((stats.skipped, stats.read, stats.imported), (4, 3, 3))
+            self.assertFalse(os.path.exists(checkpoint))
+
+        titles = db.session.execute(
+            select(Recipe.title).filter(Recipe.title.startswith("Resumed"))
+        ).scalars()
+        self.assertEqual(sorted(titles), [f"Resumed {i}" for i in range(7)])
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,79 @@
+import logging
+
+from sqlalchemy import literal_column, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.expression import Select
+
+from codeapp import db
+from codeapp.models import Comment, Grade, Recipe, User
+
+from .utils import TestCase
+
+
+class TestIndexes(TestCase):
+    """
+    This class makes sure that the most frequent queries are answered
+    using the indexes, instead of scanning the tables.
+    """
+
+    def explain(self, statement: Select) -> str:
+        compiled = statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+        rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+        # the last column of each row describes one step of the plan
+        return "\n".join(row[-1] for row in rows)
+
+    def assert_uses_index(self, statement: Select, index: str) -> None:
+        plan = self.explain(statement)
+        self.assertIn(f"INDEX {index}", plan)
+        # sorting without an index shows up as a temporary b-tree
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_home_page(self) -> None:
+        statement: Select = (
+            select(Recipe.id, Recipe.version)
+            .order_by(Recipe.date_posted, Recipe.id)
+            .limit(11)
+        )
+        self.assert_uses_index(statement, "ix_recipe_date_posted_id")
+
+        # the following pages start from the cursor
+        cursor = (literal_column("'2022-05-17 10:30:15.000000'"), 5)
+        statement = statement.filter(
+            tuple_(Recipe.date_posted, Recipe.id) > tuple_(*cursor)
+        )
+        self.assert_uses_index(statement, "ix_recipe_date_posted_id")
+
+    def test_relationships(self) -> None:
+        for statement, index in [
+            (
+                select(Comment).filter_by(recipe_id=1).order_by(Comment.date_posted),
+                "ix_comment_recipe_id_date_posted",
+            ),
+            (
+                select(Comment).filter_by(user_id=1).order_by(Comment.date_posted),
+                "ix_comment_user_id_date_posted",
+            ),
+            (
+                select(Recipe).filter_by(user_id=1).order_by(Recipe.date_posted),
+                "ix_recipe_user_id_date_posted",
+            ),
+            (select(Grade).filter_by(recipe_id=1), "ix_grade_recipe_id"),
+            # indexes created by unique constraints are named automatically
+            (select(Grade).filter_by(user_id=1), "sqlite_autoindex_grade_1"),
+            (
+                select(User).filter_by(email="default@chalmers.se"),
+                "sqlite_autoindex_user_1",
+            ),
+        ]:
+            self.assert_uses_index(statement, index)
+
+    def test_one_grade_per_user(self) -> None:
+        grade: Grade = db.session.execute(select(Grade).limit(1)).scalars().one()
+        db.session.add(Grade(score=1, user=grade.user, recipe=grade.recipe))
+        with self.assertRaises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
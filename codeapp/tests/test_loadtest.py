@@ -0,0 +1,123 @@
+import json
+import logging
+import threading
+
+from werkzeug.serving import make_server
+
+from codeapp import loadtest
+
+from .utils import TestCase
+
+
+class TestLoadTest(TestCase):
+    """
+    This class tests the load-testing harness.
+    """
+
+    transactional = False
+
+    def test_read_log(self) -> None:
+        requests = loadtest.read_log(
+            [
+                '{"path": "/?title=cake", "name": "search"}\n',
+                "\n",
+                '{"method": "post", "path": "/login", "data": {"email": "a"}}\n',
+            ]
+        )
+        self.assertEqual(
+            requests,
+            [
+                loadtest.Request("GET", "/?title=cake", name="search"),
+                loadtest.Request("POST", "/login", {"email": "a"}, "POST /login"),
+            ],
+        )
+        with self.assertRaises(ValueError):
+            loadtest.read_log(['{"method": "GET"}'])
+
+    def test_synthetic_mix(self) -> None:
+        requests = loadtest.synthetic_mix(200, recipe_ids=[1, 2], words=["cake"])
+        self.assertEqual(len(requests), 200)
+        self.assertEqual(
+            {request.name for request in requests},
+            {"home", "search", "detail", "login", "register"},
+        )
+        # the same seed gives the same requests
+        self.assertEqual(
+            requests, loadtest.synthetic_mix(200, recipe_ids=[1, 2], words=["cake"])
+        )
+
+    def test_percentile(self) -> None:
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(loadtest.percentile(values, 50), 50)
+        self.assertEqual(loadtest.percentile(values, 99), 99)
+        self.assertEqual(loadtest.percentile([3.0], 95), 3)
+        self.assertEqual(loadtest.percentile([], 50), 0)
+
+    def test_client(self) -> None:
+        requests = [
+            loadtest.Request("GET", "/", name="home"),
+            loadtest.Request("GET", "/recipe/0", name="detail"),
+            loadtest.Request(
+                "POST",
+                "/login",
+                {"email": "default@chalmers.se", "password": "testing"},
+                name="login",
+            ),
+        ] * 3
+        results, elapsed = loadtest.run(
+            requests, loadtest.client_sender(self.app), concurrency=3
+        )
+        stats = loadtest.summarize(results, elapsed)
+        self.assertEqual(stats["total"].requests, 9)
+        self.assertEqual(stats["home"].statuses, {"200": 3})
+        self.assertEqual(stats["detail"].statuses, {"404": 3})
+        self.assertEqual(stats["login"].statuses, {"302": 3})
+        self.assertEqual(stats["total"].errors, 0)
+        self.assertGreater(stats["total"].throughput, 0)
+
+        data = json.loads(loadtest.to_json(stats, commit="abc"))
+        self.assertEqual(data["commit"], "abc")
+        self.assertEqual(data["routes"]["home"]["requests"], 3)
+
+    def test_csrf(self) -> None:
+        self.app.config["WTF_CSRF_ENABLED"] = True
+        request = loadtest.Request(
+            "POST", "/login", {"email": "default@chalmers.se", "password": "testing"}
+        )
+        results, _ = loadtest.run([request], loadtest.client_sender(self.app), 1)
+        # without the token, the form would be shown again (200)
+        self.assertEqual(results[0].status, 302)
+
+    def test_http(self) -> None:
+        self.app.config["WTF_CSRF_ENABLED"] = True
+        server = make_server("localhost", 0, self.app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            requests = [
+                loadtest.Request("GET", "/"),
+                loadtest.Request("GET", "/recipe/0"),
+                loadtest.Request(
+                    "POST",
+                    "/login",
+                    {"email": "default@chalmers.se", "password": "testing"},
+                ),
+            ]
+            results, _ = loadtest.run(
+                requests, loadtest.http_sender(f"http://localhost:{server.port}/"), 1
+            )
+            self.assertEqual([result.status for result in results], [200, 404, 302])
+        finally:
+            server.shutdown()
+            thread.join()
+
+        # the server is not running anymore
+        results, elapsed = loadtest.run(
+            requests[:1], loadtest.http_sender(f"http://localhost:{server.port}"), 1
+        )
+        self.assertEqual(results[0].status, 0)
+        self.assertEqual(loadtest.summarize(results, elapsed)["total"].errors, 1)
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
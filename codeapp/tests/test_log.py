@@ -0,0 +1,101 @@
+import json
+import logging
+import threading
+from typing import List
+
+from flask import Flask
+
+from codeapp import log
+
+from .utils import TestCase
+
+
+class _Recorder(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.threads: List[str] = []
+        self.messages: List[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.threads.append(threading.current_thread().name)
+        self.messages.append(self.format(record))
+
+
+class TestLog(TestCase):
+    """
+    This class tests the logging through the queues.
+    """
+
+    def create_app(self) -> Flask:
+        app = super().create_app()
+        app.config["LOG_JSON"] = True
+        app.config["LOG_DEBUG_SAMPLE"] = 3
+        log.init_app(app)
+        return app
+
+    def tearDown(self) -> None:
+        log.init_app(super().create_app())
+        super().tearDown()
+
+    def test_level_per_environment(self) -> None:
+        self.assertEqual(logging.getLogger().level, logging.WARNING)
+
+    def test_written_by_another_thread(self) -> None:
+        logger = logging.getLogger("codeapp.tests.log")
+        recorder = _Recorder()
+        logger.addHandler(recorder)
+        log.start("codeapp.tests.log")
+        try:
+            logger.warning("Written in %s", "the background")
+            # the records are written only when the listener gets to them
+            log.stop()
+            self.assertEqual(recorder.messages, ["Written in the background"])
+            self.assertNotIn(threading.current_thread().name, recorder.threads)
+            # e.g., after gunicorn forks the workers
+            log.restart()
+            logger.warning("After the restart")
+            log.stop()
+            self.assertEqual(len(recorder.messages), 2)
+        finally:
+            log.restart()
+            # pylint: disable=protected-access
+            log._listeners.pop("codeapp.tests.log").stop()
+            log._queue_handlers.pop("codeapp.tests.log")
+            logger.handlers.clear()
+
+    def test_json(self) -> None:
+        formatter = log.JSONFormatter()
+        message = formatter.format(
+            logging.makeLogRecord(
+                {"name": "codeapp", "levelname": "INFO", "msg": "a %s", "args": ("b",)}
+            )
+        )
+        data = json.loads(message)
+        self.assertEqual(data["message"], "a b")
+        self.assertEqual((data["level"], data["logger"]), ("INFO", "codeapp"))
+        # pylint: disable-next=protected-access
+        for handler in log._listeners[""].handlers:
+            self.assertIsInstance(handler.formatter, log.JSONFormatter)
+
+    def test_sampling(self) -> None:
+        _filter = log.SamplingFilter(rate=3)
+        debug = [
+            logging.makeLogRecord({"levelno": logging.DEBUG, "lineno": 1})
+            for _ in range(7)
+        ]
+        self.assertEqual(
+            [_filter.filter(record) for record in debug],
+            [True, False, False, True, False, False, True],
+        )
+        # each line of code is sampled separately
+        other = logging.makeLogRecord({"levelno": logging.DEBUG, "lineno": 2})
+        self.assertTrue(_filter.filter(other))
+        # the other levels are always kept
+        info = logging.makeLogRecord({"levelno": logging.INFO, "lineno": 1})
+        self.assertTrue(all(_filter.filter(info) for _ in range(3)))
+        # pylint: disable-next=protected-access
+        self.assertEqual(log._queue_handlers[""].filters[0].rate, 3)
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
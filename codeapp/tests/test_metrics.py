@@ -0,0 +1,145 @@
+import logging
+import os
+import tempfile
+
+from flask import Flask
+from sqlalchemy import create_engine, exc, select, text
+from sqlalchemy.pool import NullPool
+
+from codeapp import db, metrics
+from codeapp.config import engine_options_from_env
+from codeapp.models import Recipe
+
+from .utils import TestCase
+
+
+class TestEngineOptions(TestCase):
+    """
+    This class tests the configuration of the connection pool.
+    """
+
+    def test_defaults(self) -> None:
+        options = engine_options_from_env({})
+        self.assertEqual(options["pool_size"], 1)
+        self.assertEqual(options["max_overflow"], 19)
+        self.assertTrue(options["pool_pre_ping"])
+        self.assertEqual(options["pool_recycle"], 1800)
+
+    def test_split_among_workers(self) -> None:
+        options = engine_options_from_env(
+            {
+                "WEB_CONCURRENCY": "4",
+                "GUNICORN_THREADS": "8",
+                "DB_MAX_CONNECTIONS": "20",
+            }
+        )
+        # 4 workers * 5 connections = 20
+        self.assertEqual(options["pool_size"] + options["max_overflow"], 5)
+        self.assertEqual(options["pool_size"], 5)
+
+        options = engine_options_from_env(
+            {"DB_POOL_SIZE": "3", "DB_MAX_OVERFLOW": "0", "DB_POOL_PRE_PING": "0"}
+        )
+        self.assertEqual((options["pool_size"], options["max_overflow"]), (3, 0))
+        self.assertFalse(options["pool_pre_ping"])
+
+    def test_external_pooler(self) -> None:
+        options = engine_options_from_env({"DB_POOL_MODE": "external"})
+        self.assertEqual(options, {"poolclass": NullPool})
+
+
+class TestMetrics(TestCase):
+    """
+    This class tests the metrics and their exposition.
+    """
+
+    transactional = False
+
+    def create_app(self) -> Flask:
+        app = super().create_app()
+        app.config["METRICS_ENABLED"] = True
+        metrics.init_app(app)
+        return app
+
+    def test_histogram(self) -> None:
+        histogram = metrics.Histogram("test_seconds", "Test.", [1, 0.1])
+        for value in [0.05, 0.1, 0.5, 5]:
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(
+            histogram.samples(),
+            [
+                ('test_seconds_bucket{le="0.1"}', 2),
+                ('test_seconds_bucket{le="1"}', 3),
+                ('test_seconds_bucket{le="+Inf"}', 4),
+                ("test_seconds_sum", 5.65),
+                ("test_seconds_count", 4),
+            ],
+        )
+
+    def test_registry(self) -> None:
+        registry = metrics.Registry()
+        counter: metrics.Counter = registry.register(
+            metrics.Counter("test_total", "Test counter.")
+        )
+        counter.inc()
+        counter.inc(2)
+        registry.register(metrics.Gauge("test_gauge", "Test gauge.", lambda: 7))
+        self.assertEqual(
+            registry.render(),
+            "# HELP test_total Test counter.\n"
+            "# TYPE test_total counter\n"
+            "test_total 3\n"
+            "# HELP test_gauge Test gauge.\n"
+            "# TYPE test_gauge gauge\n"
+            "test_gauge 7\n",
+        )
+        with self.assertRaises(NotImplementedError):
+            metrics.Metric("test", "Test.").samples()
+
+    def test_pool_instrumented(self) -> None:
+        self.assertIsInstance(db.engine.pool, metrics.TimedQueuePool)
+        checkouts = metrics.pool_checkouts.value
+        waits = metrics.pool_wait.count
+        db.session.execute(select(Recipe.id)).all()
+        db.session.commit()
+        self.assertGreater(metrics.pool_checkouts.value, checkouts)
+        self.assertGreater(metrics.pool_wait.count, waits)
+
+    def test_pool_timeout(self) -> None:
+        with tempfile.TemporaryDirectory() as folder:
+            engine = create_engine(
+                f"sqlite:///{os.path.join(folder, 'pool.db')}",
+                poolclass=metrics.TimedQueuePool,
+                pool_size=1,
+                max_overflow=0,
+                pool_timeout=0.01,
+            )
+            timeouts = metrics.pool_timeouts.value
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                with self.assertRaises(exc.TimeoutError):
+                    engine.connect()
+            self.assertEqual(metrics.pool_timeouts.value, timeouts + 1)
+            engine.dispose()
+
+    def test_endpoint(self) -> None:
+        response = self.client.get("/metrics")
+        self.assert200(response)
+        for name in [
+            "db_pool_wait_seconds_count",
+            "db_pool_checkouts_total",
+            "db_pool_timeouts_total",
+            "db_pool_size",
+            "db_pool_checked_out",
+        ]:
+            self.assertIn(name, response.data.decode())
+
+
+class TestMetricsDisabled(TestCase):
+    def test_no_endpoint(self) -> None:
+        self.assert404(self.client.get("/metrics"))
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,60 @@
+import logging
+import os
+import tempfile
+
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, upgrade
+from sqlalchemy import inspect
+
+from codeapp import create_app, db
+from codeapp.config import TestingConfig
+
+from .utils import TestCase
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "migrations")
+
+
+class MigrationsConfig(TestingConfig):
+    # a new, empty database, set by the test
+    SQLALCHEMY_DATABASE_URI = ""
+
+
+class TestMigrations(TestCase):
+    """
+    This class makes sure that the migrations create
+    the same database that `initdb` creates.
+    """
+
+    def test_upgrade_downgrade(self) -> None:
+        with tempfile.TemporaryDirectory() as folder:
+            MigrationsConfig.SQLALCHEMY_DATABASE_URI = (
+                f"sqlite:///{os.path.join(folder, 'migrations.db')}"
+            )
+            app = create_app(f"{__name__}.MigrationsConfig")
+            with app.app_context():
+                upgrade(directory=MIGRATIONS)
+                with db.engine.connect() as conn:
+                    context = MigrationContext.configure(conn)
+                    differences = [
+                        diff
+                        for diff in compare_metadata(context, db.metadata)
+                        # the full-text search tables are not in the metadata
+                        if not (
+                            diff[0] == "remove_table"
+                            and diff[1].name.startswith("recipe_fts")
+                        )
+                    ]
+                    self.assertEqual(differences, [])
+                    self.assertIn("recipe_fts", inspect(conn).get_table_names())
+
+                downgrade(directory=MIGRATIONS, revision="base")
+                with db.engine.connect() as conn:
+                    self.assertEqual(
+                        inspect(conn).get_table_names(), ["alembic_version"]
+                    )
+                db.engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,96 @@
+import logging
+import re
+from datetime import datetime
+from typing import List
+
+from flask import url_for
+from sqlalchemy import select
+
+from codeapp import db
+from codeapp.models import Recipe
+from codeapp.pagination import decode_cursor, encode_cursor
+
+from .utils import TestCase
+
+
+class TestPagination(TestCase):
+    """
+    This class tests the keyset pagination of the home page.
+    """
+
+    def get_recipe_ids(self, html: str) -> List[int]:
+        return [int(x) for x in re.findall(r'href="/recipe/(\d+)"', html)]
+
+    def test_cursor_round_trip(self) -> None:
+        keys = (Recipe.date_posted, Recipe.id)
+        values = (datetime(2022, 5, 17, 10, 30, 15, 123), 42)
+        self.assertEqual(decode_cursor(encode_cursor(values), keys), values)
+
+    def test_invalid_cursor(self) -> None:
+        keys = (Recipe.date_posted, Recipe.id)
+        for cursor in ["%%%", encode_cursor([1]), encode_cursor(["x", 1])]:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor, keys)
+
+        response = self.client.get(url_for("bp.home", after="not-a-cursor"))
+        self.assert400(response)
+
+    def test_pages(self) -> None:
+        self.app.config["RECIPES_PER_PAGE"] = 4
+        statement = select(Recipe.id).order_by(Recipe.date_posted, Recipe.id)
+        expected: List[int] = db.session.execute(statement).scalars().all()
+
+        response = self.client.get(url_for("bp.home"))
+        self.assert200(response)
+        self.assertNotIn("previous_page", response.data.decode())
+        shown = self.get_recipe_ids(response.data.decode())
+        self.assertEqual(shown, expected[:4])
+
+        # walking forward through all the pages
+        pages = [shown]
+        while "next_page" in response.data.decode():
+            link = re.search(
+                r'id="next_page" class="page-link" href="([^"]+)"',
+                response.data.decode(),
+            )
+            assert link is not None
+            response = self.client.get(link.group(1).replace("&amp;", "&"))
+            self.assert200(response)
+            pages.append(self.get_recipe_ids(response.data.decode()))
+        self.assertEqual([i for page in pages for i in page], expected)
+        self.assertTrue(all(len(page) <= 4 for page in pages))
+
+        # walking back one page
+        link = re.search(
+            r'id="previous_page" class="page-link" href="([^"]+)"',
+            response.data.decode(),
+        )
+        assert link is not None
+        response = self.client.get(link.group(1).replace("&amp;", "&"))
+        self.assertEqual(self.get_recipe_ids(response.data.decode()), pages[-2])
+
+    def test_pages_with_search(self) -> None:
+        self.app.config["RECIPES_PER_PAGE"] = 1
+        # the search matches any word of the titles, therefore the recipes
+        # searched for get a word that no other recipe has
+        recipes: List[Recipe] = (
+            db.session.execute(select(Recipe).limit(2)).scalars().all()
+        )
+        for recipe in recipes:
+            recipe.title = f"Zucchinitart {recipe.title}"
+        db.session.commit()
+
+        response = self.client.get(url_for("bp.home", title="Zucchinitart"))
+        self.assert200(response)
+        shown = self.get_recipe_ids(response.data.decode())
+        self.assertEqual(len(shown), 1)
+        self.assertIn(shown[0], [recipe.id for recipe in recipes])
+        # the links to other pages must keep the search
+        links = re.findall(r'class="page-link" href="([^"]+)"', response.data.decode())
+        self.assertGreater(len(links), 0)
+        for link in links:
+            self.assertIn("title=Zucchinitart", link)
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from unittest.mock import patch
+
+from flask import Flask, url_for
+from sqlalchemy import select
+
+from codeapp import bcrypt, db, metrics, passwords
+from codeapp.models import User
+
+from .utils import TestCase
+
+
+class TestPasswords(TestCase):
+    """
+    This class tests the cost of the password hashes.
+    """
+
+    email = "default@chalmers.se"
+    password = "testing"
+
+    def get_user(self) -> User:
+        _stmt = select(User).filter(User.email == self.email)
+        return db.session.execute(_stmt).scalars().one()
+
+    def set_cost(self, cost: int) -> None:
+        self.get_user().password = bcrypt.generate_password_hash(
+            self.password, cost
+        ).decode("utf-8")
+        db.session.commit()
+
+    def login(self, password: str) -> None:
+        self.client.post(
+            url_for("bp.login"),
+            data={"email": self.email, "password": password},
+            follow_redirects=True,
+        )
+        # the hash is read again from the database
+        db.session.expire_all()
+
+    def test_cost_per_environment(self) -> None:
+        self.assertEqual(self.app.config["BCRYPT_LOG_ROUNDS"], 4)
+        self.assertEqual(passwords.get_cost(passwords.hash_password("abc")), 4)
+
+    def test_rehash_on_login(self) -> None:
+        self.set_cost(5)
+        # a wrong password does not change the hash
+        self.login("wrong")
+        self.assertEqual(passwords.get_cost(self.get_user().password), 5)
+
+        self.login(self.password)
+        self.assertMessageFlashed("Welcome!", "success")
+        hashed = self.get_user().password
+        self.assertEqual(passwords.get_cost(hashed), 4)
+        self.assertTrue(passwords.check_password(hashed, self.password))
+
+        # a hash with the current cost is kept
+        self.client.get(url_for("bp.logout"))
+        self.login(self.password)
+        self.assertEqual(self.get_user().password, hashed)
+
+    def test_rehash_error(self) -> None:
+        self.set_cost(5)
+        with patch(
+            "codeapp.routes.db.session.commit",
+            side_effect=ValueError("Mock error"),
+            autospec=True,
+            spec_set=True,
+        ) as mock_commit:
+            self.login(self.password)
+            mock_commit.assert_called_once()
+        # the user logs in anyway, and the hash is upgraded next time
+        self.assertMessageFlashed("Welcome!", "success")
+        self.assertEqual(passwords.get_cost(self.get_user().password), 5)
+
+
+class TestPasswordPool(TestCase):
+    """
+    This class tests the pool of threads that hashes the passwords.
+    """
+
+    def create_app(self) -> Flask:
+        app = super().create_app()
+        app.config["PASSWORD_POOL_SIZE"] = 1
+        app.config["PASSWORD_POOL_QUEUE"] = 0
+        passwords.init_app(app)
+        return app
+
+    def test_hashed_in_pool(self) -> None:
+        waits = metrics.password_wait.count
+        thread = passwords.get_pool().run(lambda: threading.current_thread().name)
+        self.assertTrue(thread.startswith("passwords"))
+        self.assertEqual(metrics.password_wait.count, waits + 1)
+        self.assertEqual(passwords.get_pool().pending, 0)
+        rendered = metrics.registry.render()
+        self.assertIn("password_pool_size 1", rendered)
+        self.assertIn("password_pool_pending 0", rendered)
+
+    def test_saturated(self) -> None:
+        release = threading.Event()
+        # takes the only thread of the pool
+        busy = threading.Thread(target=passwords.get_pool().run, args=(release.wait,))
+        busy.start()
+        while passwords.get_pool().pending == 0:
+            time.sleep(0.01)
+        rejections = metrics.password_rejections.value
+        try:
+            response = self.client.post(
+                url_for("bp.login"),
+                data={"email": "default@chalmers.se", "password": "testing"},
+            )
+            self.assertStatus(response, 503)
+            self.assertEqual(response.headers["Retry-After"], "2")
+            self.assertEqual(metrics.password_rejections.value, rejections + 1)
+        finally:
+            release.set()
+            busy.join()
+        self.assertEqual(passwords.get_pool().pending, 0)
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
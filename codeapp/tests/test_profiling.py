@@ -0,0 +1,109 @@
+import logging
+import re
+import threading
+
+from flask import Flask, url_for
+from sqlalchemy import select, text
+
+from codeapp import db, profiling
+from codeapp.models import Recipe
+
+from .utils import TestCase
+
+
+class TestProfiling(TestCase):
+    """
+    This class tests the per-request SQL profiling.
+    """
+
+    transactional = False
+
+    def create_app(self) -> Flask:
+        app = super().create_app()
+        app.config["SQL_PROFILING"] = True
+        app.config["SQL_SLOW_QUERY_MS"] = 0
+        profiling.init_app(app)
+        return app
+
+    def test_server_timing(self) -> None:
+        # the first request renders the cards: one query for the page,
+        # one for the recipes not in the cache
+        with self.assert_max_queries(2) as statements:
+            response = self.client.get(url_for("bp.home"))
+        self.assert200(response)
+        self.assertEqual(len(statements), 2)
+        header = response.headers["Server-Timing"]
+        self.assertIn('desc="2 queries"', header)
+        self.assertTrue(header.startswith("db;dur="))
+        self.assertIn("sql-1;dur=", header)
+        self.assertNotIn("\n", header)
+        # the statements are only described in debug mode
+        self.assertEqual(header.count("desc="), 1)
+
+        # the next ones take all the cards from the cache
+        with self.assert_max_queries(1):
+            self.assert200(self.client.get(url_for("bp.home")))
+
+    def test_slow_query_log(self) -> None:
+        with self.assertLogs("codeapp.slow_query", level="WARNING") as logs:
+            self.client.get(url_for("bp.home"))
+        self.assertIn(" ms in /: SELECT", logs.output[0])
+
+        # the values of the parameters never reach the log file
+        with self.assertLogs("codeapp.slow_query", level="WARNING") as logs:
+            db.session.execute(
+                select(Recipe.id).filter(Recipe.title == "secret@chalmers.se")
+            ).all()
+        self.assertNotIn("secret", logs.output[0])
+        self.assertIn("| parameters: (str", logs.output[0])
+        with self.assertLogs("codeapp.slow_query", level="WARNING") as logs:
+            db.session.execute(
+                text("UPDATE recipe SET title = :title WHERE id = -1"),
+                [{"title": "secret"}, {"title": "secret"}],
+            )
+        self.assertIn("| parameters: 2 rows", logs.output[0])
+
+        # statements outside of requests (e.g., in a background thread)
+        # are logged as well
+        def _query() -> None:
+            with self.app.app_context():
+                db.session.execute(select(Recipe.id)).all()
+
+        with self.assertLogs("codeapp.slow_query", level="WARNING") as logs:
+            thread = threading.Thread(target=_query)
+            thread.start()
+            thread.join()
+        self.assertIn("<no request>", logs.output[0])
+
+    def test_slowest(self) -> None:
+        stats = profiling.QueryStats(
+            count=3, duration=6, statements=[(1, "a"), (3, "b"), (2, "c")]
+        )
+        self.assertEqual(stats.slowest(2), [(3, "b"), (2, "c")])
+
+    def test_header_descriptions(self) -> None:
+        self.app.debug = True
+        response = self.client.get(url_for("bp.home"))
+        header = response.headers["Server-Timing"]
+        descriptions = re.findall(r'desc="([^"]*)"', header)
+        # the statements have line breaks and quoted names, which would break
+        # the header; long statements are shortened
+        self.assertEqual(header.count('"'), 2 * len(descriptions))
+        self.assertTrue(all(len(desc) <= 60 for desc in descriptions))
+        self.assertTrue(any(desc.endswith("...") for desc in descriptions))
+
+
+class TestProfilingDisabled(TestCase):
+    """
+    Profiling is disabled by default.
+    """
+
+    def test_no_server_timing(self) -> None:
+        self.assertFalse(self.app.config["SQL_PROFILING"])
+        response = self.client.get(url_for("bp.home"))
+        self.assert200(response)
+        self.assertNotIn("Server-Timing", response.headers)
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,96 @@
+import logging
+from datetime import datetime
+
+from flask import url_for
+from sqlalchemy import delete, select
+from sqlalchemy.sql.expression import Select
+
+from codeapp import db
+from codeapp.models import Comment, Recipe, User
+
+from .utils import TestCase
+
+
+class TestQueries(TestCase):
+    """
+    This class makes sure that the number of queries issued by each route
+    does not grow with the amount of data shown (i.e., there is no N+1 problem).
+    """
+
+    username = "default@chalmers.se"
+    password = "testing"
+
+    def test_home_queries(self) -> None:
+        # the recipes are loaded only for the cards that are not cached yet
+        for args in [{}, {"title": "a"}]:
+            with self.assert_max_queries(2):
+                response = self.client.get(url_for("bp.home", **args))
+            self.assert200(response)
+            with self.assert_max_queries(1):
+                response = self.client.get(url_for("bp.home", **args))
+            self.assert200(response)
+
+    def test_detail_queries(self) -> None:
+        statement: Select = select(Recipe).limit(1)
+        recipe: Recipe = db.session.execute(statement).scalars().one()
+        recipe_id = recipe.id
+
+        with self.assert_max_queries(2):
+            response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe_id))
+        self.assert200(response)
+        # the comments are not loaded when the page is cached
+        with self.assert_max_queries(1):
+            response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe_id))
+        self.assert200(response)
+
+        # more comments must not mean more queries
+        users = db.session.execute(select(User)).scalars().all()
+        comments = [
+            Comment(
+                content="<p>Query count comment</p>",
+                date_posted=datetime.now(),
+                user=users[i % len(users)],
+                recipe=recipe,
+            )
+            for i in range(20)
+        ]
+        db.session.add_all(comments)
+        db.session.commit()
+        try:
+            with self.assert_max_queries(2):
+                response = self.client.get(
+                    url_for("bp.detail_recipe", recipe_id=recipe_id)
+                )
+            self.assert200(response)
+            self.assertIn("Query count comment", response.data.decode())
+        finally:
+            db.session.execute(
+                delete(Comment).where(Comment.content == "<p>Query count comment</p>")
+            )
+            db.session.commit()
+
+    def test_detail_queries_logged_in(self) -> None:
+        self.client.post(
+            url_for("bp.login"),
+            data={"email": TestQueries.username, "password": TestQueries.password},
+        )
+        statement: Select = (
+            select(Recipe)
+            .join(User)
+            .filter(User.email != TestQueries.username)
+            .limit(1)
+        )
+        recipe: Recipe = db.session.execute(statement).scalars().one()
+        # one extra query to load the logged user
+        with self.assert_max_queries(3):
+            response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        self.assert200(response)
+
+    def test_assert_max_queries_fails(self) -> None:
+        with self.assertRaises(AssertionError):
+            with self.assert_max_queries(0):
+                db.session.execute(select(Recipe.id)).all()
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,115 @@
+import logging
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+from unittest import mock
+
+from flask import Flask
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import SlidingWindowCounterRateLimiter
+
+from codeapp import create_app
+from codeapp.config import TestingConfig
+from codeapp.ratelimit import SQLiteStorage
+
+from .utils import TestCase
+
+
+def _hit(uri: str, times: int) -> int:
+    # runs in another process, like a gunicorn worker
+    limiter = SlidingWindowCounterRateLimiter(storage_from_string(uri))
+    item = parse("100/minute")
+    return sum(limiter.hit(item, "shared") for _ in range(times))
+
+
+class RateLimitConfig(TestingConfig):
+    # a new storage, set by the test
+    RATELIMIT_STORAGE_URI = ""
+
+
+class TestSQLiteStorage(TestCase):
+    """
+    This class tests the rate-limit storage shared among the workers.
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.folder = tempfile.TemporaryDirectory()
+        self.uri = f"sqlite:///{os.path.join(self.folder.name, 'ratelimit.db')}"
+
+    def tearDown(self) -> None:
+        self.folder.cleanup()
+        super().tearDown()
+
+    def test_counters(self) -> None:
+        storage = storage_from_string(self.uri)
+        self.assertIsInstance(storage, SQLiteStorage)
+        self.assertTrue(storage.check())
+        self.assertEqual(storage.incr("key", 60), 1)
+        self.assertEqual(storage.incr("key", 60, amount=2), 3)
+        self.assertEqual(storage.get("key"), 3)
+        self.assertGreater(storage.get_expiry("key"), 0)
+        # expired counters start over
+        self.assertEqual(storage.incr("expired", -1), 1)
+        self.assertEqual(storage.get("expired"), 0)
+        self.assertEqual(storage.incr("expired", 60), 1)
+        # and are deleted from time to time
+        storage.incr("old", -1)
+        with mock.patch("codeapp.ratelimit.CLEANUP_INTERVAL", 1):
+            storage.incr("key", 60)
+        self.assertEqual(storage.reset(), 2)
+        storage.clear("key")
+        self.assertEqual(storage.get("key"), 0)
+        self.assertIs(storage.base_exceptions, sqlite3.Error)
+
+    def test_sliding_window(self) -> None:
+        storage = SQLiteStorage(self.uri)
+        limiter = SlidingWindowCounterRateLimiter(storage)
+        item = parse("3/minute")
+        self.assertEqual([limiter.hit(item, "a") for _ in range(4)], [1, 1, 1, 0])
+        self.assertFalse(limiter.hit(parse("1/minute"), "b", cost=2))
+        self.assertEqual(limiter.get_window_stats(item, "a").remaining, 0)
+        self.assertEqual(limiter.get_window_stats(item, "b").remaining, 3)
+        limiter.clear(item, "a")
+        self.assertTrue(limiter.hit(item, "a"))
+
+    def test_shared_by_processes(self) -> None:
+        # the limit holds exactly, even with concurrent workers
+        with multiprocessing.get_context("fork").Pool(4) as pool:
+            allowed = pool.starmap(_hit, [(self.uri, 40)] * 4)
+        self.assertEqual(sum(allowed), 100)
+
+    def test_unavailable(self) -> None:
+        storage = SQLiteStorage(self.uri)
+        storage.path = self.folder.name
+        # a new connection is opened after the process forks
+        storage._local.pid = -1  # pylint: disable=protected-access
+        self.assertFalse(storage.check())
+
+
+class TestRateLimitApp(TestCase):
+    # created by `create_app`, which runs before `setUp`
+    folder: tempfile.TemporaryDirectory[str]
+
+    def create_app(self) -> Flask:
+        self.folder = tempfile.TemporaryDirectory()
+        RateLimitConfig.RATELIMIT_STORAGE_URI = (
+            f"sqlite:///{os.path.join(self.folder.name, 'ratelimit.db')}"
+        )
+        return create_app(f"{__name__}.RateLimitConfig")
+
+    def tearDown(self) -> None:
+        self.folder.cleanup()
+        super().tearDown()
+
+    def test_limit(self) -> None:
+        # the default limits allow 50 requests per hour
+        for _ in range(50):
+            self.assert200(self.client.get("/about"))
+        self.assertStatus(self.client.get("/about"), 429)
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
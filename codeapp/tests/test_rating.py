@@ -0,0 +1,122 @@
+import logging
+
+from flask import url_for
+from sqlalchemy import func, select, update
+from sqlalchemy.sql.expression import Select
+
+from codeapp import db
+from codeapp.models import Grade, Recipe, User, recompute_ratings
+
+from .utils import TestCase
+
+
+class TestRating(TestCase):
+    """
+    This class tests the rating aggregates stored in each recipe.
+    """
+
+    def assert_ratings_consistent(self) -> None:
+        statement: Select = (
+            select(
+                Recipe.id,
+                Recipe.rating_sum,
+                Recipe.rating_count,
+                func.coalesce(func.sum(Grade.score), 0),
+                func.count(Grade.id),
+            )
+            .outerjoin(Grade, Grade.recipe_id == Recipe.id)
+            .group_by(Recipe.id)
+        )
+        for _id, _sum, _count, expected_sum, expected_count in db.session.execute(
+            statement
+        ):
+            self.assertEqual(
+                (_sum, _count), (expected_sum, expected_count), f"Recipe {_id}"
+            )
+
+    def test_initial_ratings(self) -> None:
+        self.assert_ratings_consistent()
+
+    def test_grade_changes(self) -> None:
+        recipe: Recipe = db.session.execute(select(Recipe).limit(1)).scalars().one()
+        other: Recipe = (
+            db.session.execute(select(Recipe).filter(Recipe.id != recipe.id).limit(1))
+            .scalars()
+            .one()
+        )
+        user = User(name="Grader", email="grader@chalmers.se", password="x")
+        db.session.add(user)
+        db.session.commit()
+
+        initial_sum, initial_count = recipe.rating_sum, recipe.rating_count
+
+        # insertion
+        grade = Grade(score=5, recipe=recipe, user=user)
+        db.session.add(grade)
+        db.session.flush()
+        # the aggregates are refreshed right after the flush
+        self.assertEqual(recipe.rating_sum, initial_sum + 5)
+        self.assertEqual(recipe.rating_count, initial_count + 1)
+        db.session.commit()
+        self.assert_ratings_consistent()
+
+        # changing the score
+        grade.score = 2
+        db.session.commit()
+        self.assertEqual(recipe.rating_sum, initial_sum + 2)
+        self.assertEqual(recipe.rating_count, initial_count + 1)
+        self.assert_ratings_consistent()
+
+        # moving the grade to another recipe
+        grade.recipe_id = other.id
+        db.session.commit()
+        self.assert_ratings_consistent()
+
+        # updates that do not touch the score nor the recipe
+        grade.user_id = user.id
+        db.session.commit()
+        self.assert_ratings_consistent()
+
+        # deletion
+        db.session.delete(grade)
+        db.session.commit()
+        self.assertEqual(recipe.rating_sum, initial_sum)
+        self.assertEqual(recipe.rating_count, initial_count)
+        self.assert_ratings_consistent()
+
+        db.session.delete(user)
+        db.session.commit()
+
+    def test_recompute_ratings(self) -> None:
+        db.session.execute(update(Recipe).values(rating_sum=1000, rating_count=0))
+        db.session.commit()
+        recompute_ratings()
+        db.session.commit()
+        self.assert_ratings_consistent()
+
+    def test_rating_property(self) -> None:
+        recipe = Recipe(title="Test", content="Test", user=None)  # type: ignore
+        self.assertIsNone(recipe.rating)
+        recipe.rating_sum, recipe.rating_count = 7, 2
+        self.assertEqual(recipe.rating, 3.5)
+
+    def test_rating_shown(self) -> None:
+        statement: Select = select(Recipe).filter(Recipe.rating_count > 0).limit(1)
+        recipe: Recipe = db.session.execute(statement).scalars().one()
+        response = self.client.get(url_for("bp.detail_recipe", recipe_id=recipe.id))
+        self.assert200(response)
+        self.assertIn(f"{round(recipe.rating, 1)}", response.data.decode())
+
+        user: User = db.session.execute(select(User).limit(1)).scalars().one()
+        unrated = Recipe(title="Unrated recipe", content="<p>Unrated</p>", user=user)
+        db.session.add(unrated)
+        db.session.commit()
+        response = self.client.get(url_for("bp.detail_recipe", recipe_id=unrated.id))
+        self.assert200(response)
+        self.assertIn("No rating", response.data.decode())
+        db.session.delete(unrated)
+        db.session.commit()
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -1,6 +1,13 @@
 import logging
+import re
+from typing import List
 
 from flask import url_for
+from sqlalchemy import select, text
+
+from codeapp import db
+from codeapp.models import Recipe, User
+from codeapp.search import get_terms, rebuild_index, search
 
 from .utils import TestCase
 
@@ -46,6 +53,104 @@ class TestSearch(TestCase):
         self.assertIn("Search for recipes", response2.data.decode())
         self.assert_html(response2)
 
+    def search_ids(self, query: str) -> List[int]:
+        response = self.client.get(url_for("bp.home", title=query))
+        self.assert200(response)
+        return [
+            int(x) for x in re.findall(r'href="/recipe/(\d+)"', response.data.decode())
+        ]
+
+    def test_search_content(self) -> None:
+        """
+        The search must find words in the content, and it must follow
+        insertions, updates and deletions of recipes.
+        """
+        user: User = db.session.execute(select(User).limit(1)).scalars().one()
+        recipe = Recipe(
+            title="Fish soup",
+            content="<p>A soup with zanzibarian spices.</p>",
+            user=user,
+        )
+        db.session.add(recipe)
+        db.session.commit()
+        self.assertEqual(self.search_ids("zanzibarian"), [recipe.id])
+        # prefixes also match
+        self.assertEqual(self.search_ids("zanzib"), [recipe.id])
+        # all words must be present
+        self.assertEqual(self.search_ids("zanzibarian soup"), [recipe.id])
+        self.assertEqual(self.search_ids("zanzibarian cake"), [])
+
+        recipe.content = "<p>A soup with madagascan spices.</p>"
+        db.session.commit()
+        self.assertEqual(self.search_ids("zanzibarian"), [])
+        self.assertEqual(self.search_ids("madagascan"), [recipe.id])
+
+        # updates to other columns keep the recipe indexed
+        recipe.rating_sum = 0
+        db.session.commit()
+        self.assertEqual(self.search_ids("madagascan"), [recipe.id])
+
+        db.session.delete(recipe)
+        db.session.commit()
+        self.assertEqual(self.search_ids("madagascan"), [])
+
+    def test_search_relevance(self) -> None:
+        user: User = db.session.execute(select(User).limit(1)).scalars().one()
+        weak = Recipe(
+            title="Plain bread",
+            content="<p>Bread with a hint of quuxberry.</p>",
+            user=user,
+        )
+        strong = Recipe(
+            title="Quuxberry pie",
+            content="<p>Quuxberry, quuxberry and more quuxberry.</p>",
+            user=user,
+        )
+        db.session.add_all([weak, strong])
+        db.session.commit()
+        self.assertEqual(self.search_ids("quuxberry"), [strong.id, weak.id])
+        db.session.delete(weak)
+        db.session.delete(strong)
+        db.session.commit()
+
+    def test_search_special_characters(self) -> None:
+        self.assertEqual(get_terms('"soup" OR -cake*'), ["soup", "OR", "cake"])
+        # characters with special meaning for the search engine are ignored
+        self.search_ids('"unbalanced quote')
+        self.search_ids("NEAR(a b)")
+        # a search without words does not match anything
+        self.assertEqual(self.search_ids("!!!"), [])
+
+    def test_search_pages(self) -> None:
+        """
+        Results ordered by relevance can also be paginated.
+        """
+        statement, keys = search(select(Recipe.id), "lorem")
+        expected = db.session.execute(statement.order_by(*keys)).scalars().all()
+        self.assertGreater(len(expected), 2)
+
+        self.app.config["RECIPES_PER_PAGE"] = 2
+        response = self.client.get(url_for("bp.home", title="lorem"))
+        shown = []
+        while True:
+            html = response.data.decode()
+            shown.extend(int(x) for x in re.findall(r'href="/recipe/(\d+)"', html))
+            link = re.search(r'id="next_page" class="page-link" href="([^"]+)"', html)
+            if link is None:
+                break
+            response = self.client.get(link.group(1).replace("&amp;", "&"))
+        self.assertEqual(shown, expected)
+
+    def test_rebuild_index(self) -> None:
+        db.session.execute(
+            text("INSERT INTO recipe_fts(recipe_fts) VALUES('delete-all')")
+        )
+        db.session.commit()
+        self.assertEqual(self.search_ids("lorem"), [])
+        rebuild_index()
+        db.session.commit()
+        self.assertNotEqual(self.search_ids("lorem"), [])
+
 
 if __name__ == "__main__":
     logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,95 @@
+import logging
+import os
+import subprocess
+import sys
+import unittest
+from typing import Dict
+
+from codeapp import create_app
+from codeapp.config import TestingConfig
+
+from .utils import TestCase
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir)
+
+# seconds to import `wsgi`, i.e., to start a worker; it usually takes
+# well under one second, the budget leaves room for slower machines
+IMPORT_TIME_BUDGET = 2.0
+# the time is not measured when other processes compete for the CPU:
+# with pytest-xdist (`pytest -n 4`) or on CI machines
+LOADED = "PYTEST_XDIST_WORKER" in os.environ or os.getenv("CI") == "true"
+
+# used only by the commands in `manage.py`, never by the web servers
+CLI_ONLY_MODULES = [
+    "alembic",
+    "flask_migrate",
+    "lorem_text",
+    "codeapp.importer",
+    "codeapp.loadtest",
+]
+
+
+def _run(code: str, *options: str) -> subprocess.CompletedProcess[str]:
+    env = os.environ.copy()
+    env["APP_SETTINGS"] = "codeapp.config.TestingConfig"
+    env["FLASK_ENV"] = "testing"
+    env["TEST_DATABASE_URL"] = TestingConfig.SQLALCHEMY_DATABASE_URI
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=ROOT,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+
+def _import_times(module: str) -> Dict[str, float]:
+    """
+    Returns the seconds taken to import `module` and each of the modules it
+    imports (including the modules they import), from `-X importtime`.
+    """
+    stderr = _run(f"import {module}", "-X", "importtime").stderr
+    times: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1_000_000
+    return times
+
+
+class TestStartup(TestCase):
+    """
+    This class tests what the web servers import when they start.
+    """
+
+    def test_wsgi_imports(self) -> None:
+        times = _import_times("wsgi")
+        for module in CLI_ONLY_MODULES:
+            self.assertNotIn(module, times)
+
+        # the commands still have everything they need
+        self.assertIn("flask_migrate", _import_times("manage"))
+
+    @unittest.skipIf(LOADED, "the import time is only measured on an idle machine")
+    def test_wsgi_import_time(self) -> None:
+        self.assertLess(_import_times("wsgi")["wsgi"], IMPORT_TIME_BUDGET)
+
+    def test_no_side_effects(self) -> None:
+        # importing the package neither configures the logging nor starts threads
+        output = _run(
+            "import logging, threading, codeapp.models; "
+            "print(len(logging.getLogger().handlers), threading.active_count())"
+        ).stdout
+        self.assertEqual(output.split(), ["0", "1"])
+
+    def test_without_migrations(self) -> None:
+        app = create_app("codeapp.config.TestingConfig", migrations=False)
+        self.assertNotIn("migrate", app.extensions)
+        self.assertIn("migrate", self.app.extensions)
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
@@ -0,0 +1,98 @@
+import logging
+from typing import List
+from unittest.mock import patch
+
+from flask import Flask, url_for
+from sqlalchemy import select
+
+from codeapp import db
+from codeapp.models import User, load_user
+
+from .utils import TestCase
+
+
+def _get_user_id() -> int:
+    _stmt = select(User.id).filter(User.email == "default@chalmers.se")
+    user_id: int = db.session.execute(_stmt).scalar_one()
+    # as if the next lines ran in a new request
+    db.session.expunge_all()
+    return user_id
+
+
+class TestLoadUser(TestCase):
+    """
+    This class tests the queries made to load the logged-in user.
+    """
+
+    @staticmethod
+    def user_queries(statements: List[str]) -> List[str]:
+        return [s for s in statements if 'FROM "user"' in s or "FROM user" in s]
+
+    def test_identity_map(self) -> None:
+        user_id = _get_user_id()
+        with self.assert_max_queries(1):
+            user = load_user(user_id)
+        # the user is already loaded in this request
+        with self.assert_max_queries(0):
+            self.assertIs(load_user(user_id), user)
+            self.assertIs(db.session.get(User, user_id), user)
+
+    def test_reuses_current_user(self) -> None:
+        self.client.post(
+            url_for("bp.login"),
+            data={"email": "default@chalmers.se", "password": "testing"},
+        )
+        with self.assert_max_queries(10) as statements:
+            response = self.client.post(
+                url_for("bp.update_profile"),
+                data={"name": "Default User", "submit_profile": True},
+                follow_redirects=True,
+            )
+        self.assert200(response)
+        self.assertLessEqual(len(self.user_queries(statements)), 1)
+
+
+class TestUserCache(TestCase):
+    def create_app(self) -> Flask:
+        app = super().create_app()
+        app.config["USER_CACHE_TTL"] = 60
+        return app
+
+    def test_cached(self) -> None:
+        user_id = _get_user_id()
+        with self.assert_max_queries(1):
+            name = load_user(user_id).name
+        db.session.expunge_all()
+        with self.assert_max_queries(0):
+            user = load_user(user_id)
+            self.assertEqual((user.id, user.name), (user_id, name))
+        # the cached user is part of the session, and can be changed
+        self.assertIs(db.session.get(User, user_id), user)
+        user.name = "Cached User"
+        db.session.commit()
+
+        # the change removes the user from the cache
+        db.session.expunge_all()
+        with self.assert_max_queries(1):
+            self.assertEqual(load_user(user_id).name, "Cached User")
+        load_user(user_id).name = name
+        db.session.commit()
+
+    def test_expired(self) -> None:
+        user_id = _get_user_id()
+        load_user(user_id)
+        db.session.expunge_all()
+        with patch("codeapp.models.time.monotonic", return_value=10**9):
+            with self.assert_max_queries(1):
+                load_user(user_id)
+        db.session.expunge_all()
+        # the expired users are removed when the cache is full
+        with patch("codeapp.models._user_cache", {0: (0.0, {})}) as cache, patch(
+            "codeapp.models.USER_CACHE_SIZE", 1
+        ):
+            load_user(user_id)
+            self.assertEqual(list(cache), [user_id])
+
+
+if __name__ == "__main__":
+    logging.fatal("This file cannot be run directly. Run `pytest` instead.")
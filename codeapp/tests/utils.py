@@ -3,18 +3,37 @@ import os
 import sys
 import time
 import unittest
+from contextlib import contextmanager
 from subprocess import PIPE, Popen
-from typing import Optional
+from typing import Any, Iterator, List, Optional
 
 import flask_testing
 import requests
 from bs4 import BeautifulSoup
 from flask import Flask
+from flask_sqlalchemy.session import Session
 from selenium import webdriver
 from selenium.common.exceptions import WebDriverException
+from sqlalchemy import Connection, RootTransaction, event
+from sqlalchemy.orm import scoped_session
 from werkzeug.test import TestResponse
 
 from codeapp import create_app as ca
+from codeapp import db
+
+
+def _sqlite_connect(dbapi_connection: Any, _: Any) -> None:
+    dbapi_connection.isolation_level = None
+
+
+def _sqlite_begin(connection: Connection) -> None:
+    connection.exec_driver_sql("BEGIN")
+
+
+class _TransactionSession(Session):
+    def get_bind(self, *args: Any, **kwargs: Any) -> Any:
+        # all the statements go through the connection of the test
+        return self.bind or super().get_bind(*args, **kwargs)
 
 
 class TestCase(flask_testing.TestCase):
@@ -24,42 +43,78 @@ class TestCase(flask_testing.TestCase):
     # the URL below is for the service deployed at Chalmers
     url = "https://onu2.s2.chalmers.se/nu/?out=json"
 
-    @classmethod
-    def setUpClass(cls) -> None:
-        env = os.environ.copy()
-        env["APP_SETTINGS"] = "codeapp.config.TestingConfig"
-        env["FLASK_ENV"] = "testing"
-        cls._configured_port = int(os.environ.get("LIVESERVER_PORT", 5005))
-        cls._process = Popen(  # pylint: disable=consider-using-with
-            [
-                sys.executable,
-                "manage.py",
-                "initdb",
-            ],
-            env=env,
-            stdout=PIPE,
-            stderr=PIPE,
-        )
-        cls._process.wait()
-        if cls._process.returncode != 0:
-            message = "The database was not correctly initialized!"
-            message += "\n\nOutput message: "
-            if cls._process.stdout is not None:
-                message += "\n".join(
-                    [x.decode() for x in cls._process.stdout.readlines()]
-                )
-            message += "\n\nError message: "
-            if cls._process.stderr is not None:
-                message += "\n".join(
-                    [x.decode() for x in cls._process.stderr.readlines()]
-                )
-            raise ValueError(message)
+    # each test runs in a transaction that is rolled back at its end;
+    # disable it for the tests that use the database from other threads,
+    # or that look at all the statements of the engine
+    transactional: bool = True
+    # the connection and the transaction of the test, and the session
+    # of the app, replaced meanwhile
+    _connection: Connection
+    _transaction: RootTransaction
+    _session: scoped_session[Session]
 
     def create_app(self) -> Flask:
         os.environ["FLASK_ENV"] = "testing"
         app = ca("codeapp.config.TestingConfig")
         return app
 
+    def _pre_setup(self) -> None:
+        super()._pre_setup()
+        if not self.transactional:
+            return
+        if db.engine.dialect.name == "sqlite":
+            # pysqlite begins the transactions itself, which breaks savepoints
+            db.engine.dispose()
+            event.listen(db.engine, "connect", _sqlite_connect)
+            event.listen(db.engine, "begin", _sqlite_begin)
+        self._connection = db.engine.connect()
+        self._transaction = self._connection.begin()
+        # the commits of the app only release savepoints
+        self._session = db.session
+        db.session = db._make_scoped_session(  # pylint: disable=protected-access
+            {
+                "class_": _TransactionSession,
+                "bind": self._connection,
+                "join_transaction_mode": "create_savepoint",
+            }
+        )
+
+    def _post_teardown(self) -> None:
+        if self.transactional:
+            db.session.remove()
+            db.session = self._session
+            self._transaction.rollback()
+            self._connection.close()
+        super()._post_teardown()
+
+    @contextmanager
+    def assert_max_queries(self, maximum: int) -> Iterator[List[str]]:
+        """
+        Context manager that fails the test if more than `maximum` SQL
+        statements are executed within its block.
+        It yields the list of statements executed, which can be inspected.
+        Usage:
+            with self.assert_max_queries(2):
+                self.client.get(url_for("bp.home"))
+        """
+        statements: List[str] = []
+
+        def _record(*args: Any) -> None:
+            # (conn, cursor, statement, parameters, context, executemany)
+            if "SAVEPOINT" not in args[2]:
+                # the savepoints come from the transaction of the test
+                statements.append(args[2])
+
+        event.listen(db.engine, "before_cursor_execute", _record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _record)
+        assert len(statements) <= maximum, (
+            f"Expected at most {maximum} queries, but {len(statements)} "
+            "were executed:\n" + "\n".join(statements)
+        )
+
     def assert_html(self, response: TestResponse) -> BeautifulSoup:
         html_to_test = response.data.decode("UTF-8")
         response_html = requests.post(
@@ -0,0 +1,80 @@
+"""
+Configuration of gunicorn in production, read from the working directory
+when it starts (`gunicorn wsgi:app`, see the `Procfile`).
+
+- The app is loaded once by the master process, before forking the workers
+  (`GUNICORN_PRELOAD`, default: 1), which then share its memory pages until
+  they write to them (copy-on-write). Garbage collection is disabled while
+  the app loads, and the objects are frozen before each fork, so that the
+  collections of the workers never touch (and copy) the shared pages.
+- There is one worker per CPU (`WEB_CONCURRENCY`) with `GUNICORN_THREADS`
+  threads each (default: 4). The worker class (`GUNICORN_WORKER_CLASS`) is
+  `gthread` with several threads, `sync` otherwise.
+- Each worker opens its own database connections and logging threads,
+  instead of using the ones of the master.
+
+The memory used by each worker with and without preloading is measured by
+`python manage.py bench-memory`.
+"""
+
+# built-in imports
+import gc
+import os
+import sys
+from typing import Any
+
+wsgi_app = "wsgi:app"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# only while the master preloads the app, see `when_ready`; the configuration
+# is read again on each reload (SIGHUP), when the app is already loaded
+if preload_app and "wsgi" not in sys.modules:
+    gc.disable()
+
+# Heroku sets `WEB_CONCURRENCY` according to the memory of the dyno
+workers = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = os.environ.get(
+    "GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync"
+)
+# the pools of database connections are sized with the same values,
+# see `engine_options_from_env` in `codeapp/config.py`
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+os.environ.setdefault("GUNICORN_THREADS", str(threads))
+
+
+def when_ready(server: Any) -> None:
+    # the app is loaded; the master only collects its own objects from now on
+    gc.enable()
+
+
+def on_reload(server: Any) -> None:
+    # `when_ready` is not called again after a reload
+    gc.enable()
+
+
+def pre_fork(server: Any, worker: Any) -> None:
+    # the objects of the master are moved to a generation that is never
+    # collected, therefore the workers do not write to their pages
+    gc.freeze()
+
+
+def post_fork(server: Any, worker: Any) -> None:
+    # the frozen objects are skipped, the workers collect only their own
+    gc.enable()
+
+    if "wsgi" not in sys.modules:
+        # without preloading, the workers load the app after forking
+        return
+
+    # pylint: disable=import-outside-toplevel
+    from codeapp import db, log
+    from wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # the connections opened by the master (if any) are left to it,
+            # sharing a connection between processes corrupts it
+            engine.dispose(close=False)
+    # the threads of the master are not copied to the workers
+    log.restart()
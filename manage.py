@@ -1,15 +1,38 @@
 # built-in imports
+import csv
+import io
+import itertools
+import os
 import random
+import statistics
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
 from datetime import datetime, timedelta
-from typing import List
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, TextIO
 
 # external imports
+import click
 from flask.cli import FlaskGroup
-from lorem_text import lorem
+from flask_migrate import stamp, upgrade
+from sqlalchemy import Table, create_engine, insert, inspect, or_, select, text
+from sqlalchemy.engine import Connection
 
 # internal imports
-from codeapp import bcrypt, create_app, db
-from codeapp.models import Comment, Grade, Recipe, User
+from codeapp import bcrypt, create_app, db, limiter
+from codeapp.models import (
+    Comment,
+    Grade,
+    Recipe,
+    User,
+    backfill_excerpts,
+    make_excerpt,
+    recompute_ratings,
+)
+from codeapp.search import rebuild_index, search
 
 app = create_app()
 cli = FlaskGroup(create_app=create_app)  # type: ignore
@@ -17,9 +40,14 @@ cli = FlaskGroup(create_app=create_app)  # type: ignore
 
 @cli.command("initdb")  # type: ignore
 def initdb() -> None:
+    # only needed to generate the data, not by the app
+    from lorem_text import lorem  # pylint: disable=import-outside-toplevel
+
     with app.app_context():
         db.drop_all()
         db.create_all()
+        # the tables match the latest migration
+        stamp()
 
         # let's first generate a few users
         users: List[User] = []
@@ -116,5 +144,620 @@ def initdb() -> None:
         app.logger.info("Success!")
 
 
+@cli.command("seed")  # type: ignore
+@click.option("--users", default=1000, show_default=True)
+@click.option("--recipes", default=10000, show_default=True)
+@click.option("--comments", default=50000, show_default=True)
+@click.option("--grades", default=50000, show_default=True)
+@click.option("--batch-size", default=10000, show_default=True)
+def seed(users: int, recipes: int, comments: int, grades: int, batch_size: int) -> None:
+    """
+    Re-creates the database and fills it with synthetic data for load testing.
+    Rows are produced by generators and inserted in batches with Core
+    `executemany` (or `COPY` in PostgreSQL), without creating ORM objects.
+    All users have the password `testing`.
+    """
+    if users < 2 or recipes < 1:
+        raise click.BadParameter("At least 2 users and 1 recipe are needed.")
+    if grades > users * recipes:
+        raise click.BadParameter("Each user can grade each recipe only once.")
+
+    from lorem_text import lorem  # pylint: disable=import-outside-toplevel
+
+    rng = random.Random(42)
+    now = datetime.now()
+    # hashing is slow on purpose, therefore all users share the same hash
+    pwd = bcrypt.generate_password_hash("testing").decode("utf-8")
+    paragraphs = lorem.paragraphs(200).split("\n")
+    titles = [lorem.words(rng.randint(3, 7)).capitalize() for _ in range(1000)]
+
+    def _content() -> str:
+        return "".join(
+            f"<p>{paragraph}</p>"
+            for paragraph in rng.sample(paragraphs, rng.randint(1, 3))
+        )
+
+    def _date(min_days: int, max_days: int) -> datetime:
+        return now - timedelta(
+            days=rng.randint(min_days, max_days), seconds=rng.randint(0, 86400)
+        )
+
+    def _users() -> Iterator[Dict[str, Any]]:
+        # the same users created by `initdb`, so that the usual logins work
+        yield {"name": "Default User", "email": "default@chalmers.se", "password": pwd}
+        yield {"name": "Normal User", "email": "normal@chalmers.se", "password": pwd}
+        for i in range(2, users):
+            yield {
+                "name": f"User {i}",
+                "email": f"user{i}@chalmers.se",
+                "password": pwd,
+            }
+
+    # the tables are re-created, therefore the ids are 1, 2, ..., n
+    def _recipes() -> Iterator[Dict[str, Any]]:
+        for _ in range(recipes):
+            content = _content()
+            yield {
+                "title": rng.choice(titles),
+                "content": content,
+                "excerpt": make_excerpt(content),
+                "date_posted": _date(20, 90),
+                "user_id": rng.randint(1, users),
+            }
+
+    def _comments() -> Iterator[Dict[str, Any]]:
+        for _ in range(comments):
+            content = _content()
+            yield {
+                "content": content,
+                "excerpt": make_excerpt(content),
+                "date_posted": _date(1, 20),
+                "user_id": rng.randint(1, users),
+                "recipe_id": rng.randint(1, recipes),
+            }
+
+    def _grades() -> Iterator[Dict[str, Any]]:
+        # each (user, recipe) pair appears at most once
+        for i in range(grades):
+            yield {
+                "score": rng.randint(1, 5),
+                "recipe_id": i % recipes + 1,
+                "user_id": (i // recipes) % users + 1,
+            }
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        # the tables match the latest migration
+        stamp()
+
+        total_rows = 0
+        total_start = time.perf_counter()
+        with db.engine.begin() as conn:
+            if conn.dialect.name == "sqlite":
+                # the data can be re-generated if anything goes wrong
+                conn.exec_driver_sql("PRAGMA synchronous = OFF")
+            for model, rows in (
+                (User, _users()),
+                (Recipe, _recipes()),
+                (Comment, _comments()),
+                (Grade, _grades()),
+            ):
+                table = model.__table__
+                start = time.perf_counter()
+                num_rows = 0
+                while True:
+                    batch = list(itertools.islice(rows, batch_size))
+                    if len(batch) == 0:
+                        break
+                    if conn.dialect.name == "postgresql":
+                        _copy(conn, table, batch)
+                    else:
+                        conn.execute(insert(table), batch)
+                    num_rows += len(batch)
+                elapsed = time.perf_counter() - start
+                total_rows += num_rows
+                click.echo(
+                    f"{table.name:>8}: {num_rows:>10} rows in {elapsed:8.2f} s "
+                    f"({num_rows / max(elapsed, 1e-9):,.0f} rows/s)"
+                )
+
+        # grades were inserted bypassing the ORM events
+        recompute_ratings()
+        db.session.commit()
+        elapsed = time.perf_counter() - total_start
+        click.echo(
+            f"{'total':>8}: {total_rows:>10} rows in {elapsed:8.2f} s "
+            f"({total_rows / max(elapsed, 1e-9):,.0f} rows/s)"
+        )
+
+
+def _copy(conn: Connection, table: Table, rows: List[Dict[str, Any]]) -> None:
+    """
+    Inserts `rows` into `table` using PostgreSQL's `COPY`,
+    which is considerably faster than `INSERT` for large amounts of data.
+    """
+    columns = list(rows[0].keys())
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    cursor.copy_expert(
+        f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+
+
+@cli.command("release")  # type: ignore
+def release() -> None:
+    """
+    Upgrades the database to the latest migration, on every release (see the
+    `Procfile`). A database created by `create_all` before the migrations
+    existed has the tables of the initial migration but no version, therefore
+    it is first marked as being in that version instead of creating them again.
+    """
+    with app.app_context():
+        tables = inspect(db.engine).get_table_names()
+        versioned = "alembic_version" in tables and (
+            db.session.execute(text("SELECT version_num FROM alembic_version")).first()
+            is not None
+        )
+        db.session.rollback()
+        if not versioned and "user" in tables:
+            app.logger.warning("Database without a version, stamping it as 0001.")
+            stamp(revision="0001")
+        upgrade()
+
+
+@cli.command("recompute-ratings")  # type: ignore
+def recompute_ratings_command() -> None:
+    """
+    Rebuilds the rating aggregates stored in each recipe from the grades.
+    Needed after grades are inserted or changed bypassing the ORM.
+    """
+    with app.app_context():
+        recompute_ratings()
+        db.session.commit()
+        app.logger.info("Ratings recomputed!")
+
+
+@cli.command("backfill-excerpts")  # type: ignore
+@click.option("--batch-size", default=1000, show_default=True)
+def backfill_excerpts_command(batch_size: int) -> None:
+    """
+    Computes the excerpts of the recipes and comments that do not have one,
+    e.g., after the migration that added them.
+    """
+    with app.app_context():
+        updated = backfill_excerpts(batch_size)
+        app.logger.info("Excerpts computed for %d recipes and comments!", updated)
+
+
+@cli.command("export")  # type: ignore
+@click.option(
+    "--output",
+    type=click.File("wb"),
+    default="-",
+    show_default=True,
+    help="File where the recipes are written, `-` for the standard output.",
+)
+@click.option("--batch-size", default=1000, show_default=True)
+def export(output: BinaryIO, batch_size: int) -> None:
+    """
+    Writes all the recipes, with their authors, ratings and comments,
+    as NDJSON (see `codeapp/export.py`).
+    """
+    from codeapp.export import (  # pylint: disable=import-outside-toplevel
+        export_recipes,
+    )
+
+    with app.app_context():
+        count = 0
+        for line in export_recipes(batch_size):
+            output.write(line)
+            count += 1
+    click.echo(f"{count} recipes exported.", err=True)
+
+
+@cli.command("import")  # type: ignore
+@click.argument("file", type=click.File("r", encoding="utf-8"))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(["jsonl", "csv"]),
+    help="By default, given by the extension of the file.",
+)
+@click.option("--batch-size", default=10000, show_default=True)
+@click.option(
+    "--checkpoint",
+    help="File with the progress of the import, to continue it if interrupted. "
+    "By default, the name of the file with `.checkpoint`.",
+)
+@click.option("--dry-run", is_flag=True, help="Only validates the records.")
+def import_command(
+    file: TextIO,
+    file_format: Optional[str],
+    batch_size: int,
+    checkpoint: Optional[str],
+    dry_run: bool,
+) -> None:
+    """
+    Imports the recipes in FILE, in JSON lines or CSV,
+    with the fields `title`, `content`, `email` (of the author)
+    and optionally `date_posted` (see `codeapp/importer.py`).
+    """
+    from codeapp import importer  # pylint: disable=import-outside-toplevel
+
+    if file_format is None:
+        file_format = "csv" if file.name.lower().endswith(".csv") else "jsonl"
+    if checkpoint is None and file.name != "<stdin>":
+        checkpoint = f"{file.name}.checkpoint"
+    with app.app_context():
+        stats = importer.import_recipes(
+            importer.read_records(file, file_format),
+            batch_size=batch_size,
+            checkpoint=checkpoint,
+            dry_run=dry_run,
+        )
+    for number, reason in stats.errors:
+        click.echo(f"Record {number}: {reason}", err=True)
+    if stats.skipped > 0:
+        click.echo(f"{stats.skipped} records skipped, imported by a previous run.")
+    click.echo(
+        f"{stats.imported} recipes {'valid' if dry_run else 'imported'}, "
+        f"{stats.invalid} invalid, in {stats.elapsed:.2f} s "
+        f"({stats.read / max(stats.elapsed, 1e-9):,.0f} records/s)."
+    )
+
+
+@cli.command("reindex-search")  # type: ignore
+def reindex_search() -> None:
+    """
+    Creates the full-text search index if needed and re-indexes all recipes.
+    """
+    with app.app_context():
+        rebuild_index()
+        db.session.commit()
+        app.logger.info("Search index rebuilt!")
+
+
+@cli.command("bench-search")  # type: ignore
+@click.option(
+    "--sizes",
+    default="10000,100000,1000000",
+    show_default=True,
+    help="Comma-separated numbers of recipes to benchmark.",
+)
+@click.option("--queries", default=50, show_default=True)
+@click.option(
+    "--database-url",
+    default=None,
+    help="Database used for the benchmark. Defaults to a temporary SQLite file. "
+    "WARNING: all tables in this database are dropped.",
+)
+def bench_search(sizes: str, queries: int, database_url: str) -> None:
+    """
+    Compares the latency of the full-text search against a `LIKE` scan
+    over the title and the content of synthetic recipes.
+    """
+    rng = random.Random(42)
+    vocabulary = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9)))
+        for _ in range(5000)
+    ]
+    # words that appear in very few recipes: the worst case for `LIKE`,
+    # which has to scan the whole table to find the few matches
+    rare_words = [f"rare{word}" for word in vocabulary[:100]]
+
+    click.echo(f"{'recipes':>10} {'method':>8} {'median (ms)':>12} {'p95 (ms)':>10}")
+    for size in [int(x) for x in sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            url = database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            engine = create_engine(url)
+            with engine.begin() as conn:
+                db.metadata.drop_all(conn)
+                db.metadata.create_all(conn)
+                conn.execute(
+                    insert(User),
+                    [{"name": "Bench", "email": "b@b.se", "password": "x"}],
+                )
+                batch_size = 10000
+                for start in range(0, size, batch_size):
+                    batch = []
+                    for i in range(start, min(start + batch_size, size)):
+                        words = rng.choices(vocabulary, k=60)
+                        if i % 10000 == 0:
+                            words.append(rng.choice(rare_words))
+                        batch.append(
+                            {
+                                "title": " ".join(words[:5]).capitalize(),
+                                "content": "<p>" + " ".join(words[5:]) + "</p>",
+                                "date_posted": datetime.now()
+                                - timedelta(minutes=rng.randint(0, 10**6)),
+                                "user_id": 1,
+                            }
+                        )
+                    conn.execute(insert(Recipe), batch)
+
+            timings: Dict[str, List[float]] = {"like": [], "fts": []}
+            with engine.connect() as conn:
+                for i in range(queries):
+                    word = rng.choice(rare_words if i % 2 == 0 else vocabulary)
+                    like = (
+                        select(Recipe.id)
+                        .filter(
+                            or_(
+                                Recipe.title.like(f"%{word}%"),
+                                Recipe.content.like(f"%{word}%"),
+                            )
+                        )
+                        .order_by(Recipe.date_posted, Recipe.id)
+                        .limit(app.config["RECIPES_PER_PAGE"])
+                    )
+                    fts, keys = search(select(Recipe.id), word, engine.dialect.name)
+                    fts = fts.order_by(*keys).limit(app.config["RECIPES_PER_PAGE"])
+                    for method, statement in (("like", like), ("fts", fts)):
+                        start_time = time.perf_counter()
+                        conn.execute(statement).all()
+                        timings[method].append(
+                            (time.perf_counter() - start_time) * 1000
+                        )
+            engine.dispose()
+
+        for method, values in timings.items():
+            median = statistics.median(values)
+            p95 = statistics.quantiles(values, n=20)[-1]
+            click.echo(f"{size:>10} {method:>8} {median:>12.2f} {p95:>10.2f}")
+
+
+@cli.command("bench-ratelimit")  # type: ignore
+@click.option(
+    "--storage",
+    "storages",
+    multiple=True,
+    help="Storage URI to benchmark, e.g., redis://localhost:6379. "
+    "Can be repeated. Defaults to memory:// and a temporary SQLite file.",
+)
+@click.option("--requests", "count", default=2000, show_default=True)
+def bench_ratelimit(storages: List[str], count: int) -> None:
+    """
+    Measures the latency that the rate limiter adds to each request,
+    with each storage, compared to requests without rate limits.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        uris = list(storages) or [
+            "memory://",
+            f"sqlite:///{os.path.join(tmp, 'ratelimit.db')}",
+        ]
+        click.echo(
+            f"{'storage':>30} {'median (us)':>12} {'p95 (us)':>10} {'added (us)':>11}"
+        )
+        baseline = 0.0
+        for uri in [""] + uris:
+            app.config["RATELIMIT_ENABLED"] = uri != ""
+            app.config["RATELIMIT_STORAGE_URI"] = uri or "memory://"
+            limiter.init_app(app)
+            limiter.reset()
+            client = app.test_client()
+            timings: List[float] = []
+            for i in range(count):
+                # 40 requests per client, below the limit of 50 per hour
+                address = f"10.0.{i // 40 // 256}.{i // 40 % 256}"
+                start_time = time.perf_counter()
+                client.get("/about", environ_base={"REMOTE_ADDR": address})
+                timings.append((time.perf_counter() - start_time) * 10**6)
+            median = statistics.median(timings)
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            baseline = baseline or median
+            click.echo(
+                f"{uri or 'disabled':>30} {median:>12.0f} {p95:>10.0f} "
+                f"{median - baseline:>11.0f}"
+            )
+
+
+@cli.command("bench-bcrypt")  # type: ignore
+@click.option(
+    "--rounds",
+    default="4,8,10,11,12,13,14",
+    show_default=True,
+    help="Comma-separated costs (log rounds) to benchmark.",
+)
+@click.option(
+    "--seconds", default=2.0, show_default=True, help="Time spent on each cost."
+)
+def bench_bcrypt(rounds: str, seconds: float) -> None:
+    """
+    Measures how many passwords one CPU core hashes per second with each cost.
+    Each login checks one hash, so a server with N cores handles at most
+    about N times this number of logins per second.
+    """
+    click.echo(f"current cost: {app.config['BCRYPT_LOG_ROUNDS']}")
+    click.echo(f"{'cost':>6} {'ms/hash':>10} {'hashes/s':>10}")
+    for cost in [int(x) for x in rounds.split(",")]:
+        count = 0
+        start_time = time.perf_counter()
+        while count == 0 or time.perf_counter() - start_time < seconds:
+            bcrypt.generate_password_hash("benchmark password", cost)
+            count += 1
+        elapsed = time.perf_counter() - start_time
+        click.echo(
+            f"{cost:>6} {elapsed / count * 1000:>10.1f} {count / elapsed:>10.1f}"
+        )
+
+
+def _memory(pid: int) -> Dict[str, int]:
+    """
+    Returns the RSS, the PSS (the pages shared with other processes count
+    divided among them) and the USS (the pages of the process only)
+    of the process, in kB. Only in Linux.
+    """
+    values: Dict[str, int] = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as file:
+        for line in file:
+            name, _, value = line.partition(":")
+            if name in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                values[name] = int(value.split()[0])
+    return {
+        "rss": values["Rss"],
+        "pss": values["Pss"],
+        "uss": values["Private_Clean"] + values["Private_Dirty"],
+    }
+
+
+@cli.command("bench-memory")  # type: ignore
+@click.option("--workers", default=4, show_default=True)
+@click.option("--requests", "count", default=500, show_default=True)
+@click.option("--port", default=8765, show_default=True)
+def bench_memory(workers: int, count: int, port: int) -> None:
+    """
+    Starts gunicorn (see `gunicorn.conf.py`) with and without preloading
+    the app, sends requests to all the workers and reports their memory.
+    The USS is the memory each new worker adds. Only in Linux.
+    """
+    url = f"http://127.0.0.1:{port}"
+    paths = ["/", "/about", "/api/recipes", "/api/users"]
+    click.echo(
+        f"{'preload':>8} {'RSS (MB)':>9} {'PSS (MB)':>9} {'USS (MB)':>9} "
+        f"{'total PSS (MB)':>15}"
+    )
+    for preload in ["0", "1"]:
+        env = os.environ.copy()
+        env["GUNICORN_PRELOAD"] = preload
+        env["WEB_CONCURRENCY"] = str(workers)
+        env["RATELIMIT_ENABLED"] = "0"
+        process = subprocess.Popen(  # pylint: disable=consider-using-with
+            [sys.executable, "-m", "gunicorn", f"--bind=127.0.0.1:{port}"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            # waiting for the server to start
+            for _ in range(300):
+                try:
+                    with urllib.request.urlopen(url + "/about"):
+                        break
+                except OSError:
+                    time.sleep(0.1)
+            for i in range(count):
+                with urllib.request.urlopen(url + paths[i % len(paths)]) as response:
+                    response.read()
+            with open(
+                f"/proc/{process.pid}/task/{process.pid}/children", encoding="utf-8"
+            ) as file:
+                pids = [int(pid) for pid in file.read().split()]
+            memory = [_memory(pid) for pid in pids]
+            master = _memory(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+        means = {
+            key: statistics.mean(values[key] for values in memory) / 1024
+            for key in ["rss", "pss", "uss"]
+        }
+        total = (sum(values["pss"] for values in memory) + master["pss"]) / 1024
+        click.echo(
+            f"{'yes' if preload == '1' else 'no':>8} {means['rss']:>9.1f} "
+            f"{means['pss']:>9.1f} {means['uss']:>9.1f} {total:>15.1f}"
+        )
+
+
+@cli.command("loadtest")  # type: ignore
+@click.option(
+    "--log",
+    "log_file",
+    type=click.File(),
+    default=None,
+    help="Requests to replay, in JSON lines (see `codeapp/loadtest.py`). "
+    "Defaults to a synthetic mix of home, search, detail, login and register.",
+)
+@click.option("--requests", "count", default=1000, show_default=True)
+@click.option("--concurrency", default=8, show_default=True)
+@click.option(
+    "--url",
+    default=None,
+    help="Server to test, e.g., http://localhost:8000 for a local gunicorn. "
+    "Defaults to the Flask test client.",
+)
+@click.option(
+    "--rate-limits/--no-rate-limits",
+    default=False,
+    show_default=True,
+    help="Applies the rate limits when using the test client.",
+)
+@click.option(
+    "--output",
+    type=click.File("w"),
+    default=None,
+    help="Writes the results in JSON, to compare runs.",
+)
+def loadtest_command(
+    log_file: Optional[TextIO],
+    count: int,
+    concurrency: int,
+    url: Optional[str],
+    rate_limits: bool,
+    output: Optional[TextIO],
+) -> None:
+    """
+    Sends requests concurrently and reports the latency percentiles,
+    the throughput and the error rate of each kind of request.
+    """
+    from codeapp import loadtest  # pylint: disable=import-outside-toplevel
+
+    if log_file is not None:
+        requests = loadtest.read_log(log_file)
+    else:
+        with app.app_context():
+            recipes = db.session.execute(
+                select(Recipe.id, Recipe.title).limit(1000)
+            ).all()
+        requests = loadtest.synthetic_mix(
+            count,
+            recipe_ids=[recipe.id for recipe in recipes],
+            words=[recipe.title.split()[0] for recipe in recipes if recipe.title],
+        )
+
+    if url is None:
+        app.config["RATELIMIT_ENABLED"] = rate_limits
+        limiter.init_app(app)
+        create_sender = loadtest.client_sender(app)
+    else:
+        create_sender = loadtest.http_sender(url)
+
+    results, elapsed = loadtest.run(requests, create_sender, concurrency)
+    stats = loadtest.summarize(results, elapsed)
+
+    click.echo(
+        f"{'route':>10} {'requests':>9} {'errors':>7} {'req/s':>8} "
+        f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}"
+    )
+    for name, route in stats.items():
+        click.echo(
+            f"{name:>10} {route.requests:>9} {route.error_rate:>7.1%} "
+            f"{route.throughput:>8.1f} {route.p50:>9.1f} {route.p95:>9.1f} "
+            f"{route.p99:>9.1f}"
+        )
+    if output is not None:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=False,
+        ).stdout.strip()
+        output.write(
+            loadtest.to_json(
+                stats,
+                commit=revision or None,
+                date=datetime.now().isoformat(timespec="seconds"),
+                target=url or "test client",
+                concurrency=concurrency,
+                elapsed=elapsed,
+            )
+        )
+
+
 if __name__ == "__main__":
     cli()
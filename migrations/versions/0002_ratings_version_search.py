@@ -0,0 +1,95 @@
+"""Add rating aggregates, recipe version and search index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2022-05-27 10:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# copied from `codeapp/search.py` at the time of this revision
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS recipe_fts USING fts5("
+    "title, content, content='recipe', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS recipe_fts_insert AFTER INSERT ON recipe BEGIN "
+    "INSERT INTO recipe_fts(rowid, title, content) "
+    "VALUES (new.id, new.title, new.content); END",
+    "CREATE TRIGGER IF NOT EXISTS recipe_fts_delete AFTER DELETE ON recipe BEGIN "
+    "INSERT INTO recipe_fts(recipe_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); END",
+    "CREATE TRIGGER IF NOT EXISTS recipe_fts_update "
+    "AFTER UPDATE OF title, content ON recipe BEGIN "
+    "INSERT INTO recipe_fts(recipe_fts, rowid, title, content) "
+    "VALUES ('delete', old.id, old.title, old.content); "
+    "INSERT INTO recipe_fts(rowid, title, content) "
+    "VALUES (new.id, new.title, new.content); END",
+    "INSERT INTO recipe_fts(recipe_fts) VALUES('rebuild')",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS recipe_fts_insert",
+    "DROP TRIGGER IF EXISTS recipe_fts_delete",
+    "DROP TRIGGER IF EXISTS recipe_fts_update",
+    "DROP TABLE IF EXISTS recipe_fts",
+]
+POSTGRESQL_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_recipe_search ON recipe USING GIN "
+    "(to_tsvector('english', recipe.title || ' ' || recipe.content))",
+]
+POSTGRESQL_DROP = ["DROP INDEX IF EXISTS ix_recipe_search"]
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("recipe", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("rating_sum", sa.Integer(), server_default="0", nullable=False)
+        )
+        batch_op.add_column(
+            sa.Column("rating_count", sa.Integer(), server_default="0", nullable=False)
+        )
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), server_default="1", nullable=False)
+        )
+        batch_op.create_index(
+            "ix_recipe_date_posted_id", ["date_posted", "id"], unique=False
+        )
+
+    # same as `codeapp.models.recompute_ratings()`
+    op.execute(
+        "UPDATE recipe SET rating_sum = agg.rating_sum, "
+        "rating_count = agg.rating_count "
+        "FROM (SELECT recipe_id, COALESCE(SUM(score), 0) AS rating_sum, "
+        "COUNT(id) AS rating_count FROM grade GROUP BY recipe_id) AS agg "
+        "WHERE recipe.id = agg.recipe_id"
+    )
+
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+    elif dialect == "postgresql":
+        for statement in POSTGRESQL_DDL:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_DROP:
+            op.execute(statement)
+    elif dialect == "postgresql":
+        for statement in POSTGRESQL_DROP:
+            op.execute(statement)
+
+    with op.batch_alter_table("recipe", schema=None) as batch_op:
+        batch_op.drop_index("ix_recipe_date_posted_id")
+        batch_op.drop_column("version")
+        batch_op.drop_column("rating_count")
+        batch_op.drop_column("rating_sum")
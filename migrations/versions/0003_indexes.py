@@ -0,0 +1,88 @@
+"""Add indexes on foreign keys and sort columns, one grade per user and recipe
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2022-06-03 10:00:00.000000
+
+"""
+
+import logging
+
+import sqlalchemy as sa
+from alembic import op
+
+# the logger of `env.py`, created after the app configured the logging
+logger = logging.getLogger("alembic.env")
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # only the latest grade (the highest id) of each user for each recipe is
+    # kept, the others are deleted before adding the unique constraint
+    deleted = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "DELETE FROM grade WHERE id NOT IN "
+                "(SELECT MAX(id) FROM grade GROUP BY user_id, recipe_id)"
+            )
+        )
+        .rowcount
+    )
+    if deleted:
+        logger.warning(
+            "Deleted %d duplicate grades, keeping the latest grade "
+            "of each user for each recipe.",
+            deleted,
+        )
+    op.execute(
+        "UPDATE recipe SET rating_sum = 0, rating_count = 0, "
+        "version = version + 1 WHERE id NOT IN (SELECT recipe_id FROM grade)"
+    )
+    op.execute(
+        "UPDATE recipe SET rating_sum = agg.rating_sum, "
+        "rating_count = agg.rating_count, version = version + 1 "
+        "FROM (SELECT recipe_id, COALESCE(SUM(score), 0) AS rating_sum, "
+        "COUNT(id) AS rating_count FROM grade GROUP BY recipe_id) AS agg "
+        "WHERE recipe.id = agg.recipe_id AND (recipe.rating_sum != agg.rating_sum "
+        "OR recipe.rating_count != agg.rating_count)"
+    )
+
+    with op.batch_alter_table("recipe", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_recipe_user_id_date_posted", ["user_id", "date_posted"], unique=False
+        )
+
+    with op.batch_alter_table("comment", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_comment_recipe_id_date_posted",
+            ["recipe_id", "date_posted"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_comment_user_id_date_posted", ["user_id", "date_posted"], unique=False
+        )
+
+    with op.batch_alter_table("grade", schema=None) as batch_op:
+        batch_op.create_index("ix_grade_recipe_id", ["recipe_id"], unique=False)
+        batch_op.create_unique_constraint(
+            "uq_grade_user_id_recipe_id", ["user_id", "recipe_id"]
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("grade", schema=None) as batch_op:
+        batch_op.drop_constraint("uq_grade_user_id_recipe_id", type_="unique")
+        batch_op.drop_index("ix_grade_recipe_id")
+
+    with op.batch_alter_table("comment", schema=None) as batch_op:
+        batch_op.drop_index("ix_comment_user_id_date_posted")
+        batch_op.drop_index("ix_comment_recipe_id_date_posted")
+
+    with op.batch_alter_table("recipe", schema=None) as batch_op:
+        batch_op.drop_index("ix_recipe_user_id_date_posted")
@@ -0,0 +1,34 @@
+"""Add the plain-text excerpts of the recipes and comments
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2022-06-10 10:00:00.000000
+
+The excerpts of the existing rows are NULL after this revision; compute
+them with `python manage.py backfill-excerpts`.
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("recipe", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("excerpt", sa.Text(), nullable=True))
+
+    with op.batch_alter_table("comment", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("excerpt", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("comment", schema=None) as batch_op:
+        batch_op.drop_column("excerpt")
+
+    with op.batch_alter_table("recipe", schema=None) as batch_op:
+        batch_op.drop_column("excerpt")
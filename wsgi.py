@@ -0,0 +1,12 @@
+"""
+Entry point of the web servers, e.g., `gunicorn wsgi:app` (see `Procfile`).
+
+It only imports what is needed to serve requests: the commands in
+`manage.py`, their dependencies (e.g., `lorem_text`) and the migrations
+are left out, so that the workers start faster, e.g., when scaling out.
+"""
+
+# internal imports
+from codeapp import create_app
+
+app = create_app(migrations=False)